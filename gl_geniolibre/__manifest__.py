@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': "GenioLibre - Custom Development",
-    'version': '1.0.1',
+    'version': '1.0.2',
     'author': 'GenioLibre',
 
     'summary': """
@@ -21,6 +21,7 @@
 
     # any module necessary for this one to work correctly
     'depends': ['base', 'mail', 'portal', 'base_setup','web','website','sale','sale_management','project',],
+    'external_dependencies': {'python': ['numpy']},
 
     # always loaded
     'data': [
@@ -33,6 +34,8 @@
         'views/gl_project_portal.xml',
         'views/gl_project_portal_calendar.xml',
         'views/gl_social_monthly_metrics.xml',
+        'views/gl_publish_metrics.xml',
+        'views/gl_llm_gateway.xml',
         'views/gl_contenido_flujo.xml',
         'views/sale_order_line_tax_view.xml',
 
@@ -47,6 +50,8 @@
         "web.assets_backend": [
             'gl_geniolibre/static/src/js/gl_many2many_attachment_preview.js',
             'gl_geniolibre/static/src/js/clipboard.js',
+            'gl_geniolibre/static/src/js/gl_llm_stream.js',
+            'gl_geniolibre/static/src/xml/gl_llm_stream.xml',
             'gl_geniolibre/static/src/xml/gl_many2many_attachment_preview_template.xml',
         ],
         "web.report_assets_common": [
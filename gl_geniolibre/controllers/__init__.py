@@ -5,4 +5,6 @@ from . import gl_tiktok_oauth
 from . import gl_facebook_oauth
 from . import gl_google_oauth
 from . import gl_linkedin_oauth
-from . import gl_project_portal
\ No newline at end of file
+from . import gl_project_portal
+from . import gl_social_webhooks
+from . import gl_contenido_stream
\ No newline at end of file
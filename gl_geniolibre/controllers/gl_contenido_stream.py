@@ -0,0 +1,87 @@
+import json
+import logging
+
+from odoo import api, http
+from odoo.exceptions import AccessError, ValidationError
+from odoo.http import request, Response
+from odoo.modules.registry import Registry
+
+from ..models.gl_llm_gateway import stream_chat_completion
+
+_logger = logging.getLogger(__name__)
+
+
+class gl_contenido_stream_controller(http.Controller):
+
+    @http.route('/gl/contenido/<int:flujo_id>/stream/<string:kind>', type='http', auth='user', methods=['POST'])
+    def contenido_stream(self, flujo_id, kind, **kw):
+        """ Respuesta de la IA como Server-Sent Events (widget gl_llm_stream del formulario del flujo) """
+        Flujo = request.env['gl.contenido.flujo']
+        flujo = Flujo.browse(flujo_id).exists()
+        if not flujo or kind not in Flujo._GL_STREAM_TARGETS:
+            return request.make_json_response({"error": "Flujo no encontrado"}, status=404)
+
+        origin = f"stream_{kind}"
+        try:
+            flujo.check_access('write')
+            prompt = flujo._gl_stream_prompt(kind)
+            stream = request.env['gl.llm.gateway']._prepare_stream(
+                prompt['messages'], prompt['temperature'], origin=origin, force=kw.get('force') == '1')
+        except (AccessError, ValidationError) as e:
+            return request.make_json_response({"error": str(e)}, status=400)
+
+        # El generador corre cuando el cursor de la petición ya se cerró: solo lleva datos planos
+        events = stream_events(
+            request.env.cr.dbname, request.env.uid, dict(request.env.context),
+            flujo.id, Flujo._GL_STREAM_TARGETS[kind], stream, origin,
+        )
+        return Response(events, mimetype='text/event-stream', direct_passthrough=True, headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',  # nginx: no acumular la respuesta
+        })
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
+
+def stream_events(dbname, uid, context, flujo_id, field_name, stream, origin):
+    """Reenvía los fragmentos de la IA y, al terminar, guarda el texto completo en el flujo."""
+    config = stream['config']
+    stats = {}
+    parts = []
+    error = False
+
+    if stream['cached']:
+        parts.append(stream['cached'])
+        yield sse('delta', {"text": stream['cached']})
+    else:
+        try:
+            for delta in stream_chat_completion(config['base_url'], config['api_key'], stream['payload'], stats):
+                parts.append(delta)
+                yield sse('delta', {"text": delta})
+        except Exception as e:
+            _logger.error("Streaming de IA (%s) interrumpido: %s", origin, e)
+            error = str(e)
+
+    text = "".join(parts).strip()
+    try:
+        with Registry(dbname).cursor() as cr:
+            env = api.Environment(cr, uid, context)
+            if not stream['cached']:
+                env['gl.llm.gateway']._store_responses({stream['key']: {
+                    'content': text,
+                    'usage': stats.get('usage') or {},
+                    'latency_ms': stats.get('latency_ms', 0),
+                    'error': error,
+                }}, config, origin)
+            if not error:
+                env['gl.contenido.flujo'].browse(flujo_id).write({field_name: text})
+    except Exception as e:
+        _logger.error("No se pudo guardar la respuesta de IA del flujo %s: %s", flujo_id, e)
+        error = error or str(e)
+
+    if error:
+        yield sse('error', {"message": error})
+    else:
+        yield sse('done', {"field": field_name, "first_token_ms": stats.get('first_token_ms')})
@@ -47,6 +47,9 @@ class gl_facebook_oauth_controller(http.Controller):
             print(response.json())
             access_token = response.json().get('access_token')
             request.env['ir.config_parameter'].sudo().set_param('gl_facebook.api_key', access_token)
+            TokenManager = request.env['gl.token.manager'].sudo()
+            TokenManager._store_facebook_user_token_expiry(access_token)
+            TokenManager._schedule_next_refresh()
             request.env.cr.commit()  # Force commit
 
             return redirect('/odoo/settings?#GenioLibre')
@@ -35,14 +35,13 @@ class LinkedInAuthController(http.Controller):
 
         token_data = response.json()
         access_token = token_data.get("access_token")
-        expires_in = token_data.get("expires_in")
 
         if not access_token:
             return request.redirect('/web?error=linkedin_token_missing')
 
-        # Guardar en ir.config_parameter
-        config_param = request.env['ir.config_parameter'].sudo()
-        config_param.set_param("linkedin.access_token", access_token)
-        config_param.set_param("linkedin.token_expiry", expires_in)
+        # Guardar en ir.config_parameter (token, expiración absoluta y refresh token)
+        TokenManager = request.env['gl.token.manager'].sudo()
+        TokenManager._store_linkedin_token(token_data)
+        TokenManager._schedule_next_refresh()
 
         return redirect('/odoo/settings?#GenioLibre')
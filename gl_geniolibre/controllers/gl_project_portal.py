@@ -1,20 +1,18 @@
+import hashlib
+import logging
+
 from odoo import http
 from odoo.http import request
-from datetime import datetime
+from datetime import datetime, timezone
+
+_logger = logging.getLogger(__name__)
 
 
 class PortalProjectCalendar(http.Controller):
 
     @http.route('/my/projects/<int:project_id>/calendar', type='http', auth="user", website=True)
     def portal_project_calendar(self, project_id, **kw):
-        project = request.env['project.project'].search([
-            ('id', '=', project_id),
-            '|',
-            ('privacy_visibility', '=', 'portal'),
-            ('message_partner_ids', 'in', [
-                request.env.user.partner_id.id
-            ])
-        ])
+        project = self._get_calendar_project(project_id)
 
         if not project:
             return request.redirect('/my')
@@ -23,66 +21,91 @@ class PortalProjectCalendar(http.Controller):
             'project': project,
         })
 
-    @http.route('/my/projects/<int:project_id>/calendar/events', type='json', auth="user", methods=[
-        'POST'
+    @http.route('/my/projects/<int:project_id>/calendar/events', type='http', auth="user", methods=[
+        'GET'
     ], website=True)
     def portal_project_calendar_events(self, project_id, start=None, end=None, **kw):
-        print(f"📡 Solicitando eventos para proyecto {project_id}")
-
-        # Verificar proyecto
-        project = request.env['project.project'].search([
-                                                            ('id', '=', project_id)
-                                                        ])
-        if not project.exists():
-            return {
+        # Mismo control de acceso que la página del calendario
+        project = self._get_calendar_project(project_id)
+        if not project:
+            return request.make_json_response({
                 "error": "Proyecto no encontrado"
-            }
+            }, status=404)
 
         # Construir dominio de búsqueda
         domain = [
-            ('project_id', '=', project_id)
+            ('project_id', '=', project.id),
+            ('fecha_publicacion', '!=', False),
         ]
 
         # Filtrar por fechas si se proporcionan
-        if start:
-            try:
-                start_date = datetime.fromisoformat(start.replace('Z', '+00:00'))
-                domain.append(('fecha_publicacion', '>=', start_date.date()))
-            except Exception as e:
-                print(f"⚠️ Error parseando start date: {e}")
-
-        if end:
-            try:
-                end_date = datetime.fromisoformat(end.replace('Z', '+00:00'))
-                domain.append(('fecha_publicacion', '<=', end_date.date()))
-            except Exception as e:
-                print(f"⚠️ Error parseando end date: {e}")
-
-        # Buscar tareas
-        tasks = request.env['project.task'].search(domain)
-        print(f"📋 Encontradas {len(tasks)} tareas")
+        start_date = self._parse_calendar_date(start)
+        if start_date:
+            domain.append(('fecha_publicacion', '>=', start_date))
+
+        end_date = self._parse_calendar_date(end)
+        if end_date:
+            domain.append(('fecha_publicacion', '<=', end_date))
+
+        Task = request.env['project.task']
+
+        # ETag: última modificación + cantidad de tareas del rango (usa el índice project_id, fecha_publicacion)
+        [(last_write, count)] = Task._read_group(domain, aggregates=['write_date:max', '__count'])
+        etag = hashlib.sha1(
+            f"{project.id}|{start_date}|{end_date}|{last_write}|{count}|{request.env.lang}".encode()
+        ).hexdigest()
+
+        headers = [
+            ('ETag', f'"{etag}"'),
+            ('Cache-Control', 'private, no-cache'),
+        ]
+        if request.httprequest.if_none_match.contains(etag):
+            return request.make_response('', headers=headers, status=304)
+
+        tasks = Task.search_read(domain, ['name', 'fecha_publicacion', 'post_estado'], order='fecha_publicacion')
 
         events = []
         for task in tasks:
-            if task.fecha_publicacion:
-                event_data = {
-                    "id": task.id,
-                    "title": task.name,
-                    "start": task.fecha_publicacion.isoformat(),  # ISO para FullCalendar
-                    "allDay": False,  # mostrar fecha y hora
-                    "url": f"/my/projects/{project_id}/task/{task.id}",
-                    "color": self._get_status_color(task.post_estado),
-                    "extendedProps": {
-                        "estado": task.post_estado or "sin estado",
-                        "fecha_publicacion": task.fecha_publicacion.strftime("%d/%m/%Y %H:%M"),
-                        # 👈 formato dd/MM/yyyy HH:mm
-                    }
+            events.append({
+                "id": task['id'],
+                "title": task['name'],
+                "start": task['fecha_publicacion'].isoformat(),  # ISO para FullCalendar
+                "allDay": False,  # mostrar fecha y hora
+                "url": f"/my/projects/{project.id}/task/{task['id']}",
+                "color": self._get_status_color(task['post_estado']),
+                "extendedProps": {
+                    "estado": task['post_estado'] or "sin estado",
+                    "fecha_publicacion": task['fecha_publicacion'].strftime("%d/%m/%Y %H:%M"),
+                    # 👈 formato dd/MM/yyyy HH:mm
                 }
-                events.append(event_data)
+            })
+
+        _logger.debug("Calendario del proyecto %s: %s eventos", project.id, len(events))
+        return request.make_json_response(events, headers=headers)
+
+    def _get_calendar_project(self, project_id):
+        """Proyecto visible en el portal para el usuario actual (vacío si no tiene acceso)."""
+        return request.env['project.project'].search([
+            ('id', '=', project_id),
+            '|',
+            ('privacy_visibility', '=', 'portal'),
+            ('message_partner_ids', 'in', [
+                request.env.user.partner_id.id
+            ])
+        ], limit=1)
 
-        print(f"✅ Enviando {len(events)} eventos")
-        print(events)
-        return events
+    def _parse_calendar_date(self, value):
+        """Fecha ISO de FullCalendar → datetime naive en UTC (como se guarda en Odoo)."""
+        if not value:
+            return False
+        try:
+            date = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            _logger.warning("Fecha inválida en el calendario del portal: %s", value)
+            return False
+        if date.tzinfo:
+            date = date.astimezone(timezone.utc).replace(tzinfo=None)
+        return date
 
     def _get_status_color(self, status):
         """Asignar colores según el estado de la tarea"""
@@ -0,0 +1,99 @@
+import hashlib
+import hmac
+import json
+import logging
+import time
+
+from odoo import http
+from odoo.http import request
+
+_logger = logging.getLogger(__name__)
+
+# Tolerancia (segundos) para el timestamp firmado por TikTok (evita replays)
+TIKTOK_SIGNATURE_TOLERANCE = 300
+
+
+class gl_social_webhooks_controller(http.Controller):
+
+    @http.route('/gl/webhooks/meta', type='http', auth='public', methods=['GET'], csrf=False)
+    def meta_webhook_verify(self, **kw):
+        """ Handshake de suscripción de Meta (hub.challenge) """
+        verify_token = request.env['ir.config_parameter'].sudo().get_param('gl_facebook.webhook_verify_token')
+
+        if kw.get('hub.mode') == 'subscribe' and verify_token and hmac.compare_digest(
+                kw.get('hub.verify_token') or '', verify_token):
+            return request.make_response(kw.get('hub.challenge') or '')
+
+        return request.make_response('Forbidden', status=403)
+
+    @http.route('/gl/webhooks/meta', type='http', auth='public', methods=['POST'], csrf=False)
+    def meta_webhook(self, **kw):
+        """ Notificaciones de Meta (Page / Instagram) sobre videos y contenedores publicados """
+        body = request.httprequest.get_data()
+        app_secret = request.env['ir.config_parameter'].sudo().get_param('gl_facebook.secret')
+
+        if not verify_meta_signature(body, request.httprequest.headers.get('X-Hub-Signature-256'), app_secret):
+            _logger.warning("Webhook Meta rechazado: firma inválida")
+            return request.make_response('Invalid signature', status=403)
+
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            return request.make_response('Invalid payload', status=400)
+
+        updated = request.env['project.task'].sudo()._gl_handle_meta_webhook(payload)
+        _logger.info("Webhook Meta procesado: %s tarea(s) actualizada(s)", len(updated))
+
+        # Meta reintenta ante cualquier respuesta distinta de 200
+        return request.make_response('OK')
+
+    @http.route('/gl/webhooks/tiktok', type='http', auth='public', methods=['POST'], csrf=False)
+    def tiktok_webhook(self, **kw):
+        """ Callbacks de estado de publicación de TikTok (post.publish.*) """
+        body = request.httprequest.get_data()
+        client_secret = request.env['ir.config_parameter'].sudo().get_param('tiktok_secret')
+
+        if not verify_tiktok_signature(body, request.httprequest.headers.get('TikTok-Signature'), client_secret):
+            _logger.warning("Webhook TikTok rechazado: firma inválida")
+            return request.make_response('Invalid signature', status=403)
+
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            return request.make_response('Invalid payload', status=400)
+
+        updated = request.env['project.task'].sudo()._gl_handle_tiktok_webhook(payload)
+        _logger.info("Webhook TikTok procesado: %s tarea(s) actualizada(s)", len(updated))
+
+        return request.make_response('OK')
+
+
+def verify_meta_signature(body, signature_header, app_secret):
+    """Valida la cabecera X-Hub-Signature-256 (HMAC-SHA256 del cuerpo con el App Secret)."""
+    if not app_secret or not signature_header or not signature_header.startswith('sha256='):
+        return False
+
+    expected = hmac.new(app_secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature_header[len('sha256='):])
+
+
+def verify_tiktok_signature(body, signature_header, client_secret, now=None):
+    """Valida la cabecera TikTok-Signature: "t=<timestamp>,s=<HMAC-SHA256 de '<t>.<body>'>"."""
+    if not client_secret or not signature_header:
+        return False
+
+    parts = dict(item.split('=', 1) for item in signature_header.split(',') if '=' in item)
+    timestamp = parts.get('t')
+    signature = parts.get('s')
+    if not timestamp or not signature:
+        return False
+
+    try:
+        if abs((now or time.time()) - int(timestamp)) > TIKTOK_SIGNATURE_TOLERANCE:
+            return False
+    except ValueError:
+        return False
+
+    signed_payload = timestamp.encode('utf-8') + b'.' + body
+    expected = hmac.new(client_secret.encode('utf-8'), signed_payload, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
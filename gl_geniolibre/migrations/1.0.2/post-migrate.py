@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo import api, SUPERUSER_ID
+from odoo.tools import split_every
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 2000
+STORED_FIELDS = ['post_estado_global', 'has_facebook', 'has_instagram', 'has_tiktok', 'has_linkedin']
+
+
+def migrate(cr, version):
+    """Recalcula en lotes el estado global y las redes de las tareas existentes (ahora guardados)."""
+    if not version:
+        return
+
+    env = api.Environment(cr, SUPERUSER_ID, {'active_test': False})
+    Task = env['project.task']
+    fields_to_compute = [Task._fields[name] for name in STORED_FIELDS]
+
+    task_ids = Task.search([]).ids
+    for batch_ids in split_every(BATCH_SIZE, task_ids):
+        tasks = Task.browse(batch_ids)
+        for field in fields_to_compute:
+            env.add_to_compute(field, tasks)
+        tasks.flush_recordset(STORED_FIELDS)
+        env.invalidate_all()
+
+    _logger.info("Estado global de publicación recalculado para %s tareas", len(task_ids))
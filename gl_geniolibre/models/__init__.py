@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 
 from . import gl_credentials
+from . import gl_token_manager
 from . import res_partner
 from . import res_config_settings
+from . import gl_media
+from . import gl_publish_metrics
 from . import project_task
 from . import project_project
 from . import sale_order_line
 from . import gl_social_reports
+from . import gl_llm_gateway
+from . import gl_similarity
 from . import gl_contenido_flujo
\ No newline at end of file
@@ -1,11 +1,12 @@
 import json
-import requests
 import pytz
 from odoo import models, fields
 from odoo.exceptions import ValidationError
 from datetime import datetime
 from datetime import timedelta
 
+from .gl_similarity import SIMILARITY_THRESHOLD
+
 
 class GeneradorContenidoPropuesta(models.Model):
     _name = "gl.contenido.propuesta"
@@ -29,6 +30,10 @@ class GeneradorContenidoPropuesta(models.Model):
     recomendaciones = fields.Text("Recomendaciones de Diseño")
     cambios = fields.Text("Modificaciones")
     aprobado = fields.Boolean("Aprobado", default=False)
+    similar_task_id = fields.Many2one("project.task", string="Publicación Similar", readonly=True, ondelete="set null",
+                                      help="Tarea anterior del cliente con el contenido más parecido a esta propuesta.")
+    similitud = fields.Float("Similitud", readonly=True, digits=(16, 2),
+                             help="Similitud (0 a 1) con la publicación similar; desde 0.6 se considera contenido repetido.")
 
 
 class GeneradorContenidoFlujo(models.Model):
@@ -136,14 +141,19 @@ class GeneradorContenidoFlujo(models.Model):
         print("Success")
 
     def crear_ideas(self):
+        user_tz_name = self.env.user.tz or "UTC"
+        try:
+            tz = pytz.timezone(user_tz_name)
+        except pytz.UnknownTimeZoneError:
+            tz = pytz.UTC
+
+        Propuesta = self.env["gl.contenido.propuesta"]
+        vals_to_create = []
+        to_unlink = Propuesta
+        resumen = {"nuevas": 0, "actualizadas": 0, "sin_cambios": 0, "eliminadas": 0, "similares": 0}
+        revisar = []  # (partner_id, propuesta o vals a crear) nuevas o modificadas
 
         for record in self:
-            user_tz_name = self.env.user.tz or "UTC"
-            try:
-                tz = pytz.timezone(user_tz_name)
-            except pytz.UnknownTimeZoneError:
-                tz = pytz.UTC
-
             if not record.promtp_respuesta:
                 raise ValidationError("⚠️ El campo 'promtp_respuesta' está vacío. Debes pegar un JSON válido.")
 
@@ -155,70 +165,79 @@ class GeneradorContenidoFlujo(models.Model):
             if not isinstance(data, list):
                 raise ValidationError("❌ El JSON debe ser una lista de objetos.")
 
-            record.publicacion_ids.unlink()
-
-            contadores = {
-                "post": 0,
-                "reel": 0,
-                "carrusel": 0,
-            }
-
-            for item in data:
-                if not isinstance(item, dict):
-                    raise ValidationError("Cada elemento del JSON debe ser un objeto.")
-
-                tipo = (item.get("tipo") or "post").lower()
-                if tipo not in contadores:
-                    tipo = "post"  # fallback seguro
-
-                contadores[tipo] += 1
-                numero = f"{contadores[tipo]:02d}"
-
-                titulo_base = (item.get("titulo") or "Sin título").strip()
-
-                titulo_final = f"{tipo.capitalize()} {numero} - {titulo_base}"
-
-                fecha_publicacion_str = item.get("fecha_publicacion")
-                fecha_publicacion = False
-
-                if fecha_publicacion_str:
-                    if len(fecha_publicacion_str) == 10:
-                        fecha_publicacion_str = f"{fecha_publicacion_str} 08:00:00"
-
-                    try:
-                        fecha_local = datetime.strptime(fecha_publicacion_str, "%Y-%m-%d %H:%M:%S")
-                        fecha_local = tz.localize(fecha_local)
-                        fecha_utc = fecha_local.astimezone(pytz.UTC)
-                        fecha_publicacion = fecha_utc.replace(tzinfo=None)
-                    except Exception:
-                        raise ValidationError(f"Formato de fecha inválido: {fecha_publicacion_str}. Usa 'YYYY-MM-DD HH:MM:SS'")
-
-                vals = {
-                    "flujo_id": record.id,
-                    "titulo": titulo_final,
-                    "fecha_publicacion": fecha_publicacion,
-                    "tipo": tipo,
-                    "descripcion": item.get("descripcion"),
-                    "texto_en_diseno": item.get("texto_en_diseno"),
-                    "copy": item.get("copy"),
-                    "hashtags": (
-                        ", ".join(item.get("hashtags", [])) if isinstance(item.get("hashtags"), list) else item.get("hashtags")),
-                    "recomendaciones": item.get("recomendaciones"),
-                    "aprobado": False,
-                }
+            # Propuestas actuales por título exacto y por tipo + número ("Post 03 - ...")
+            existentes = record.publicacion_ids
+            por_titulo = {p.titulo: p for p in existentes}
+            por_secuencia = {}
+            for propuesta in existentes:
+                clave = propuesta_seq_key(propuesta.tipo, propuesta.titulo)
+                if clave:
+                    por_secuencia.setdefault(clave, propuesta)
+            conservadas = Propuesta
+
+            for vals in parse_propuestas(data, tz):
+                propuesta = por_titulo.get(vals["titulo"]) or por_secuencia.get(
+                    propuesta_seq_key(vals["tipo"], vals["titulo"]))
+                if propuesta and propuesta not in conservadas:
+                    conservadas |= propuesta
+                    cambios = {campo: valor for campo, valor in vals.items() if (propuesta[campo] or False) != valor}
+                    if cambios:
+                        # Una propuesta modificada vuelve a requerir aprobación
+                        propuesta.write(dict(cambios, aprobado=False))
+                        revisar.append((record.partner_id.id, propuesta))
+                        resumen["actualizadas"] += 1
+                    else:
+                        resumen["sin_cambios"] += 1
+                else:
+                    vals_to_create.append(dict(vals, flujo_id=record.id, aprobado=False))
+                    revisar.append((record.partner_id.id, vals_to_create[-1]))
+                    resumen["nuevas"] += 1
 
-                self.env["gl.contenido.propuesta"].create(vals)
+            to_unlink |= existentes - conservadas
 
-            record.etapa = "reunion"
+        resumen["similares"] = self._marcar_similares(revisar)
+        resumen["eliminadas"] = len(to_unlink)
+        to_unlink.unlink()
+        Propuesta.create(vals_to_create)
+        self.etapa = "reunion"
 
         return {
             "effect": {
                 "fadeout": "slow",
-                "message": "✅ Propuestas creadas correctamente y numeradas por tipo.",
+                "message": (f"✅ Propuestas importadas: {resumen['nuevas']} nuevas, {resumen['actualizadas']} actualizadas, "
+                            f"{resumen['sin_cambios']} sin cambios y {resumen['eliminadas']} eliminadas."
+                            + (f" ⚠️ {resumen['similares']} se parecen a publicaciones anteriores." if resumen["similares"] else "")),
                 "type": "rainbow_man",
             }
         }
 
+    def _marcar_similares(self, revisar):
+        """Compara las propuestas nuevas o modificadas con las tareas pasadas del cliente (una consulta por cliente).
+
+        revisar: lista de (partner_id, propuesta existente o vals a crear). Devuelve cuántas superan el umbral.
+        """
+        Indice = self.env["gl.similarity.index"]
+        por_cliente = {}
+        for partner_id, item in revisar:
+            por_cliente.setdefault(partner_id, []).append(item)
+
+        similares = 0
+        for partner_id, items in por_cliente.items():
+            textos = [" ".join(filter(None, [item["titulo"], item["descripcion"], item["texto_en_diseno"],
+                                              item["copy"], item["hashtags"]])) for item in items]
+            for item, top in zip(items, Indice._top_k(partner_id, textos, k=1)):
+                task_id, score = top[0] if top else (False, 0.0)
+                vals = {
+                    "similar_task_id": task_id if score >= SIMILARITY_THRESHOLD else False,
+                    "similitud": score,
+                }
+                similares += bool(vals["similar_task_id"])
+                if isinstance(item, dict):
+                    item.update(vals)
+                else:
+                    item.write(vals)
+        return similares
+
     def etapa_perfeccionamiento(self):
         # --- Cambiar la etapa del flujo ---
         for record in self:
@@ -412,6 +431,9 @@ class GeneradorContenidoFlujo(models.Model):
             "video_stories": "video_stories",
         }
 
+        # 1) Validar todos los flujos antes de crear nada
+        propuestas_por_flujo = {}
+        no_aprobadas = 0
         for record in self:
             if not record.project_id:
                 raise ValidationError("Debes seleccionar un Proyecto antes de generar tareas.")
@@ -420,30 +442,32 @@ class GeneradorContenidoFlujo(models.Model):
             if not propuestas:
                 raise ValidationError("No hay propuestas/publicaciones para generar tareas.")
 
-            no_aprobadas = propuestas.filtered(lambda p: not getattr(p, "aprobado", False))
-            if no_aprobadas:
-                return {
-                    "type": "ir.actions.client",
-                    "tag": "display_notification",
-                    "params": {
-                        "title": "⚠️ Publicaciones sin aprobar",
-                        "message": f"Hay {len(no_aprobadas)} publicaciones sin aprobar.",
-                        "type": "warning",
-                        "sticky": True,
-                    },
-                }
+            if any(not prop.fecha_publicacion for prop in propuestas):
+                raise ValidationError("Todas las publicaciones deben tener Fecha de Publicación.")
 
+            no_aprobadas += len(propuestas.filtered(lambda p: not getattr(p, "aprobado", False)))
+            propuestas_por_flujo[record] = propuestas
+
+        if no_aprobadas:
+            return {
+                "type": "ir.actions.client",
+                "tag": "display_notification",
+                "params": {
+                    "title": "⚠️ Publicaciones sin aprobar",
+                    "message": f"Hay {no_aprobadas} publicaciones sin aprobar.",
+                    "type": "warning",
+                    "sticky": True,
+                },
+            }
+
+        # 2) Armar los vals de todas las tareas, agrupados por proyecto
+        vals_por_proyecto = {}
+        for record, propuestas in propuestas_por_flujo.items():
             partner_id = record.partner_id.id if record.partner_id else False
             redes_ids = record.redes_ids.ids if getattr(record, "redes_ids", False) else []
             asignados_ids = record.user_ids.ids if getattr(record, "user_ids", False) else []
 
-            Task = self.env["project.task"]
-            created_count = 0
-
             for prop in propuestas:
-                if not prop.fecha_publicacion:
-                    raise ValidationError("Todas las publicaciones deben tener Fecha de Publicación.")
-
                 tipo_src = (prop.tipo or "").strip().lower()
                 tipo_task = TIPO_MAP.get(tipo_src, "otro")
 
@@ -455,7 +479,7 @@ class GeneradorContenidoFlujo(models.Model):
 
                 description = (prop.copy or "").strip().replace("\n", "<br/>")
                 objetivo = (prop.descripcion or "")
-                vals = {
+                vals_por_proyecto.setdefault(record.project_id, []).append({
                     "name": (prop.titulo or f"Publicación #{prop.id}").strip(),
                     "project_id": record.project_id.id,
                     "user_ids": [
@@ -473,27 +497,52 @@ class GeneradorContenidoFlujo(models.Model):
                     "hashtags": hashtags_txt,
                     "description": description,
                     "objetivo": objetivo,
-                }
+                })
+
+        # 3) Un create por proyecto, sin tracking ni mensajes de creación por tarea
+        Task = self.env["project.task"].with_context(
+            tracking_disable=True,
+            mail_create_nolog=True,
+            mail_create_nosubscribe=True,
+        )
+        for project, vals_list in vals_por_proyecto.items():
+            Task.create(vals_list)
 
-                Task.create(vals)
-                created_count += 1
+        for record, propuestas in propuestas_por_flujo.items():
+            record.message_post(
+                body=f"Se generaron {len(propuestas)} tareas en el proyecto {record.project_id.display_name}.")
 
-            record.etapa = "publicaciones"
+        self.etapa = "publicaciones"
 
+        projects = self.env["project.project"].union(*vals_por_proyecto)
+        if len(projects) > 1:
             return {
                 "type": "ir.actions.act_window",
                 "res_model": "project.task",
-                "view_mode": "kanban,list,form",
+                "view_mode": "list,kanban,form",
                 "domain": [
-                    ("project_id", "=", record.project_id.id)
+                    ("project_id", "in", projects.ids)
                 ],
-                "name": "Tareas del Proyecto",
+                "name": "Tareas de los Proyectos",
                 "context": {
-                    "default_project_id": record.project_id.id,
-                    "search_default_project_id": record.project_id.id,
+                    "group_by": "project_id",
                 },
             }
 
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": "project.task",
+            "view_mode": "kanban,list,form",
+            "domain": [
+                ("project_id", "=", projects.id)
+            ],
+            "name": "Tareas del Proyecto",
+            "context": {
+                "default_project_id": projects.id,
+                "search_default_project_id": projects.id,
+            },
+        }
+
     def previous_stage(self):
         etapa_order = [
             "ideas",
@@ -507,69 +556,126 @@ class GeneradorContenidoFlujo(models.Model):
                 if idx > 0:
                     record.etapa = etapa_order[idx - 1]
 
-    def sugerir_dias_festivos(self):
-        for record in self:
-            if not record.industria:
-                raise ValidationError("Por favor, define la industria del cliente antes de generar las sugerencias.")
+    # Campo donde se guarda la respuesta final de cada consulta en streaming (ver controllers/gl_contenido_stream.py)
+    _GL_STREAM_TARGETS = {
+        "ideas": "promtp_respuesta",
+        "dias": "dias_festivos_referencia",
+    }
+
+    def _gl_stream_prompt(self, kind):
+        self.ensure_one()
+        if kind == "ideas":
+            return self._prompt_ideas()
+        return self._prompt_dias_festivos()
 
-            if not record.date_start or not record.date:
-                raise ValidationError("Por favor, define un rango de fechas antes de generar las sugerencias.")
+    def _prompt_dias_festivos(self):
+        self.ensure_one()
+        if not self.industria:
+            raise ValidationError("Por favor, define la industria del cliente antes de generar las sugerencias.")
+
+        if not self.date_start or not self.date:
+            raise ValidationError("Por favor, define un rango de fechas antes de generar las sugerencias.")
+
+        partner = self.partner_id
+        idioma = (partner.lang or "es_ES").split("_")[0]
+        pais = partner.country_id.name or "Perú"
+        ciudad = partner.city or "Lima"
+
+        rango_texto = f"entre {self.date_start.strftime('%d/%m/%Y')} y {self.date.strftime('%d/%m/%Y')}"
+        prompt = (f"Industria: {self.industria}\n"
+                  f"Ubicación: {ciudad}, {pais}\n"
+                  f"Idioma: {idioma}\n\n"
+                  f"Sugiere entre 1 y 3 fechas relevantes para marketing en {pais}, {rango_texto}, "
+                  f"incluyendo:\n"
+                  f"- Días festivos o conmemorativos culturales y patrios.\n"
+                  f"- Días COMERCIALES o de marketing (como Black Friday, CyberDay, Día del Padre, etc.).\n\n"
+                  f"Devuelve una lista corta en texto, con cada día en una línea separada, incluyendo el nombre y la fecha aproximada.")
 
-            partner = record.partner_id
-            idioma = (partner.lang or "es_ES").split("_")[0]
-            pais = partner.country_id.name or "Perú"
-            ciudad = partner.city or "Lima"
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": (
+                        "Eres un asistente de marketing experto en planificación de contenidos y efemérides. "
+                        "Responde de forma breve y estructurada."),
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                },
+            ],
+            "temperature": 0.5,
+        }
 
-            # 🧭 Configuración ChatGPT
-            icp = self.env["ir.config_parameter"].sudo()
-            api_key = icp.get_param("chatgpt.api_key")
-            base_url = icp.get_param("chatgpt.base_url", "https://api.openai.com/v1")
-            model = icp.get_param("chatgpt.model", "gpt-4.1-mini")
-
-            if not api_key:
-                raise ValidationError("No se ha configurado la API Key de ChatGPT en Ajustes del sistema.")
-
-            rango_texto = f"entre {record.date_start.strftime('%d/%m/%Y')} y {record.date.strftime('%d/%m/%Y')}"
-            prompt = (f"Industria: {record.industria}\n"
-                      f"Ubicación: {ciudad}, {pais}\n"
-                      f"Idioma: {idioma}\n\n"
-                      f"Sugiere entre 1 y 3 fechas relevantes para marketing en {pais}, {rango_texto}, "
-                      f"incluyendo:\n"
-                      f"- Días festivos o conmemorativos culturales y patrios.\n"
-                      f"- Días COMERCIALES o de marketing (como Black Friday, CyberDay, Día del Padre, etc.).\n\n"
-                      f"Devuelve una lista corta en texto, con cada día en una línea separada, incluyendo el nombre y la fecha aproximada.")
+    def _prompt_ideas(self):
+        self.ensure_one()
+        if not self.promtp_ideas:
+            raise ValidationError("Primero genera el prompt con el botón 'Generar Prompt'.")
 
-            try:
-                headers = {
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                }
-                payload = {
-                    "model": model,
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": (
-                                "Eres un asistente de marketing experto en planificación de contenidos y efemérides. "
-                                "Responde de forma breve y estructurada."),
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        },
-                    ],
-                    "temperature": 0.5,
-                }
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": (
+                        "Eres un estratega de contenido para redes sociales. "
+                        "Responde únicamente con el JSON solicitado, sin texto adicional ni bloques de código."),
+                },
+                {
+                    "role": "user",
+                    "content": self.promtp_ideas
+                },
+            ],
+            "temperature": 0.7,
+        }
 
-                response = requests.post(f"{base_url}/chat/completions", headers=headers, json=payload, timeout=40)
-                response.raise_for_status()
-                data = response.json()
+    def generar_ideas_ia(self, force=False):
+        """Genera las propuestas (JSON) de todos los flujos seleccionados sin streaming.
 
-                suggestion = data["choices"][0]["message"]["content"].strip()
-                record.dias_festivos_referencia = suggestion
+        force=True vuelve a consultar la IA aunque el mismo prompt esté en caché.
+        """
+        prompts = [record._prompt_ideas() for record in self]
+        results = self.env["gl.llm.gateway"]._chat_many(prompts, origin="generar_ideas_ia", force=force)
 
-            except Exception as e:
-                raise ValidationError(f"Error al obtener sugerencias: {e}")
+        errors = []
+        for record, result in zip(self, results):
+            if result["error"]:
+                errors.append(f"{record.name}: {result['error']}")
+            else:
+                record.promtp_respuesta = result["content"]
+
+        if errors:
+            raise ValidationError(f"Error al generar las ideas: {'; '.join(errors)}")
+
+    def sugerir_dias_festivos(self, force=False):
+        prompts = [record._prompt_dias_festivos() for record in self]
+
+        # 🧭 Mismo prompt (industria, país, rango) → respuesta en caché; el resto se consulta en paralelo
+        results = self.env["gl.llm.gateway"]._chat_many(prompts, origin="sugerir_dias_festivos", force=force)
+
+        errors = []
+        for record, result in zip(self, results):
+            if result["error"]:
+                errors.append(f"{record.name}: {result['error']}")
+            else:
+                record.dias_festivos_referencia = result["content"]
+
+        if errors and len(errors) == len(self):
+            raise ValidationError(f"Error al obtener sugerencias: {'; '.join(errors)}")
+        if errors:
+            return {
+                "type": "ir.actions.client",
+                "tag": "display_notification",
+                "params": {
+                    "title": "Sugerencias con observaciones",
+                    "message": "No se pudieron generar sugerencias para: " + "; ".join(errors),
+                    "type": "warning",
+                    "sticky": True,
+                    "next": {
+                        "type": "ir.actions.client",
+                        "tag": "reload",
+                    },
+                },
+            }
 
         # 🟩 Notificación + recargar vista
         return {
@@ -641,7 +747,9 @@ class GeneradorContenidoFlujo(models.Model):
             tendencias_clean = _dedup_lines((record.tendencias_urls or "").strip())
             dias_clean = (record.dias_festivos_referencia or "").strip()
 
-            metricas = _try_json_loads(record.metricas)
+            # Resumen del último reporte guardado del cliente; el JSON pegado a mano queda como respaldo
+            metricas = (self.env["gl.social.reports"]._gl_get_digest(partner, record.date_start)
+                        or _try_json_loads(record.metricas))
 
             nivel_contenido = getattr(record, "nivel_contenido", None) or "balanceado"
 
@@ -737,3 +845,65 @@ class GeneradorContenidoFlujo(models.Model):
                 },
             },
         }
+
+
+def parse_propuestas(data, tz):
+    """Convierte la lista JSON de la IA en vals de gl.contenido.propuesta (sin flujo_id), numerados por tipo."""
+    contadores = {
+        "post": 0,
+        "reel": 0,
+        "carrusel": 0,
+    }
+    vals_list = []
+
+    for item in data:
+        if not isinstance(item, dict):
+            raise ValidationError("Cada elemento del JSON debe ser un objeto.")
+
+        tipo = (item.get("tipo") or "post").lower()
+        if tipo not in contadores:
+            tipo = "post"  # fallback seguro
+
+        contadores[tipo] += 1
+        numero = f"{contadores[tipo]:02d}"
+
+        titulo_base = (item.get("titulo") or "Sin título").strip()
+
+        titulo_final = f"{tipo.capitalize()} {numero} - {titulo_base}"
+
+        fecha_publicacion_str = item.get("fecha_publicacion")
+        fecha_publicacion = False
+
+        if fecha_publicacion_str:
+            if len(fecha_publicacion_str) == 10:
+                fecha_publicacion_str = f"{fecha_publicacion_str} 08:00:00"
+
+            try:
+                fecha_local = datetime.strptime(fecha_publicacion_str, "%Y-%m-%d %H:%M:%S")
+                fecha_local = tz.localize(fecha_local)
+                fecha_utc = fecha_local.astimezone(pytz.UTC)
+                fecha_publicacion = fecha_utc.replace(tzinfo=None)
+            except Exception:
+                raise ValidationError(f"Formato de fecha inválido: {fecha_publicacion_str}. Usa 'YYYY-MM-DD HH:MM:SS'")
+
+        hashtags = item.get("hashtags")
+        vals_list.append({
+            "titulo": titulo_final,
+            "fecha_publicacion": fecha_publicacion,
+            "tipo": tipo,
+            "descripcion": item.get("descripcion") or False,
+            "texto_en_diseno": item.get("texto_en_diseno") or False,
+            "copy": item.get("copy") or False,
+            "hashtags": (", ".join(hashtags) if isinstance(hashtags, list) else hashtags) or False,
+            "recomendaciones": item.get("recomendaciones") or False,
+        })
+
+    return vals_list
+
+
+def propuesta_seq_key(tipo, titulo):
+    """Clave estable (tipo, número) a partir de un título numerado como 'Post 03 - ...'; None si no está numerado."""
+    prefijo = (titulo or "").split(" - ", 1)[0].split()
+    if len(prefijo) != 2 or not prefijo[1].isdigit():
+        return None
+    return tipo, prefijo[1]
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import logging
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import psycopg2
+import requests
+
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+
+_logger = logging.getLogger(__name__)
+
+LLM_TIMEOUT = 40  # segundos por llamada a chat/completions
+LLM_DEFAULT_WORKERS = 4
+LLM_DEFAULT_CACHE_TTL_HOURS = 24 * 7
+LLM_CACHE_MAX_ENTRIES = 5000  # al superarlo se eliminan las respuestas menos usadas recientemente
+LLM_CALL_RETENTION_DAYS = 90
+
+
+class GlLlmCache(models.Model):
+    _name = 'gl.llm.cache'
+    _description = 'Caché de respuestas de IA'
+    _rec_name = 'key'
+    _sql_constraints = [
+        ('key_unique', 'unique(key)', 'Ya existe una respuesta en caché para este prompt.'),
+    ]
+
+    key = fields.Char('Hash del prompt', required=True, index=True, readonly=True)
+    model = fields.Char('Modelo', readonly=True)
+    response = fields.Text('Respuesta', readonly=True)
+    expires_at = fields.Datetime('Expira', required=True, index=True, readonly=True)
+    last_hit = fields.Datetime('Último uso', readonly=True)
+    hit_count = fields.Integer('Usos', readonly=True)
+
+    @api.autovacuum
+    def _gc_expired(self):
+        """Elimina las respuestas vencidas y, sobre el máximo, las menos usadas recientemente."""
+        Cache = self.sudo()
+        Cache.search([('expires_at', '<', fields.Datetime.now())]).unlink()
+        Cache.search([], order='last_hit desc, id desc', offset=LLM_CACHE_MAX_ENTRIES).unlink()
+
+
+class GlLlmCall(models.Model):
+    _name = 'gl.llm.call'
+    _description = 'Llamadas a la IA'
+    _order = 'id desc'
+
+    origin = fields.Char('Origen', index=True, readonly=True)
+    model = fields.Char('Modelo', readonly=True)
+    key = fields.Char('Hash del prompt', readonly=True)
+    cache_hit = fields.Boolean('Desde caché', readonly=True)
+    prompt_tokens = fields.Integer('Tokens de entrada', readonly=True)
+    completion_tokens = fields.Integer('Tokens de salida', readonly=True)
+    total_tokens = fields.Integer('Tokens totales', readonly=True)
+    latency_ms = fields.Integer('Latencia (ms)', readonly=True, aggregator='avg')
+    success = fields.Boolean('Exitoso', readonly=True)
+    error = fields.Char('Error', readonly=True)
+
+    @api.autovacuum
+    def _gc_old_calls(self):
+        limit = fields.Datetime.now() - timedelta(days=LLM_CALL_RETENTION_DAYS)
+        self.sudo().search([('create_date', '<', limit)]).unlink()
+
+
+class GlLlmGateway(models.AbstractModel):
+    _name = 'gl.llm.gateway'
+    _description = 'Puerta de enlace a la IA (chat/completions)'
+
+    @api.model
+    def _get_config(self):
+        icp = self.env['ir.config_parameter'].sudo()
+        api_key = icp.get_param('chatgpt.api_key')
+        if not api_key:
+            raise ValidationError("No se ha configurado la API Key de ChatGPT en Ajustes del sistema.")
+        return {
+            'api_key': api_key,
+            'base_url': (icp.get_param('chatgpt.base_url') or 'https://api.openai.com/v1').rstrip('/'),
+            'model': icp.get_param('chatgpt.model') or 'gpt-4.1-mini',
+            'ttl_hours': int(icp.get_param('chatgpt.cache_ttl_hours') or LLM_DEFAULT_CACHE_TTL_HOURS),
+            'max_workers': max(1, int(icp.get_param('chatgpt.max_workers') or LLM_DEFAULT_WORKERS)),
+        }
+
+    @api.model
+    def _chat(self, messages, temperature=0.5, origin=None):
+        """Una sola consulta; devuelve el texto de la respuesta o lanza ValidationError."""
+        result = self._chat_many([{'messages': messages, 'temperature': temperature}], origin=origin)[0]
+        if result['error']:
+            raise ValidationError(f"Error al consultar la IA: {result['error']}")
+        return result['content']
+
+    @api.model
+    def _chat_many(self, prompts, origin=None, force=False):
+        """Resuelve varias consultas: primero la caché, luego las faltantes en paralelo.
+
+        prompts: lista de {'messages': [...], 'temperature': float}.
+        force (o el contexto gl_llm_force): no se lee la caché; la respuesta nueva la reemplaza.
+        Devuelve una lista (mismo orden) de {'content', 'error', 'cached'}.
+        """
+        config = self._get_config()
+        payloads = [{
+            'model': config['model'],
+            'messages': prompt['messages'],
+            'temperature': prompt.get('temperature', 0.5),
+        } for prompt in prompts]
+        keys = [prompt_key(payload) for payload in payloads]
+
+        Cache = self.env['gl.llm.cache'].sudo()
+        now = fields.Datetime.now()
+        cached = {}
+        if not (force or self.env.context.get('gl_llm_force')):
+            cached = {c.key: c for c in Cache.search([('key', 'in', list(set(keys))), ('expires_at', '>', now)])}
+
+        # Prompts idénticos dentro del mismo lote se consultan una sola vez
+        pending = {}
+        for key, payload in zip(keys, payloads):
+            if key not in cached:
+                pending.setdefault(key, payload)
+
+        responses = {}
+        if pending:
+            workers = min(config['max_workers'], len(pending))
+            # Los hilos solo hacen HTTP: la caché y el registro se escriben después, en este hilo
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {key: pool.submit(call_chat_completion, config['base_url'], config['api_key'], payload)
+                           for key, payload in pending.items()}
+                responses = {key: future.result() for key, future in futures.items()}
+
+        self._store_responses(responses, config, origin)
+
+        for entry in cached.values():
+            entry.write({'last_hit': now, 'hit_count': entry.hit_count + keys.count(entry.key)})
+
+        results = []
+        for key in keys:
+            if key in cached:
+                results.append({'content': cached[key].response, 'error': False, 'cached': True})
+            else:
+                response = responses[key]
+                results.append({'content': response['content'], 'error': response['error'], 'cached': False})
+
+        if cached:
+            self.env['gl.llm.call'].sudo().create([{
+                'origin': origin,
+                'model': config['model'],
+                'key': key,
+                'cache_hit': True,
+                'success': True,
+            } for key in keys if key in cached])
+        return results
+
+    @api.model
+    def _prepare_stream(self, messages, temperature=0.5, origin=None, force=False):
+        """Prepara una consulta en streaming: si el prompt está en caché devuelve la respuesta guardada.
+
+        La clave es la misma que en _chat_many, así que ambos modos comparten la caché.
+        force (botón "Regenerar"): se ignora la caché y la respuesta nueva reemplaza a la guardada.
+        """
+        config = self._get_config()
+        payload = {'model': config['model'], 'messages': messages, 'temperature': temperature}
+        key = prompt_key(payload)
+
+        now = fields.Datetime.now()
+        cached = self.env['gl.llm.cache'].sudo()
+        if not (force or self.env.context.get('gl_llm_force')):
+            cached = cached.search([('key', '=', key), ('expires_at', '>', now)], limit=1)
+        if cached:
+            cached.write({'last_hit': now, 'hit_count': cached.hit_count + 1})
+            self.env['gl.llm.call'].sudo().create({
+                'origin': origin,
+                'model': config['model'],
+                'key': key,
+                'cache_hit': True,
+                'success': True,
+            })
+
+        return {'config': config, 'payload': payload, 'key': key, 'cached': cached.response or False}
+
+    @api.model
+    def _store_responses(self, responses, config, origin):
+        """Guarda en caché las respuestas exitosas y registra el uso de tokens y la latencia."""
+        if not responses:
+            return
+
+        now = fields.Datetime.now()
+        expires_at = now + timedelta(hours=config['ttl_hours'])
+        Cache = self.env['gl.llm.cache'].sudo()
+        for key, response in responses.items():
+            if response['error']:
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    Cache.search([('key', '=', key)]).unlink()  # entrada vencida del mismo prompt
+                    Cache.create({
+                        'key': key,
+                        'model': config['model'],
+                        'response': response['content'],
+                        'expires_at': expires_at,
+                        'last_hit': now,
+                    })
+            except psycopg2.IntegrityError:
+                # Otra transacción guardó la misma respuesta en paralelo
+                _logger.debug("Respuesta de IA %s ya guardada por otra transacción", key)
+
+        self.env['gl.llm.call'].sudo().create([{
+            'origin': origin,
+            'model': config['model'],
+            'key': key,
+            'cache_hit': False,
+            'prompt_tokens': response['usage'].get('prompt_tokens', 0),
+            'completion_tokens': response['usage'].get('completion_tokens', 0),
+            'total_tokens': response['usage'].get('total_tokens', 0),
+            'latency_ms': response['latency_ms'],
+            'success': not response['error'],
+            'error': response['error'] and str(response['error'])[:500],
+        } for key, response in responses.items()])
+
+
+def prompt_key(payload):
+    """Hash estable del modelo, los mensajes y la temperatura."""
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def call_chat_completion(base_url, api_key, payload, timeout=LLM_TIMEOUT):
+    """Llama a chat/completions (sin ORM: se ejecuta en los hilos del pool)."""
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    t0 = time.monotonic()
+    try:
+        response = requests.post(f"{base_url}/chat/completions", headers=headers, json=payload, timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        return {
+            'content': data["choices"][0]["message"]["content"].strip(),
+            'usage': data.get("usage") or {},
+            'latency_ms': int((time.monotonic() - t0) * 1000),
+            'error': False,
+        }
+    except Exception as e:
+        return {
+            'content': False,
+            'usage': {},
+            'latency_ms': int((time.monotonic() - t0) * 1000),
+            'error': str(e),
+        }
+
+
+def stream_chat_completion(base_url, api_key, payload, stats, timeout=LLM_TIMEOUT):
+    """Llama a chat/completions con stream=True y va entregando los fragmentos de texto.
+
+    Sin ORM: se consume desde la respuesta HTTP una vez cerrado el cursor de la petición.
+    Al terminar deja en `stats` el uso de tokens, la latencia total y la del primer fragmento.
+    """
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    body = dict(payload, stream=True, stream_options={"include_usage": True})
+    t0 = time.monotonic()
+    stats.setdefault('usage', {})
+
+    with requests.post(f"{base_url}/chat/completions", headers=headers, json=body, stream=True,
+                       timeout=timeout) as response:
+        response.raise_for_status()
+        response.encoding = 'utf-8'
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+
+            chunk = json.loads(data)
+            if chunk.get("usage"):
+                stats['usage'] = chunk["usage"]
+            for choice in chunk.get("choices") or []:
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    stats.setdefault('first_token_ms', int((time.monotonic() - t0) * 1000))
+                    yield delta
+
+    stats['latency_ms'] = int((time.monotonic() - t0) * 1000)
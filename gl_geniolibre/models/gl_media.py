@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import logging
+import os
+import subprocess
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+from PIL import Image, ImageOps
+
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+
+_logger = logging.getLogger(__name__)
+
+FFPROBE_TIMEOUT = 10  # segundos; el archivo se lee directo del filestore
+FFMPEG_TIMEOUT = 300  # segundos por video normalizado
+
+# Renditions listas para las redes (Instagram/Facebook/TikTok aceptan hasta 1080 px de ancho)
+RENDITION_MAX_WIDTH = 1080
+RENDITION_JPEG_QUALITY = 88
+POSTER_FRAME_SECOND = 1
+MEDIA_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+class GlMediaMetadata(models.Model):
+    _name = 'gl.media.metadata'
+    _description = 'Metadatos de archivos multimedia'
+    _rec_name = 'checksum'
+    _sql_constraints = [
+        ('checksum_unique', 'unique(checksum)', 'Ya existen metadatos para este archivo.'),
+    ]
+
+    checksum = fields.Char('Checksum', required=True, index=True, readonly=True)
+    mimetype = fields.Char('Tipo MIME', readonly=True)
+    duration = fields.Integer('Duración (segundos)', readonly=True)
+    width = fields.Integer('Ancho', readonly=True)
+    height = fields.Integer('Alto', readonly=True)
+    codec = fields.Char('Códec', readonly=True)
+    file_size = fields.Integer('Tamaño (bytes)', readonly=True)
+
+    _CACHE_FIELDS = ['checksum', 'mimetype', 'duration', 'width', 'height', 'codec', 'file_size']
+
+    @api.model
+    def _get_for_attachments(self, attachments):
+        """Devuelve {checksum: metadatos} de los adjuntos.
+
+        Solo se ejecuta ffprobe para los checksums que aún no están en caché.
+        """
+        Metadata = self.sudo()
+        checksums = {c for c in attachments.mapped('checksum') if c}
+        if not checksums:
+            return {}
+
+        cache = {m['checksum']: m for m in Metadata.search_read([
+            ('checksum', 'in', list(checksums))
+        ], self._CACHE_FIELDS)}
+
+        pending = {}
+        for attachment in attachments:
+            if attachment.checksum and attachment.checksum not in cache:
+                pending.setdefault(attachment.checksum, attachment)
+
+        for checksum, attachment in pending.items():
+            vals = dict(attachment._gl_probe_media(), checksum=checksum, mimetype=attachment.mimetype)
+            try:
+                with self.env.cr.savepoint():
+                    Metadata.create(vals)
+            except psycopg2.IntegrityError:
+                # Otro proceso guardó el mismo checksum en paralelo: usamos lo calculado
+                _logger.debug("Metadatos de %s ya registrados por otra transacción", checksum)
+            cache[checksum] = vals
+
+        return cache
+
+
+class IrAttachment(models.Model):
+    _inherit = 'ir.attachment'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        attachments = super().create(vals_list)
+
+        # Los videos de tareas se sondean una sola vez al subirlos; las validaciones posteriores leen la caché.
+        # Los adjuntos de otros modelos (chatter, correo, otros módulos) no se sondean
+        videos = attachments.filtered(lambda a: a.mimetype == 'video/mp4' and a.res_model == 'project.task')
+        if videos:
+            try:
+                self.env['gl.media.metadata']._get_for_attachments(videos)
+            except ValidationError as e:
+                # No bloqueamos la subida: la validación de la tarea mostrará el error
+                _logger.warning("No se pudieron obtener los metadatos del video: %s", e)
+
+        return attachments
+
+    def _gl_media_source_path(self):
+        """Ruta local del archivo del adjunto. Devuelve (ruta, es_temporal)."""
+        self.ensure_one()
+        attachment = self.sudo()
+
+        if attachment.store_fname:
+            return attachment._full_path(attachment.store_fname), False
+
+        suffix = os.path.splitext(attachment.name or "")[1] or ".bin"
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+            tmp.write(attachment.raw or b'')
+        return tmp.name, True
+
+    def _gl_probe_media(self):
+        """Sondea el archivo del adjunto leyéndolo directamente del filestore (sin base64)."""
+        self.ensure_one()
+        attachment = self.sudo()
+
+        if attachment.store_fname:
+            return probe_media_file(attachment._full_path(attachment.store_fname))
+
+        # Adjuntos guardados en base de datos: volcamos los bytes crudos a un temporal
+        with tempfile.NamedTemporaryFile(delete=True, suffix=".mp4") as tmp:
+            tmp.write(attachment.raw or b'')
+            tmp.flush()
+            return probe_media_file(tmp.name)
+
+
+def probe_media_file(path):
+    """Obtiene duración, resolución, códec y tamaño de un archivo multimedia usando ffprobe."""
+    cmd = [
+        "ffprobe",
+        "-v",
+        "quiet",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "format=duration,size:stream=codec_name,width,height",
+        "-of",
+        "json",
+        path
+    ]
+
+    try:
+        output = subprocess.check_output(cmd, timeout=FFPROBE_TIMEOUT)
+        info = json.loads(output.decode("utf-8"))
+
+    except subprocess.TimeoutExpired:
+        raise ValidationError("ffprobe demoró demasiado y fue detenido. El archivo puede estar corrupto.")
+
+    except Exception as e:
+        raise ValidationError(f"No se pudo analizar el archivo usando ffprobe: {e}")
+
+    fmt = info.get("format") or {}
+    stream = (info.get("streams") or [{}])[0]
+    if not fmt.get("duration"):
+        raise ValidationError("No se pudo obtener la duración del video con ffprobe. El archivo puede estar corrupto.")
+
+    return {
+        "duration": int(float(fmt["duration"])),
+        "width": int(stream.get("width") or 0),
+        "height": int(stream.get("height") or 0),
+        "codec": stream.get("codec_name") or False,
+        "file_size": int(fmt.get("size") or 0),
+    }
+
+
+# ====================================================================================== Renditions
+# Funciones puras (sin ORM) que se ejecutan en los hilos del pool de preparación de medios.
+
+def render_jpeg(src_path, max_width=RENDITION_MAX_WIDTH, quality=RENDITION_JPEG_QUALITY):
+    """Genera un JPEG RGB redimensionado (sin EXIF, orientación aplicada) y devuelve sus bytes."""
+    with Image.open(src_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if image.width > max_width:
+            height = round(image.height * max_width / image.width)
+            image = image.resize((max_width, height), Image.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+        return output.getvalue()
+
+
+def normalize_mp4(src_path, max_width=RENDITION_MAX_WIDTH):
+    """Recodifica el video a H.264/AAC yuv420p con faststart y devuelve los bytes del MP4."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        out_path = os.path.join(tmp_dir, "normalizado.mp4")
+        cmd = [
+            "ffmpeg", "-y", "-v", "error",
+            "-i", src_path,
+            "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "high", "-pix_fmt", "yuv420p",
+            "-vf", f"scale='min({max_width},iw)':-2",
+            "-r", "30",
+            "-c:a", "aac", "-b:a", "128k", "-ar", "48000",
+            "-movflags", "+faststart",
+            out_path,
+        ]
+        subprocess.run(cmd, check=True, timeout=FFMPEG_TIMEOUT, capture_output=True)
+        with open(out_path, "rb") as f:
+            return f.read()
+
+
+def extract_poster(src_path, second=POSTER_FRAME_SECOND, max_width=RENDITION_MAX_WIDTH):
+    """Extrae un fotograma del video como JPEG (portada) y devuelve sus bytes."""
+    cmd = [
+        "ffmpeg", "-v", "error",
+        "-ss", str(second),
+        "-i", src_path,
+        "-frames:v", "1",
+        "-vf", f"scale='min({max_width},iw)':-2",
+        "-f", "image2", "-c:v", "mjpeg", "-q:v", "2",
+        "pipe:1",
+    ]
+    result = subprocess.run(cmd, check=True, timeout=FFPROBE_TIMEOUT * 3, capture_output=True)
+    if not result.stdout:
+        # Videos más cortos que POSTER_FRAME_SECOND: usamos el primer fotograma
+        cmd[cmd.index("-ss") + 1] = "0"
+        result = subprocess.run(cmd, check=True, timeout=FFPROBE_TIMEOUT * 3, capture_output=True)
+    return result.stdout
+
+
+def run_rendition_job(job):
+    """Punto de entrada del pool: job = (clave, tipo, ruta). Devuelve (clave, bytes, error)."""
+    key, kind, src_path = job
+    try:
+        if kind == "jpeg":
+            return key, render_jpeg(src_path), None
+        if kind == "mp4":
+            return key, normalize_mp4(src_path), None
+        if kind == "poster":
+            return key, extract_poster(src_path), None
+        return key, None, f"Tipo de rendition desconocido: {kind}"
+    except subprocess.CalledProcessError as e:
+        return key, None, (e.stderr or b"").decode("utf-8", "ignore")[-500:] or str(e)
+    except Exception as e:
+        return key, None, str(e)
+
+
+def run_rendition_jobs(jobs, max_workers=MEDIA_WORKERS):
+    """Ejecuta los jobs en un pool de hilos y devuelve los resultados en el mismo orden.
+
+    Hilos y no procesos: hacer fork dentro del servidor multihilo de Odoo copiaría conexiones y locks
+    de otros hilos. El trabajo pesado no retiene el GIL: ffmpeg corre como subproceso y PIL lo libera
+    al decodificar, redimensionar y codificar.
+    """
+    if not jobs:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+        return list(pool.map(run_rendition_job, jobs))
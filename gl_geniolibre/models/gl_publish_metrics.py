@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+TIMING_RETENTION_DAYS = 30
+SNAPSHOT_RETENTION_DAYS = 180
+SNAPSHOT_WINDOW = timedelta(minutes=15)  # igual al intervalo del cron de métricas
+
+NETWORKS = [
+    ('general', 'General'),
+    ('s3', 'S3'),
+    ('facebook', 'Facebook'),
+    ('instagram', 'Instagram'),
+    ('tiktok', 'TikTok'),
+    ('linkedin', 'LinkedIn'),
+]
+STAGES = [
+    ('queue', 'Espera en cola'),
+    ('s3_upload', 'Subida a S3'),
+    ('container', 'Creación de contenedor'),
+    ('upload', 'Subida'),
+    ('finalize', 'Finalización'),
+    ('status', 'Confirmación de estado'),
+]
+
+
+class GlPublishTiming(models.Model):
+    _name = 'gl.publish.timing'
+    _description = 'Tiempos de las etapas de publicación'
+    _order = 'started_at desc, id desc'
+
+    task_id = fields.Many2one('project.task', string='Tarea', required=True, ondelete='cascade', index=True)
+    project_id = fields.Many2one(related='task_id.project_id', store=True, string='Proyecto')
+    network = fields.Selection(NETWORKS, string='Red', required=True)
+    stage = fields.Selection(STAGES, string='Etapa', required=True)
+    started_at = fields.Datetime('Inicio', required=True, index=True)
+    duration = fields.Float('Duración (s)', digits=(16, 3), aggregator='avg')
+    success = fields.Boolean('Exitoso', default=True)
+    error = fields.Char('Error')
+
+    @api.autovacuum
+    def _gc_old_timings(self):
+        limit = fields.Datetime.now() - timedelta(days=TIMING_RETENTION_DAYS)
+        self.sudo().search([('started_at', '<', limit)]).unlink()
+
+
+class GlPublishSnapshot(models.Model):
+    _name = 'gl.publish.snapshot'
+    _description = 'Métricas agregadas de la cola de publicación'
+    _order = 'date desc'
+    _rec_name = 'date'
+
+    date = fields.Datetime('Fecha', required=True, index=True, default=fields.Datetime.now)
+    queue_depth = fields.Integer('Posts vencidos en cola', aggregator='max',
+                                 help="Posts Programados cuya fecha de publicación ya pasó")
+    queue_next_hour = fields.Integer('Programados próxima hora', aggregator='max')
+    processing_count = fields.Integer('En proceso', aggregator='max',
+                                      help="Posts en Procesando/Revisando esperando confirmación de las redes")
+    oldest_waiting = fields.Float('Mayor espera actual (min)', aggregator='max')
+    lateness_p50 = fields.Float('Retraso p50 (min)', aggregator='avg',
+                                help="Retraso respecto a la fecha de publicación de los posts iniciados en la ventana")
+    lateness_p95 = fields.Float('Retraso p95 (min)', aggregator='max')
+    published_count = fields.Integer('Posts iniciados', aggregator='sum')
+    fb_error_rate = fields.Float('Error Facebook (%)', aggregator='avg')
+    ig_error_rate = fields.Float('Error Instagram (%)', aggregator='avg')
+    tt_error_rate = fields.Float('Error TikTok (%)', aggregator='avg')
+    li_error_rate = fields.Float('Error LinkedIn (%)', aggregator='avg')
+    s3_error_rate = fields.Float('Error S3 (%)', aggregator='avg')
+
+    _ERROR_RATE_FIELDS = {
+        'facebook': 'fb_error_rate',
+        'instagram': 'ig_error_rate',
+        'tiktok': 'tt_error_rate',
+        'linkedin': 'li_error_rate',
+        's3': 's3_error_rate',
+    }
+
+    @api.model
+    def _cron_record_snapshot(self):
+        """Guarda la profundidad de la cola, los percentiles de retraso y la tasa de error por red."""
+        now = fields.Datetime.now()
+        window_start = now - SNAPSHOT_WINDOW
+        Task = self.env['project.task'].sudo()
+
+        vals = {
+            'date': now,
+            'queue_depth': Task.search_count([
+                ('post_estado', '=', 'Programado'), ('fecha_publicacion', '<=', now),
+            ]),
+            'queue_next_hour': Task.search_count([
+                ('post_estado', '=', 'Programado'),
+                ('fecha_publicacion', '>', now),
+                ('fecha_publicacion', '<=', now + timedelta(hours=1)),
+            ]),
+            'processing_count': Task.search_count([('post_estado', 'in', ['Procesando', 'Revisando'])]),
+        }
+
+        oldest = Task.search([
+            ('post_estado', '=', 'Programado'), ('fecha_publicacion', '<=', now),
+        ], order='fecha_publicacion', limit=1)
+        vals['oldest_waiting'] = (now - oldest.fecha_publicacion).total_seconds() / 60 if oldest else 0.0
+
+        # Percentiles del retraso real con que arrancaron los posts de la ventana (etapa 'queue')
+        self.env.cr.execute(SQL("""
+            SELECT count(*),
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY duration),
+                   percentile_cont(0.95) WITHIN GROUP (ORDER BY duration)
+              FROM gl_publish_timing
+             WHERE stage = 'queue' AND started_at >= %s
+        """, window_start))
+        count, p50, p95 = self.env.cr.fetchone()
+        vals.update({
+            'published_count': count,
+            'lateness_p50': (p50 or 0.0) / 60,
+            'lateness_p95': (p95 or 0.0) / 60,
+        })
+
+        Timing = self.env['gl.publish.timing'].sudo()
+        groups = Timing._read_group(
+            [('stage', '!=', 'queue'), ('started_at', '>=', window_start)],
+            groupby=['network', 'success'],
+            aggregates=['__count'],
+        )
+        totals, failures = {}, {}
+        for network, success, count in groups:
+            totals[network] = totals.get(network, 0) + count
+            if not success:
+                failures[network] = failures.get(network, 0) + count
+        for network, field_name in self._ERROR_RATE_FIELDS.items():
+            if totals.get(network):
+                vals[field_name] = 100.0 * failures.get(network, 0) / totals[network]
+
+        snapshot = self.sudo().create(vals)
+        if vals['queue_depth']:
+            _logger.info("Cola de publicación: %s posts vencidos (mayor espera %.1f min)",
+                         vals['queue_depth'], vals['oldest_waiting'])
+        return snapshot
+
+    @api.autovacuum
+    def _gc_old_snapshots(self):
+        limit = fields.Datetime.now() - timedelta(days=SNAPSHOT_RETENTION_DAYS)
+        self.sudo().search([('date', '<', limit)]).unlink()
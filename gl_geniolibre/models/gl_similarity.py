@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+import logging
+import math
+import re
+import threading
+import unicodedata
+
+from collections import Counter, OrderedDict
+from datetime import timedelta
+
+import numpy as np
+
+from odoo import models, api
+from odoo.tools import html2plaintext
+
+_logger = logging.getLogger(__name__)
+
+SIMILARITY_THRESHOLD = 0.6  # coseno desde el que una propuesta se marca como posible repetición
+SIMILARITY_MAX_INDEXES = 200  # índices de clientes en memoria por proceso (LRU)
+# write_date es la hora de inicio de la transacción: una escritura que confirma después de una
+# sincronización puede tener un write_date anterior. Se vuelve a leer este margen en cada sincronización
+SIMILARITY_SYNC_OVERLAP = timedelta(minutes=15)
+VOCAB_COMPACT_RATIO = 2  # se compacta el vocabulario cuando tiene el doble de términos de los que se usan
+
+_TOKEN_RE = re.compile(r"[a-z0-9ñ]{3,}")
+STOPWORDS = frozenset("""
+    para por con sin los las del una uno unos unas que como mas pero sus este esta estos estas ese esa esos esas
+    son sea ser fue han hay muy todo toda todos todas cada entre sobre desde hasta cuando donde porque tambien
+    nos nuestro nuestra nuestros nuestras tus tuyo tuya ellos ellas usted ustedes aqui alli asi solo
+    the and for you your with this that are our from
+""".split())
+
+# (dbname, partner_id) → PartnerIndex; cada proceso de Odoo mantiene los suyos
+_INDEXES = OrderedDict()
+_INDEXES_LOCK = threading.Lock()
+
+
+class GlSimilarityIndex(models.AbstractModel):
+    _name = 'gl.similarity.index'
+    _description = 'Índice de similitud de contenidos por cliente'
+
+    @api.model
+    def _top_k(self, partner_id, texts, k=3):
+        """Devuelve, para cada texto, las k tareas pasadas del cliente más parecidas: [[(task_id, score)], ...]."""
+        if not partner_id or not texts:
+            return [[] for _ in texts]
+
+        index = self._get_index(partner_id)
+        with index.lock:
+            return [index.query(tokenize(text), k) for text in texts]
+
+    @api.model
+    def _get_index(self, partner_id):
+        key = (self.env.cr.dbname, partner_id)
+        with _INDEXES_LOCK:
+            index = _INDEXES.get(key)
+            if index is None:
+                index = _INDEXES[key] = PartnerIndex()
+                while len(_INDEXES) > SIMILARITY_MAX_INDEXES:
+                    _INDEXES.popitem(last=False)
+            _INDEXES.move_to_end(key)
+
+        with index.lock:
+            self._sync_index(index, partner_id)
+        return index
+
+    @api.model
+    def _sync_index(self, index, partner_id):
+        """Agrega al índice solo las tareas nuevas o modificadas desde la última sincronización."""
+        Task = self.env['project.task'].sudo().with_context(active_test=False)
+        domain = [('partner_id', '=', partner_id)]
+
+        changed_domain = list(domain)
+        if index.synced_at:
+            # Con margen: las transacciones largas que confirman tarde también se indexan (upsert idempotente)
+            changed_domain.append(('write_date', '>=', index.synced_at - SIMILARITY_SYNC_OVERLAP))
+        tasks = Task.search_read(changed_domain, ['description', 'hashtags', 'texto_en_diseno', 'write_date'])
+
+        for task in tasks:
+            text = " ".join([
+                html2plaintext(task['description'] or ''),
+                task['hashtags'] or '',
+                task['texto_en_diseno'] or '',
+            ])
+            index.upsert(task['id'], tokenize(text))
+            if not index.synced_at or task['write_date'] > index.synced_at:
+                index.synced_at = task['write_date']
+
+        # Tareas eliminadas o movidas a otro cliente: se comparan los IDs, no la cantidad, porque
+        # una baja y un alta en el mismo intervalo dejan el conteo igual
+        current_ids = set(Task.search(domain).ids)
+        if index.known_ids - current_ids:
+            index.retain(current_ids)
+
+        if tasks:
+            _logger.debug("Índice de similitud del cliente %s: %s tareas actualizadas", partner_id, len(tasks))
+
+
+class PartnerIndex:
+    """Matriz TF-IDF dispersa (CSR en arrays de NumPy) de las tareas de un cliente.
+
+    Los conteos de términos por tarea se guardan por separado; al cambiar alguna tarea solo se
+    reconstruyen los arrays (O(nnz)), sin volver a tokenizar el resto.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.vocab = {}
+        self.docs = {}  # task_id → (columnas, conteos)
+        self.known_ids = set()  # incluye tareas sin texto
+        self.synced_at = None
+        self.dirty = True
+
+    def upsert(self, task_id, tokens):
+        self.known_ids.add(task_id)
+        if not tokens:
+            self.dirty |= self.docs.pop(task_id, None) is not None
+            return
+
+        counts = Counter(tokens)
+        columns = np.fromiter((self.vocab.setdefault(term, len(self.vocab)) for term in counts),
+                              dtype=np.int32, count=len(counts))
+        self.docs[task_id] = (columns, np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        self.dirty = True
+
+    def retain(self, task_ids):
+        self.known_ids &= task_ids
+        for task_id in set(self.docs) - task_ids:
+            del self.docs[task_id]
+        self._compact_vocab()
+        self.dirty = True
+
+    def _compact_vocab(self):
+        """Quita del vocabulario los términos que ya no usa ninguna tarea y renumera las columnas."""
+        if self.docs:
+            used = np.unique(np.concatenate([columns for columns, _counts in self.docs.values()]))
+        else:
+            used = np.zeros(0, dtype=np.int32)
+        remap = np.full(len(self.vocab), -1, dtype=np.int32)
+        remap[used] = np.arange(len(used), dtype=np.int32)
+        self.vocab = {term: int(remap[column]) for term, column in self.vocab.items() if remap[column] >= 0}
+        self.docs = {task_id: (remap[columns], counts) for task_id, (columns, counts) in self.docs.items()}
+
+    def _build(self):
+        self.ids = np.fromiter(self.docs, dtype=np.int64, count=len(self.docs))
+        columns, counts = zip(*self.docs.values()) if self.docs else ((), ())
+        lengths = np.fromiter((len(c) for c in columns), dtype=np.int64, count=len(columns))
+
+        self.indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.indptr[1:])
+        self.indices = np.concatenate(columns) if columns else np.zeros(0, dtype=np.int32)
+        tf = np.concatenate(counts) if counts else np.zeros(0, dtype=np.float32)
+
+        df = np.bincount(self.indices, minlength=len(self.vocab))
+        used = np.count_nonzero(df)
+        if len(self.vocab) > VOCAB_COMPACT_RATIO * max(used, 1):
+            # Tareas reescritas dejan términos sin uso: se compacta y se reconstruye
+            self._compact_vocab()
+            return self._build()
+        self.idf = (np.log((1 + len(self.ids)) / (1 + df)) + 1).astype(np.float32)
+
+        data = (1 + np.log(tf)) * self.idf[self.indices]
+        if len(self.ids):
+            norms = np.sqrt(np.add.reduceat(data * data, self.indptr[:-1]))
+            data /= np.repeat(norms, lengths)
+        self.data = data
+        self.dirty = False
+
+    def query(self, tokens, k):
+        if self.dirty:
+            self._build()
+        if not len(self.ids) or not tokens:
+            return []
+
+        query = np.zeros(len(self.vocab), dtype=np.float32)
+        for term, count in Counter(tokens).items():
+            column = self.vocab.get(term)
+            if column is not None and column < len(self.idf):
+                query[column] = (1 + math.log(count)) * self.idf[column]
+        norm = np.linalg.norm(query)
+        if not norm:
+            return []
+        query /= norm
+
+        # Producto CSR × vector: un reduceat sobre todas las tareas del cliente
+        scores = np.add.reduceat(self.data * query[self.indices], self.indptr[:-1])
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+
+def tokenize(text):
+    """Minúsculas sin tildes (conserva la ñ), sin stopwords ni palabras de menos de 3 letras."""
+    text = (text or "").lower().replace("ñ", "\0")
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").replace("\0", "ñ")
+    return [t for t in _TOKEN_RE.findall(text) if t not in STOPWORDS and not t.isdigit()]
@@ -1,13 +1,23 @@
-from datetime import date
+import json
+import pytz
+
+from datetime import date, datetime, time
 
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
 
+DIGEST_MAX_CHARS = 1500  # tope del resumen que se envía en los prompts
+DIGEST_TOP = 3  # tipos de post y horas por red
+
 
 class gl_social_reports(models.Model):
     _name = 'gl.social.reports'
     _rec_name = 'partner_id'
     _description = 'Resumen mensual de métricas sociales por cliente'
+    _sql_constraints = [
+        ('partner_period_unique', 'unique(partner_id, date_start, date_end)',
+         'Ya existe un reporte de este cliente para el mismo período.'),
+    ]
 
     partner_id = fields.Many2one(
         comodel_name='res.partner',
@@ -24,4 +34,152 @@ class gl_social_reports(models.Model):
     # Metadata
     report_generated = fields.Boolean(string="Reporte generado", default=False)
     data_json=fields.Text(string="Datos del reporte")
+    digest = fields.Text(string="Resumen para IA", compute='_compute_digest', store=True,
+                         help="Resumen compacto (tipos de post, engagement y mejores horas) que usan los prompts de contenido")
+
+    @api.depends('data_json', 'partner_id.tz')
+    def _compute_digest(self):
+        for record in self:
+            try:
+                data = json.loads(record.data_json or "{}")
+            except ValueError:
+                data = {}
+            if not data:
+                record.digest = False
+                continue
+            try:
+                tz = pytz.timezone(record.partner_id.tz or "UTC")
+            except pytz.UnknownTimeZoneError:
+                tz = pytz.UTC
+            digest = build_metrics_digest(data, tz, record.date_end or date.today())
+            record.digest = json.dumps(digest, ensure_ascii=False, separators=(",", ":"))
+
+    @api.model
+    def _gl_store_report(self, partner, date_start, date_end, data):
+        """Guarda (o reemplaza) los datos del reporte del cliente para el período."""
+        vals = {
+            'data_json': json.dumps(data, ensure_ascii=False, default=str),
+            'report_generated': True,
+        }
+        report = self.sudo().search([
+            ('partner_id', '=', partner.id),
+            ('date_start', '=', date_start),
+            ('date_end', '=', date_end),
+        ], limit=1)
+        if report:
+            report.write(vals)
+        else:
+            report = self.sudo().create(dict(vals, partner_id=partner.id, date_start=date_start, date_end=date_end))
+        return report
+
+    @api.model
+    def _gl_get_digest(self, partner, before=None):
+        """Resumen del último reporte del cliente terminado antes de `before` (o el más reciente); {} si no hay."""
+        domain = [('partner_id', '=', partner.id), ('digest', '!=', False)]
+        Report = self.sudo()
+        report = Report.browse()
+        if before:
+            report = Report.search(domain + [('date_end', '<=', before)], order='date_end desc, id desc', limit=1)
+        if not report:
+            report = Report.search(domain, order='date_end desc, id desc', limit=1)
+        return json.loads(report.digest) if report else {}
+
+
+def build_metrics_digest(data, tz, ref_date):
+    """Reduce los datos de un reporte a un resumen acotado a DIGEST_MAX_CHARS.
+
+    Si el resumen no entra, se reduce primero la cantidad de tipos y horas por red y luego
+    se quitan redes desde la de menor prioridad.
+    """
+    period = data.get('report_period') or {}
+    for top in range(DIGEST_TOP, 0, -1):
+        digest = {"periodo": period, **_digest_sections(data, tz, ref_date, top)}
+        if _size(digest) <= DIGEST_MAX_CHARS:
+            return digest
+
+    while len(digest) > 1 and _size(digest) > DIGEST_MAX_CHARS:
+        digest.popitem()
+    return digest
+
+
+def _digest_sections(data, tz, ref_date, top):
+    secciones = {}
+
+    fb = data.get('facebook_data') or {}
+    if fb:
+        secciones['facebook'] = {
+            'engagement_rate': (fb.get('totals') or {}).get('engagement_rate', 0),
+            'tipos_top': top_tipos(fb.get('post_type_summary'), top, base='views',
+                                   engagement=lambda s: s.get('reactions', 0) + s.get('comments', 0) + s.get('shares', 0)),
+            'mejores_horas': mejores_horas(fb.get('hour_summary'), top, tz, ref_date),
+        }
+
+    ig = data.get('instagram_data') or {}
+    if ig:
+        totals = ig.get('totals') or {}
+        secciones['instagram'] = {
+            'engagement_rate': _rate(totals.get('total_interactions', 0), totals.get('reach', 0)),
+            'tipos_top': top_tipos(ig.get('summary_by_type'), top, base='reach',
+                                   engagement=lambda s: s.get('total_interactions', 0)),
+            'mejores_horas': mejores_horas(ig.get('hour_summary'), top, tz, ref_date),
+        }
+
+    tt = (data.get('tiktok_data') or {}).get('resumen') or {}
+    if tt:
+        secciones['tiktok'] = {
+            'videos': tt.get('total_videos', 0),
+            'engagement_rate': _rate(tt.get('total_likes', 0) + tt.get('total_comments', 0) + tt.get('total_shares', 0),
+                                     tt.get('total_views', 0)),
+        }
+
+    li = data.get('linkedin_data') or {}
+    if li:
+        tipos = li.get('post_type_summary') or {}
+        engagement = lambda s: s.get('reactions', 0) + s.get('comments', 0) + s.get('shares', 0) + s.get('clicks', 0)
+        secciones['linkedin'] = {
+            'engagement_rate': _rate(sum(engagement(s) for s in tipos.values()),
+                                     sum(s.get('reach', 0) for s in tipos.values())),
+            'tipos_top': top_tipos(tipos, top, base='reach', engagement=engagement),
+        }
+
+    return secciones
+
+
+def top_tipos(resumen, top, base, engagement):
+    """Tipos de post con mejor engagement por post (o, sin conteo de posts, mejor tasa sobre `base`)."""
+    tipos = []
+    for tipo, stats in (resumen or {}).items():
+        stats = stats or {}
+        valor = engagement(stats)
+        entry = {'tipo': tipo}
+        if stats.get('posts'):
+            entry.update(posts=stats['posts'], engagement_por_post=round(valor / stats['posts'], 1))
+        if stats.get(base):
+            entry['engagement_rate'] = _rate(valor, stats[base])
+        score = entry.get('engagement_por_post', entry.get('engagement_rate'))
+        if score is not None:
+            tipos.append((score, entry))
+    return [entry for _score, entry in sorted(tipos, key=lambda t: t[0], reverse=True)[:top]]
+
+
+def mejores_horas(resumen, top, tz, ref_date):
+    """Horas locales del cliente con más engagement por post, a partir del resumen por hora UTC."""
+    horas = []
+    for hora, stats in (resumen or {}).items():
+        if not stats.get('posts'):
+            continue
+        utc = pytz.UTC.localize(datetime.combine(ref_date, time(int(hora))))
+        horas.append((stats['engagement'] / stats['posts'], {
+            'hora': utc.astimezone(tz).strftime('%H:00'),
+            'posts': stats['posts'],
+            'engagement_por_post': round(stats['engagement'] / stats['posts'], 1),
+        }))
+    return [entry for _score, entry in sorted(horas, key=lambda t: t[0], reverse=True)[:top]]
+
+
+def _size(digest):
+    return len(json.dumps(digest, ensure_ascii=False, separators=(",", ":")))
+
 
+def _rate(valor, base):
+    return round(100.0 * valor / base, 2) if base else 0.0
@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+
+_logger = logging.getLogger(__name__)
+
+TOKEN_REFRESH_MARGIN = timedelta(hours=6)  # se renueva con este margen antes de expirar
+TOKEN_RETRY_DELAY = timedelta(hours=1)  # espera mínima entre ejecuciones si una renovación falla
+TOKEN_RECHECK_INTERVAL = timedelta(days=1)  # revisión máxima aunque no haya expiraciones conocidas
+TIKTOK_REFRESH_BATCH = 20  # contactos por lote de renovación
+TIKTOK_REFRESH_WORKERS = 4  # llamadas simultáneas a TikTok dentro de un lote
+
+TIKTOK_TOKEN_URL = "https://open.tiktokapis.com/v2/oauth/token/"
+TIKTOK_TOKEN_FIELDS = ['tiktok_access_token', 'tiktok_expires_in', 'tiktok_refresh_expires_in',
+                       'tiktok_refresh_token', 'tiktok_issued_at', 'tiktok_token_expiry']
+LINKEDIN_TOKEN_URL = "https://www.linkedin.com/oauth/v2/accessToken"
+
+
+class GlTokenManager(models.AbstractModel):
+    _name = 'gl.token.manager'
+    _description = 'Gestor de tokens de redes sociales'
+
+    # ====================================================================================== Tokens vigentes
+    # Publicación y reportes piden aquí el token: si está por expirar se renueva antes de devolverlo.
+
+    @api.model
+    def _get_tiktok_token(self, partner):
+        partner = partner.sudo()
+        if partner.tiktok_refresh_token and self._is_expiring(partner.tiktok_token_expiry):
+            self._refresh_tiktok_committed(partner)
+        return partner.tiktok_access_token
+
+    @api.model
+    def _get_facebook_page_token(self, partner):
+        partner = partner.sudo()
+        if partner.facebook_page_id and self._is_expiring(partner.facebook_page_token_expiry):
+            self._refresh_facebook(partner)
+        return partner.facebook_page_access_token
+
+    @api.model
+    def _get_linkedin_token(self):
+        parametros = self.env['ir.config_parameter'].sudo()
+        expiry = parse_expiry(parametros.get_param('linkedin.token_expiry'))
+        if parametros.get_param('linkedin.refresh_token') and self._is_expiring(expiry):
+            self._refresh_linkedin()
+        return parametros.get_param('linkedin.access_token')
+
+    @api.model
+    def _ensure_partner_tokens(self, partners):
+        """Renueva los tokens de los contactos que estén por expirar (sin interrumpir si alguno falla)."""
+        now = fields.Datetime.now()
+        partners = partners.sudo()
+        tiktok = partners.filtered(lambda p: p.tiktok_refresh_token and self._is_expiring(p.tiktok_token_expiry, now))
+        facebook = partners.filtered(lambda p: p.facebook_page_id and self._is_expiring(p.facebook_page_token_expiry, now))
+
+        if tiktok:
+            self._refresh_tiktok_committed(tiktok, raise_errors=False)
+        if facebook:
+            self._refresh_facebook(facebook, raise_errors=False)
+
+    @api.model
+    def _is_expiring(self, expiry, now=None):
+        """False = sin expiración conocida (p.ej. tokens de página que no expiran)."""
+        if self.env['ir.config_parameter'].sudo().get_param('gl_publish.dry_run_url'):
+            # Dry-run: el servidor local acepta cualquier token, no se renueva contra las APIs reales
+            return False
+        return bool(expiry) and expiry <= (now or fields.Datetime.now()) + TOKEN_REFRESH_MARGIN
+
+    # ====================================================================================== Renovación por proveedor
+
+    @api.model
+    def _refresh_tiktok(self, partners, raise_errors=True, commit=False):
+        """Renueva los tokens en lotes: HTTP en paralelo y escrituras en este hilo.
+
+        commit=True (cron): se confirma cada contacto apenas se guarda su token. TikTok rota el
+        refresh token en cada renovación, así que un error posterior no debe deshacer los ya guardados.
+        """
+        parametros = self.env['ir.config_parameter'].sudo()
+        tiktok_client = parametros.get_param('tiktok_key')
+        tiktok_secret = parametros.get_param('tiktok_secret')
+        if not tiktok_client or not tiktok_secret:
+            if raise_errors:
+                raise ValidationError("No se configuraron las claves de de TikTok")
+            _logger.error("No se configuraron las claves de TikTok: no se renuevan %s tokens", len(partners))
+            return ["No se configuraron las claves de de TikTok"]
+
+        partners = partners.sudo()
+        errors = []
+        for start in range(0, len(partners), TIKTOK_REFRESH_BATCH):
+            batch = partners[start:start + TIKTOK_REFRESH_BATCH]
+            refresh_tokens = [partner.tiktok_refresh_token for partner in batch]
+            with ThreadPoolExecutor(max_workers=min(TIKTOK_REFRESH_WORKERS, len(batch))) as pool:
+                results = list(pool.map(
+                    lambda token: request_tiktok_token(tiktok_client, tiktok_secret, token), refresh_tokens))
+
+            for partner, (response_data, error) in zip(batch, results):
+                if error:
+                    _logger.error("Error al renovar el token de TikTok del contacto %s: %s", partner.id, error)
+                    errors.append(f"{partner.display_name}: {error}")
+                    continue
+
+                vals = {
+                    'tiktok_access_token': response_data.get('access_token'),
+                    'tiktok_expires_in': response_data.get('expires_in'),
+                    'tiktok_refresh_expires_in': response_data.get('refresh_expires_in'),
+                    'tiktok_refresh_token': response_data.get('refresh_token'),
+                    'tiktok_issued_at': int(datetime.now().timestamp()),
+                }
+                if not commit:
+                    partner.with_context(gl_token_refresh=True).write(vals)
+                    continue
+                try:
+                    partner.with_context(gl_token_refresh=True).write(vals)
+                    self.env.cr.commit()
+                except Exception as e:
+                    # Solo se pierde este contacto: los anteriores ya quedaron confirmados
+                    self.env.cr.rollback()
+                    _logger.exception("No se pudo guardar el token de TikTok del contacto %s", partner.id)
+                    errors.append(f"{partner.display_name}: {e}")
+
+        if errors and raise_errors:
+            raise ValidationError("\n".join(errors))
+        return errors
+
+    @api.model
+    def _refresh_tiktok_committed(self, partners, raise_errors=True):
+        """Renueva los tokens de TikTok en un cursor propio que se confirma de inmediato.
+
+        Se usa desde publicación y reportes: TikTok rota el refresh token, así que si la transacción
+        que lo pidió se revierte después, el token nuevo ya debe estar guardado. La transacción actual
+        no ve esa escritura (su snapshot es anterior), por eso los valores nuevos se cargan en su caché.
+
+        Las filas se bloquean primero con SKIP LOCKED: si la transacción que llama (u otra) ya escribió
+        el contacto, esperar su bloqueo desde este cursor colgaría el proceso, así que ese contacto se
+        omite y se informa como error. Se debe llamar antes de escribir sobre los contactos.
+        """
+        partners = partners.sudo()
+        errors = []
+        if not partners:
+            return errors
+        with self.env.registry.cursor() as cr:
+            cr.execute("SELECT id FROM res_partner WHERE id IN %s FOR UPDATE SKIP LOCKED", [tuple(partners.ids)])
+            locked_ids = {row[0] for row in cr.fetchall()}
+            for partner in partners.filtered(lambda p: p.id not in locked_ids):
+                _logger.warning("Token de TikTok del contacto %s no renovado: el registro está bloqueado", partner.id)
+                errors.append(f"{partner.display_name}: el contacto está siendo modificado, se renovará en el próximo intento")
+
+            partners = partners.filtered(lambda p: p.id in locked_ids)
+            env = self.env(cr=cr)
+            errors += env['gl.token.manager']._refresh_tiktok(partners.with_env(env), raise_errors=False, commit=True)
+            values = {partner.id: [partner[fname] for fname in TIKTOK_TOKEN_FIELDS]
+                      for partner in partners.with_env(env).sudo()}
+
+        for partner in partners:
+            for fname, value in zip(TIKTOK_TOKEN_FIELDS, values[partner.id]):
+                self.env.cache.update(partner, partner._fields[fname], [value])
+
+        if errors and raise_errors:
+            raise ValidationError("\n".join(errors))
+        return errors
+
+    @api.model
+    def _refresh_facebook(self, partners, raise_errors=True):
+        """Vuelve a pedir el token de cada página con el token de usuario y guarda su expiración real."""
+        parametros = self.env['ir.config_parameter'].sudo()
+        API_VERSION = parametros.get_param('gl_facebook.api_version')
+        user_token = parametros.get_param('gl_facebook.api_key')
+        if not user_token:
+            raise ValidationError("No se configuró el token de usuario de Facebook.")
+
+        if self._is_expiring(parse_expiry(parametros.get_param('gl_facebook.token_expiry'))):
+            user_token = self._refresh_facebook_user_token() or user_token
+
+        errors = []
+        for partner in partners.sudo():
+            params = {
+                'fields': 'access_token,instagram_business_account',
+                'access_token': user_token,
+            }
+            url = f'https://graph.facebook.com/{API_VERSION}/{partner.facebook_page_id}'
+            try:
+                response = requests.get(url, params=params, timeout=20)
+                data = response.json()
+                if response.status_code != 200 or 'access_token' not in data:
+                    raise ValidationError(f"Error al obtener Tokens de Facebook: {data}")
+            except (requests.RequestException, ValueError, ValidationError) as e:
+                _logger.error("Error al renovar el token de página del contacto %s: %s", partner.id, e)
+                errors.append(f"{partner.display_name}: {e}")
+                continue
+
+            vals = {
+                'facebook_page_access_token': data['access_token'],
+                'facebook_page_token_expiry': self._facebook_token_expiry(data['access_token']),
+            }
+            if 'instagram_business_account' in data:
+                vals['instagram_page_id'] = data['instagram_business_account']['id']
+            partner.with_context(gl_token_refresh=True).write(vals)
+
+        if errors and raise_errors:
+            raise ValidationError("\n".join(errors))
+        return errors
+
+    @api.model
+    def _refresh_facebook_user_token(self):
+        """Intercambia el token de usuario por uno de larga duración y guarda su expiración."""
+        parametros = self.env['ir.config_parameter'].sudo()
+        API_VERSION = parametros.get_param('gl_facebook.api_version')
+        params = {
+            'grant_type': 'fb_exchange_token',
+            'client_id': parametros.get_param('gl_facebook.app_id'),
+            'client_secret': parametros.get_param('gl_facebook.secret'),
+            'fb_exchange_token': parametros.get_param('gl_facebook.api_key'),
+        }
+        try:
+            response = requests.get(f"https://graph.facebook.com/{API_VERSION}/oauth/access_token",
+                                    params=params, timeout=20)
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            _logger.error("Error al renovar el token de usuario de Facebook: %s", e)
+            return False
+
+        access_token = data.get('access_token')
+        if not access_token:
+            _logger.error("Error al renovar el token de usuario de Facebook: %s", data)
+            return False
+
+        parametros.set_param('gl_facebook.api_key', access_token)
+        self._store_facebook_user_token_expiry(access_token)
+        return access_token
+
+    @api.model
+    def _store_facebook_user_token_expiry(self, access_token):
+        expiry = self._facebook_token_expiry(access_token)
+        self.env['ir.config_parameter'].sudo().set_param(
+            'gl_facebook.token_expiry', fields.Datetime.to_string(expiry) if expiry else False)
+
+    @api.model
+    def _facebook_token_expiry(self, access_token):
+        """Expiración del token según debug_token (False si no expira o no se pudo consultar)."""
+        parametros = self.env['ir.config_parameter'].sudo()
+        API_VERSION = parametros.get_param('gl_facebook.api_version')
+        app_id = parametros.get_param('gl_facebook.app_id')
+        app_secret = parametros.get_param('gl_facebook.secret')
+        if not app_id or not app_secret:
+            return False
+
+        params = {
+            'input_token': access_token,
+            'access_token': f"{app_id}|{app_secret}",
+        }
+        try:
+            response = requests.get(f"https://graph.facebook.com/{API_VERSION}/debug_token", params=params, timeout=20)
+            expires_at = (response.json().get('data') or {}).get('expires_at')
+        except (requests.RequestException, ValueError) as e:
+            _logger.warning("No se pudo consultar debug_token de Facebook: %s", e)
+            return False
+
+        # expires_at = 0 → el token no expira
+        return timestamp_to_datetime(expires_at) if expires_at else False
+
+    @api.model
+    def _refresh_linkedin(self):
+        parametros = self.env['ir.config_parameter'].sudo()
+        data = {
+            "grant_type": "refresh_token",
+            "refresh_token": parametros.get_param('linkedin.refresh_token'),
+            "client_id": parametros.get_param('linkedin.client_id'),
+            "client_secret": parametros.get_param('linkedin.client_secret'),
+        }
+        try:
+            response = requests.post(LINKEDIN_TOKEN_URL, data=data, timeout=20)
+            token_data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            _logger.error("Error al renovar el token de LinkedIn: %s", e)
+            return False
+
+        if response.status_code != 200 or not token_data.get('access_token'):
+            _logger.error("Error al renovar el token de LinkedIn: %s", token_data)
+            return False
+
+        self._store_linkedin_token(token_data)
+        return token_data['access_token']
+
+    @api.model
+    def _store_linkedin_token(self, token_data):
+        """Guarda el token de LinkedIn con su expiración absoluta (UTC) y el refresh token si viene."""
+        parametros = self.env['ir.config_parameter'].sudo()
+        parametros.set_param('linkedin.access_token', token_data['access_token'])
+        if token_data.get('expires_in'):
+            expiry = fields.Datetime.now() + timedelta(seconds=int(token_data['expires_in']))
+            parametros.set_param('linkedin.token_expiry', fields.Datetime.to_string(expiry))
+        if token_data.get('refresh_token'):
+            parametros.set_param('linkedin.refresh_token', token_data['refresh_token'])
+
+    # ====================================================================================== Programación
+
+    @api.model
+    def _cron_refresh_tokens(self):
+        """Renueva por proveedor los tokens que expiran dentro del margen y programa la próxima ejecución."""
+        limit = fields.Datetime.now() + TOKEN_REFRESH_MARGIN
+        Partner = self.env['res.partner'].sudo()
+        parametros = self.env['ir.config_parameter'].sudo()
+
+        tiktok = Partner.search([('tiktok_refresh_token', '!=', False), ('tiktok_token_expiry', '<=', limit)])
+        if tiktok:
+            errors = self._refresh_tiktok(tiktok, raise_errors=False, commit=True)
+            _logger.info("Tokens de TikTok renovados: %s (errores: %s)", len(tiktok) - len(errors), len(errors))
+
+        facebook = Partner.search([
+            ('facebook_page_id', '!=', False),
+            ('facebook_page_token_expiry', '!=', False),
+            ('facebook_page_token_expiry', '<=', limit),
+        ])
+        if facebook:
+            errors = self._refresh_facebook(facebook, raise_errors=False)
+            _logger.info("Tokens de página de Facebook renovados: %s (errores: %s)",
+                         len(facebook) - len(errors), len(errors))
+        elif self._is_expiring(parse_expiry(parametros.get_param('gl_facebook.token_expiry'))):
+            self._refresh_facebook_user_token()
+
+        if parametros.get_param('linkedin.refresh_token') and self._is_expiring(
+                parse_expiry(parametros.get_param('linkedin.token_expiry'))):
+            self._refresh_linkedin()
+
+        self._schedule_next_refresh()
+
+    @api.model
+    def _schedule_next_refresh(self):
+        """Despierta el cron justo antes de la próxima expiración conocida."""
+        Partner = self.env['res.partner'].sudo()
+        parametros = self.env['ir.config_parameter'].sudo()
+        now = fields.Datetime.now()
+
+        expiries = [
+            Partner.search([('tiktok_refresh_token', '!=', False), ('tiktok_token_expiry', '!=', False)],
+                           order='tiktok_token_expiry asc', limit=1).tiktok_token_expiry,
+            Partner.search([('facebook_page_token_expiry', '!=', False)],
+                           order='facebook_page_token_expiry asc', limit=1).facebook_page_token_expiry,
+            parse_expiry(parametros.get_param('gl_facebook.token_expiry')),
+        ]
+        if parametros.get_param('linkedin.refresh_token'):
+            expiries.append(parse_expiry(parametros.get_param('linkedin.token_expiry')))
+
+        next_call = now + TOKEN_RECHECK_INTERVAL
+        for expiry in filter(None, expiries):
+            next_call = min(next_call, max(expiry - TOKEN_REFRESH_MARGIN, now + TOKEN_RETRY_DELAY))
+
+        # Un trigger futuro a esa hora o antes ya despierta el cron: no se acumulan duplicados.
+        # Los vencidos no cuentan: el que despertó la ejecución actual se borra al terminar
+        cron = self.env.ref('gl_geniolibre.ir_cron_refresh_tokens')
+        if not self.env['ir.cron.trigger'].sudo().search_count([
+            ('cron_id', '=', cron.id),
+            ('call_at', '>', now),
+            ('call_at', '<=', next_call),
+        ], limit=1):
+            cron._trigger(at=next_call)
+        return next_call
+
+
+def request_tiktok_token(client_key, client_secret, refresh_token):
+    """Pide un nuevo token a TikTok (sin ORM: se ejecuta en los hilos del pool); devuelve (datos, error)."""
+    headers = {
+        "Content-Type": "application/x-www-form-urlencoded",
+        "Cache-Control": "no-cache"
+    }
+    data = {
+        "client_key": client_key,
+        "client_secret": client_secret,
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token
+    }
+    try:
+        response = requests.post(TIKTOK_TOKEN_URL, headers=headers, data=data, timeout=20)
+        response_data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        return None, str(e)
+    if response.status_code != 200 or not response_data.get('access_token'):
+        return None, f"Error al renovar el token de TikTok: {response_data}"
+    return response_data, False
+
+
+def timestamp_to_datetime(timestamp):
+    """Epoch (segundos) → datetime naive en UTC, como lo guarda Odoo."""
+    return datetime.fromtimestamp(int(timestamp), tz=timezone.utc).replace(tzinfo=None)
+
+
+def parse_expiry(value):
+    """Lee una expiración guardada en ir.config_parameter ("YYYY-MM-DD HH:MM:SS"); False si no es válida."""
+    if not value:
+        return False
+    try:
+        return fields.Datetime.to_datetime(value)
+    except ValueError:
+        # Valores antiguos guardaban solo expires_in (segundos): se tratan como desconocidos
+        return False
@@ -83,15 +83,27 @@ class FacebookAdCampaigns(models.Model):
 
 class project_project(models.Model):
     _inherit = "project.project"
+    _sql_constraints = [
+        # Respaldo ante creaciones concurrentes; create/write validan antes con el mensaje detallado.
+        # Si ya existen duplicados en la base, Odoo no puede crear la restricción y solo lo registra en el log.
+        ('marketing_partner_unique',
+         "EXCLUDE (partner_id WITH =) WHERE (project_type = 'marketing' AND active)",
+         'Ya existe un proyecto de marketing para este cliente.'),
+    ]
     partner_id = fields.Many2one('res.partner')
     partner_plan_descripcion = fields.Char(related="partner_id.plan_descripcion")
     partner_plan_post = fields.Integer(string="Posts", related="partner_id.plan_post")
     partner_plan_historia = fields.Integer(string="Historias", related="partner_id.plan_historia")
     partner_plan_reel = fields.Integer(string="Reels", related="partner_id.plan_reel")
 
-    post_progress = fields.Char(string="Posts Publicados", compute="_compute_publication_counts", store=False)
-    historia_progress = fields.Char(string="Historias Publicadas", compute="_compute_publication_counts", store=False)
-    reel_progress = fields.Char(string="Reels Publicados", compute="_compute_publication_counts", store=False)
+    post_progress = fields.Char(string="Posts Publicados", compute="_compute_publication_progress", store=False)
+    historia_progress = fields.Char(string="Historias Publicadas", compute="_compute_publication_progress", store=False)
+    reel_progress = fields.Char(string="Reels Publicados", compute="_compute_publication_progress", store=False)
+
+    # Contadores guardados: se recalculan solo para los proyectos cuyas tareas cambian de tipo/estado
+    post_publicados = fields.Integer(string="Posts Publicados (cantidad)", compute="_compute_publication_counts", store=True)
+    historia_publicados = fields.Integer(string="Historias Publicadas (cantidad)", compute="_compute_publication_counts", store=True)
+    reel_publicados = fields.Integer(string="Reels Publicados (cantidad)", compute="_compute_publication_counts", store=True)
 
     # Este es el nuevo campo que se relaciona con tu modelo 'red.social'
     red_social_report_ids = fields.Many2many('red.social_reporte',  # El _name de tu modelo ya existente
@@ -117,63 +129,49 @@ class project_project(models.Model):
     partner_id_google_ads_account = fields.Char(related="partner_id.id_google_ads_account")
     google_ad_campaigns_ids = fields.One2many('google.ad.campaigns', 'project_id', string='Campañas de Google Ads')
 
-    @api.depends('task_ids.post_estado', 'task_ids.tipo', 'partner_plan_post', 'partner_plan_historia',
-                 'partner_plan_reel')
+    @api.depends('task_ids.post_estado', 'task_ids.tipo')
     def _compute_publication_counts(self):  # optimizado
+        # Un solo read_group para todo el recordset: publicaciones publicadas por proyecto y tipo
+        counts = {}
+        project_ids = [project_id for project_id in self.ids if project_id]
+        if project_ids:
+            for project, tipo, count in self.env['project.task']._read_group([
+                ('project_id', 'in', project_ids),
+                ('post_estado', '=', 'Publicado'),
+                ('tipo', 'in', ['feed', 'video_stories', 'video_reels']),
+            ], groupby=['project_id', 'tipo'], aggregates=['__count']):
+                counts[(project.id, tipo)] = count
+
+        for project in self:
+            project.post_publicados = counts.get((project.id, 'feed'), 0)
+            project.historia_publicados = counts.get((project.id, 'video_stories'), 0)
+            project.reel_publicados = counts.get((project.id, 'video_reels'), 0)
+
+    @api.depends('post_publicados', 'historia_publicados', 'reel_publicados', 'partner_plan_post',
+                 'partner_plan_historia', 'partner_plan_reel')
+    def _compute_publication_progress(self):
         for project in self:
-            # Usar el ORM de Odoo para calcular cantidades directamente en la búsqueda
-            tasks_data = self.env['project.task'].read_group(domain=[
-                ('project_id', '=', project.id)
-            ], fields=[
-                'tipo'
-            ], groupby=[
-                'tipo'
-            ])
-
-            # Inicializar contadores a 0
-            post_count = 0
-            historia_count = 0
-            reel_count = 0
-
-            # Mapear resultados del read_group
-            for data in tasks_data:
-                tipo = data['tipo']
-                count = data['tipo_count']
-                if tipo == 'feed':
-                    post_count = count
-                elif tipo == 'video_stories':
-                    historia_count = count
-                elif tipo == 'video_reels':
-                    reel_count = count
-
-            # Actualizar campos de progreso utilizando los valores calculados
-            project.post_progress = f"{post_count} de {project.partner_plan_post or 0} posts"
-            project.historia_progress = f"{historia_count} de {project.partner_plan_historia or 0} historias"
-            project.reel_progress = f"{reel_count} de {project.partner_plan_reel or 0} reels"
+            project.post_progress = f"{project.post_publicados} de {project.partner_plan_post or 0} posts"
+            project.historia_progress = f"{project.historia_publicados} de {project.partner_plan_historia or 0} historias"
+            project.reel_progress = f"{project.reel_publicados} de {project.partner_plan_reel or 0} reels"
 
     @api.model_create_multi
     def create(self, vals_list):  # optimizado
         """
         Validar duplicados de 'partner_id' y 'project_type' para evitar la creación de proyectos repetidos.
         """
-        for vals in vals_list:
-            partner_id = vals.get('partner_id')
-            project_type = vals.get('project_type')
-
-            # Comprobamos si ya existe un proyecto para este cliente y tipo,
-            # pero solo si el tipo es "marketing"
-            if partner_id and project_type == "marketing":
-                existing_project = self.sudo().search([
-                    ('partner_id', '=', partner_id),
-                    ('project_type', '=', project_type)
-                ], limit=1)
-
-                if existing_project:
-                    partner_name = self.env['res.partner'].browse(partner_id).name
-                    project_type_label = dict(
-                        self.fields_get()['project_type']['selection']).get(project_type, project_type)
-                    raise ValidationError(
-                        f"Ya existe un proyecto para el cliente '{partner_name}' con el tipo '{project_type_label}'.")
+        # Comprobamos si ya existe un proyecto para este cliente y tipo,
+        # pero solo si el tipo es "marketing"
+        pairs = [
+            (vals['partner_id'], vals['project_type'])
+            for vals in vals_list
+            if vals.get('partner_id') and vals.get('project_type') == "marketing"
+        ]
+        duplicate = self._find_duplicate_project(pairs)
+        if duplicate:
+            partner_name, project_type_label = self._duplicate_project_labels(duplicate)
+            raise ValidationError(
+                f"Ya existe un proyecto para el cliente '{partner_name}' con el tipo '{project_type_label}'.")
 
         # Creamos los registros utilizando la lógica estándar
         return super(project_project, self).create(vals_list)
@@ -190,33 +188,56 @@ class project_project(models.Model):
         if not partner_id and not project_type:
             return super(project_project, self).write(vals)
 
-        for record in self:
-            # Asignar valores "actuales" en caso de no estar en 'vals'
-            # if not self.google_ad_campaigns_ids:
-            #     if record.date_start and record.date:
-            #         if (record.date - record.date_start).days > 30:
-            #             raise ValidationError("El rango entre fechas no puede ser mayor a 30 días.")
-
-            updated_partner_id = partner_id or record.partner_id.id
-            updated_project_type = project_type or record.project_type
-
-            # Buscar proyectos existentes que coincidan con las condiciones
-            duplicate_project = self.sudo().search([
-                ('id', '!=', record.id),  # Evitar comparar con el mismo registro
-                ('partner_id', '=', updated_partner_id),
-                ('project_type', '=', updated_project_type)
-            ], limit=1)
-
-            if duplicate_project:
-                partner_name = self.env['res.partner'].browse(updated_partner_id).name
-                project_type_label = dict(
-                    self.fields_get()['project_type']['selection']).get(updated_project_type, updated_project_type)
-                raise ValidationError(
-                    f"Otro proyecto del cliente '{partner_name}' con el tipo '{project_type_label}' ya existe.")
+        # Asignar valores "actuales" en caso de no estar en 'vals'
+        pairs = [
+            (partner_id or record.partner_id.id, project_type or record.project_type)
+            for record in self
+        ]
+        duplicate = self._find_duplicate_project([pair for pair in pairs if pair[0]], exclude_ids=self.ids)
+        if duplicate:
+            partner_name, project_type_label = self._duplicate_project_labels(duplicate)
+            raise ValidationError(
+                f"Otro proyecto del cliente '{partner_name}' con el tipo '{project_type_label}' ya existe.")
 
         # Aplicar la escritura de los valores
         return super(project_project, self).write(vals)
 
+    @api.model
+    def _find_duplicate_project(self, pairs, exclude_ids=()):
+        """Devuelve el primer (partner_id, project_type) repetido del lote o ya existente, o None.
+
+        Una sola consulta agrupada para todo el lote.
+        """
+        if not pairs:
+            return None
+
+        # Repetidos dentro del mismo lote (importaciones masivas)
+        seen = set()
+        for pair in pairs:
+            if pair in seen:
+                return pair
+            seen.add(pair)
+
+        domain = [
+            ('partner_id', 'in', list({partner for partner, project_type in pairs})),
+            ('project_type', 'in', list({project_type for partner, project_type in pairs})),
+        ]
+        if exclude_ids:
+            domain.append(('id', 'not in', list(exclude_ids)))  # Evitar comparar con los mismos registros
+
+        existing = {
+            (partner.id, project_type)
+            for partner, project_type in self.sudo()._read_group(domain, groupby=['partner_id', 'project_type'])
+        }
+        return next((pair for pair in pairs if pair in existing), None)
+
+    @api.model
+    def _duplicate_project_labels(self, pair):
+        partner_id, project_type = pair
+        partner_name = self.env['res.partner'].browse(partner_id).name
+        selection = dict(self._fields['project_type']._description_selection(self.env))
+        return partner_name, selection.get(project_type, project_type)
+
     def fetch_campaigns(self):
         """Método del botón: ejecuta la descarga de campañas Google y Facebook
            pero solo si las redes están seleccionadas
@@ -929,7 +950,7 @@ class project_project(models.Model):
     def get_tiktok_data(self, since, until):
         try:
             headers = {
-                "Authorization": f"Bearer {self.partner_tiktok_access_token}",
+                "Authorization": f"Bearer {self.env['gl.token.manager']._get_tiktok_token(self.partner_id)}",
                 "Content-Type": "application/json"
             }
 
@@ -1028,7 +1049,7 @@ class project_project(models.Model):
 
     def get_linkedin_data(self, since, until):
         self.ensure_one()
-        access_token = (self.env["ir.config_parameter"].sudo().get_param("linkedin.access_token"))
+        access_token = self.env["gl.token.manager"]._get_linkedin_token()
         org_id_raw = self.partner_id.id_linkedin_organization
         since_ms = int(since) * 1000
         until_ms = int(until) * 1000
@@ -1356,6 +1377,7 @@ class project_project(models.Model):
 
     def action_generate_report(self):
         self.ensure_one()
+        self.env['gl.token.manager']._ensure_partner_tokens(self.partner_id)
         # Redes desde contexto (flujo) o desde el propio proyecto
         redes = self.red_social_report_ids.mapped("name")
 
@@ -1572,6 +1594,8 @@ class project_project(models.Model):
                                 'sticky': True,
                             },
                         }
+            # Queda guardado para el resumen de métricas de los flujos de contenido
+            self.env['gl.social.reports']._gl_store_report(self.partner_id, self.date_start, self.date, data)
             print("data",data)
             if self.env.context.get("raw_json"):
                 return {
@@ -2021,6 +2045,11 @@ def merge_final_facebook_data(chunks):
         all_page_follows.sort(key=lambda x: x[0])
         merged['totals']['page_follows'] = all_page_follows[-1][1]
 
+    # Engagement por hora de publicación (UTC), sobre todos los posts antes de recortar el top
+    merged['hour_summary'] = resumen_por_hora(
+        merged['top_posts'], 'created_time',
+        lambda p: p.get('reactions', 0) + p.get('comments', 0) + p.get('shares', 0))
+
     # ==========================
     # 🏆 TOP 5 POSTS POR VIEWS
     # ==========================
@@ -2143,6 +2172,8 @@ def merge_final_instagram_data(chunks):
             summary_by_type[media_type]['total_interactions'] += post.get('total_interactions', 0)
             summary_by_type[media_type]['video_views'] += post.get('video_views', post.get('plays', 0))
 
+    hour_summary = resumen_por_hora(all_posts, 'created_at', lambda p: p.get('total_interactions', 0))
+
     # Calcular top posts (por alcance)
     top_posts = sorted(all_posts, key=lambda x: x.get('reach', 0), reverse=True)[:5]
 
@@ -2156,9 +2187,24 @@ def merge_final_instagram_data(chunks):
         'account_metrics': account_metrics,
         'summary_by_type': summary_by_type,
         'top_posts': top_posts,
+        'hour_summary': hour_summary,
     }
 
 
+def resumen_por_hora(posts, time_key, engagement):
+    """Agrupa los posts por hora UTC de publicación: {"15": {"posts": n, "engagement": total}}."""
+    horas = {}
+    for post in posts:
+        try:
+            hora = datetime.strptime((post.get(time_key) or '')[:19], '%Y-%m-%dT%H:%M:%S').strftime('%H')
+        except ValueError:
+            continue
+        stats = horas.setdefault(hora, {'posts': 0, 'engagement': 0})
+        stats['posts'] += 1
+        stats['engagement'] += engagement(post) or 0
+    return horas
+
+
 def merge_final_linkedin_data(chunk_results):
     """
     Merge seguro para LinkedIn:
@@ -3,14 +3,22 @@ import random, re, requests, base64, boto3, logging
 import subprocess
 import json
 import tempfile
+import time
 import base64
+import os
 import botocore
 
+from contextlib import contextmanager
 from io import BytesIO
 from odoo.tools import html2plaintext
+from odoo.tools.sql import create_index
 from odoo import models, fields, api
-from datetime import datetime
+from datetime import datetime, timedelta
 from odoo.exceptions import ValidationError
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from .gl_media import run_rendition_jobs
 
 import mimetypes
 
@@ -19,6 +27,30 @@ _logger = logging.getLogger(__name__)
 API_VERSION = None
 LinkedIn_Version = "202505"
 CHUNK_SIZE = 4 * 1024 * 1024  # 4 MB recomendado para vídeos
+WEBHOOK_FINAL_ESTADOS = ("Publicado",)  # los webhooks nunca sacan a una red de estos estados
+FB_UPLOAD_WORKERS = 5  # subidas simultáneas de fotos a Facebook por publicación
+FB_UPLOAD_TIMEOUT = 60  # segundos por foto (Facebook descarga la imagen desde S3)
+IG_CAROUSEL_WORKERS = 5  # contenedores de items de carrusel creados a la vez
+IG_READY_MAX_WAIT = 6  # segundos máximos esperando el status_code del contenedor antes de dejarlo al cron
+IG_READY_FIRST_DELAY = 0.5  # primer intervalo del backoff exponencial (0.5, 1, 2, ...)
+PUBLISH_TRIGGER_WINDOW = timedelta(seconds=60)  # posts a menos de 1 min entre sí comparten una ejecución del cron
+
+# Largo máximo del texto por red (caracteres); el texto preparado se recorta al publicar
+POST_TEXT_LIMITS = {
+    'facebook': 63206,
+    'instagram': 2200,
+    'tiktok': 2200,
+    'linkedin': 3000,
+}
+
+# Hosts de las APIs de publicación. En modo dry-run (parámetro gl_publish.dry_run_url) todas las llamadas van
+# a <dry_run_url>/<servicio> (ver tools/mock_social_api.py); S3 usa su endpoint por defecto salvo en dry-run.
+API_HOSTS = {
+    'graph': 'https://graph.facebook.com',
+    'tiktok': 'https://open.tiktokapis.com',
+    'linkedin': 'https://api.linkedin.com',
+    's3': None,
+}
 
 
 class red_social(models.Model):
@@ -74,6 +106,10 @@ class project_task(models.Model):
     ], string='Tipo de Publicación', default='otro', required=True)
     red_social_ids = fields.Many2many('red.social', string='Redes Sociales', )
     hashtags = fields.Text(string="Hashtags")
+    texto_publicacion = fields.Text(string="Texto de Publicación", compute="_compute_texto_publicacion", store=True,
+                                    help="Descripción y hashtags en texto plano, tal como se envían a las redes")
+    textos_por_red = fields.Json(string="Textos recortados por red", compute="_compute_texto_publicacion", store=True,
+                                 help="Solo las redes cuyo límite supera el texto: {red: texto recortado con sus hashtags}")
     texto_en_diseno = fields.Text(string="Texto en diseño")
     objetivo = fields.Text(string="Objetivo del post")
 
@@ -85,21 +121,30 @@ class project_task(models.Model):
     partner_linkedin_page_id = fields.Char(related="partner_id.id_linkedin_organization")
 
     post_estado = fields.Char(string="Estado de la Publicación", default="Pendiente")
-    fb_post_id = fields.Char(string="Facebook Post ID")
+    fb_post_id = fields.Char(string="Facebook Post ID", index=True)
     fb_post_url = fields.Char(string="Facebook URL")
-    fb_video_id = fields.Char(string="Facebook Video ID")  # ------ Este se elimina
+    fb_video_id = fields.Char(string="Facebook Video ID", index=True)  # ------ Este se elimina
     fb_video_url = fields.Char(string="Facebook Video URL")  # ------ Este se elimina
-    inst_post_id = fields.Char(string="Instagram Post ID")
+    inst_post_id = fields.Char(string="Instagram Post ID", index=True)
     inst_post_url = fields.Char(string="Instagram URL")
     linkedin_post_id = fields.Char(string="LinkedIn Post ID")
     linkedin_post_url = fields.Char(string="LinkedIn URL")
-    tiktok_post_id = fields.Char(string="TikTok Post ID")
+    tiktok_post_id = fields.Char(string="TikTok Post ID", index=True)
     tiktok_post_url = fields.Char(string="TikTok URL")
 
-    has_facebook = fields.Boolean(compute="_compute_social_flags")
-    has_instagram = fields.Boolean(compute="_compute_social_flags")
-    has_tiktok = fields.Boolean(compute="_compute_social_flags")
-    has_linkedin = fields.Boolean(compute="_compute_social_flags")
+    has_facebook = fields.Boolean(compute="_compute_social_flags", store=True, index=True)
+    has_instagram = fields.Boolean(compute="_compute_social_flags", store=True, index=True)
+    has_tiktok = fields.Boolean(compute="_compute_social_flags", store=True, index=True)
+    has_linkedin = fields.Boolean(compute="_compute_social_flags", store=True, index=True)
+
+    # Estado combinado de las redes: guardado e indexado para filtrar por SQL (p.ej. error en cualquier red)
+    post_estado_global = fields.Selection([
+        ('Programado', 'Programado'),
+        ('Procesando', 'Procesando'),
+        ('Revisando', 'Revisando'),
+        ('Publicado', 'Publicado'),
+        ('Error', 'Error'),
+    ], string="Estado Global de Redes", compute="_compute_post_estado_global", store=True, index=True)
 
     # ====================================================================================== Tiktok Requisitos#
     # PRIVACIDAD (obligatorio por API)
@@ -145,6 +190,25 @@ class project_task(models.Model):
     tt_error = fields.Text(string="Error TikTok", copy=False, tracking=True)
     li_error = fields.Text(string="Error LinkedIn", copy=False, tracking=True)
 
+    # Preparación de medios al aprobar: renditions listas para publicar
+    media_estado = fields.Selection([
+        ('pendiente', 'Pendiente'),
+        ('listo', 'Listo'),
+        ('error', 'Error'),
+    ], string="Preparación de Medios", copy=False, index=True, readonly=True)
+    media_preparada_ids = fields.Many2many('ir.attachment', 'project_task_media_preparada_rel', 'task_id',
+                                           'attachment_id', string="Medios Preparados", copy=False, readonly=True)
+    media_error = fields.Text(string="Error de Preparación", copy=False, readonly=True)
+
+    # Campos de vals que disparan las validaciones de publicación en write()
+    _GL_PUBLISH_VALIDATION_FIELDS = {'tipo', 'fecha_publicacion', 'adjuntos_ids'}
+
+    def init(self):
+        super().init()
+        # Calendario del portal: tareas de un proyecto por rango de fecha de publicación
+        create_index(self._cr, 'project_task_project_fecha_publicacion_index', self._table,
+                     ['project_id', 'fecha_publicacion'])
+
     @api.depends("fb_estado", "ig_estado", "tt_estado", "li_estado")
     def _compute_post_estado_global(self):
         for rec in self:
@@ -165,6 +229,18 @@ class project_task(models.Model):
             else:
                 rec.post_estado_global = "Programado"
 
+    @api.depends('description', 'hashtags')
+    def _compute_texto_publicacion(self):
+        for rec in self:
+            description, hashtags = rec._gl_text_parts()
+            text = '\n\n'.join(part for part in (description, hashtags) if part)
+            suffix = f"\n\n{hashtags}" if hashtags else ''
+            rec.texto_publicacion = text
+            rec.textos_por_red = {
+                network: trim_post_text(description, limit, suffix=suffix)
+                for network, limit in POST_TEXT_LIMITS.items() if len(text) > limit
+            } or False
+
     @api.onchange('red_social_ids')
     def _onchange_red_social_ids_check_tiktok(self):
         """Ejecutar la validación SOLO si el usuario selecciona TikTok dentro de la lista."""
@@ -178,7 +254,7 @@ class project_task(models.Model):
         if 'TikTok' in selected_networks:
             self.check_tiktok_creator_status()
 
-    @api.depends('red_social_ids')
+    @api.depends('red_social_ids', 'red_social_ids.name')
     def _compute_social_flags(self):
         for rec in self:
             names = set((rec.red_social_ids.mapped('name') or []))
@@ -201,8 +277,86 @@ class project_task(models.Model):
         # Usar la sintaxis de super() preferida en Python 3
         return super().copy(default)
 
-    def write(self, vals):  
+    @api.model_create_multi
+    def create(self, vals_list):
+        tasks = super().create(vals_list)
+        tasks._gl_schedule_publication()
+        return tasks
+
+    def write(self, vals):
+        # Solo estos campos afectan las reglas de publicación: el resto (p.ej. mover etapas) no valida nada
+        if not self._GL_PUBLISH_VALIDATION_FIELDS.intersection(vals):
+            res = super().write(vals)
+            if vals.get('state') == "03_approved":
+                self.filtered(lambda t: t.media_estado != 'listo')._gl_queue_media_preparation()
+            if vals.get('post_estado') == "Programado":
+                self._gl_schedule_publication()
+            return res
+
+        durations = self._gl_validate_publish_rules(vals)
+
+        # Duración del video: en vals si es común a todos, si no se escribe por grupos tras el write
+        if durations and 'tiktok_video_duration' not in vals:
+            if len(durations) == len(self) and len(set(durations.values())) == 1:
+                vals['tiktok_video_duration'] = next(iter(durations.values()))
+                durations = {}
+        else:
+            durations = {}
+
+        res = super().write(vals)
+
+        by_duration = {}
+        for record_id, duration in durations.items():
+            by_duration.setdefault(duration, []).append(record_id)
+        for duration, record_ids in by_duration.items():
+            self.browse(record_ids).write({'tiktok_video_duration': duration})
+
+        if 'adjuntos_ids' in vals:
+            # Las renditions anteriores ya no corresponden a los adjuntos, aunque la tarea aún no esté aprobada
+            self._gl_reset_media()
+            self._gl_queue_media_preparation()
+        elif vals.get('state') == "03_approved":
+            self.filtered(lambda t: t.media_estado != 'listo')._gl_queue_media_preparation()
+
+        if 'fecha_publicacion' in vals or vals.get('post_estado') == "Programado":
+            self._gl_schedule_publication()
+
+        return res
+
+    def _gl_validate_publish_rules(self, vals):
+        """Valida las reglas de publicación para todo el recordset con datos precargados.
+
+        Devuelve {task_id: duración} de los videos validados.
+        """
+        approved = self.filtered(lambda r: r.state == "03_approved" and vals.get('tipo', r.tipo) != "otro")
+
+        # Adjuntos resultantes por tarea (aplicando los comandos de vals en memoria)
+        attachment_ids_by_record = {}
+        for record in approved:
+            current_ids = record.adjuntos_ids.ids
+            if 'adjuntos_ids' in vals:
+                current_ids = apply_m2m_commands(current_ids, vals['adjuntos_ids'])
+            attachment_ids_by_record[record.id] = list(current_ids)
+
+        # Una sola lectura de mimetype/checksum y una sola consulta a la caché de metadatos
+        all_ids = {att_id for ids in attachment_ids_by_record.values() for att_id in ids}
+        attachments = self.env['ir.attachment'].browse(all_ids)
+        attachment_info = {a['id']: a for a in attachments.read(['mimetype', 'checksum'])} if all_ids else {}
+
+        video_ids = {
+            att_id
+            for record in approved if vals.get('tipo', record.tipo) in ("video_stories", "video_reels")
+            for att_id in attachment_ids_by_record[record.id]
+            if att_id in attachment_info and attachment_info[att_id]['mimetype'] == "video/mp4"
+        }
+        metadata = {}
+        if video_ids:
+            try:
+                metadata = self.env['gl.media.metadata']._get_for_attachments(attachments.browse(video_ids))
+            except Exception as e:
+                raise ValidationError(f"No se pudo analizar el video MP4: {e}")
 
+        durations = {}
         for record in self:
             current_tipo = vals.get('tipo', record.tipo)
 
@@ -214,68 +368,228 @@ class project_task(models.Model):
                     raise ValidationError(
                         "La 'Fecha y hora de Publicación' es obligatoria cuando el tipo no es 'Otro'.")
 
-            if record.state == "03_approved":
-                if current_tipo == "otro":
-                    continue
+            if record.id not in attachment_ids_by_record:
+                continue
 
-                if 'adjuntos_ids' in vals:
-                    current_attachment_ids = set(record.adjuntos_ids.ids)
-                    for command in vals['adjuntos_ids']:
-                        op_type = command[0]
-                        if op_type == 0:
-                            pass
-                        elif op_type == 1:
-                            pass
-                        elif op_type == 2:
-                            if command[1]:
-                                current_attachment_ids.discard(command[1])
-                        elif op_type == 3:
-                            if command[1]:
-                                current_attachment_ids.discard(command[1])
-                        elif op_type == 4:
-                            if command[1]:
-                                current_attachment_ids.add(command[1])
-                        elif op_type == 5:
-                            current_attachment_ids.clear()
-                        elif op_type == 6:
-                            current_attachment_ids = set(command[2])
-
-                    current_attachments = record.env['ir.attachment'].browse(list(current_attachment_ids))
-                else:
-                    current_attachments = record.adjuntos_ids
+            current_attachments = [attachment_info[att_id] for att_id in attachment_ids_by_record[record.id]
+                                   if att_id in attachment_info]
 
-                if not current_attachments:
-                    raise ValidationError(
-                        "Debe seleccionar al menos un archivo para publicar para el tipo '{}'.".format(current_tipo))
+            if not current_attachments:
+                raise ValidationError(
+                    "Debe seleccionar al menos un archivo para publicar para el tipo '{}'.".format(current_tipo))
 
-                if current_tipo != "feed":
-                    if len(current_attachments) > 1:
-                        raise ValidationError(
-                            "Solo se acepta 1 archivo para el tipo de publicación '{}'.".format(current_tipo))
-                    if current_tipo in [
-                        "video_stories",
-                        "video_reels"
-                    ]:
-                        for attachment in current_attachments:
-                            if attachment.mimetype != "video/mp4":
-                                raise ValidationError(
-                                    "Solo se aceptan videos en formato MP4 para el tipo de publicación '{}'.".format(
-                                        current_tipo))
-                            else:
-
-                                try:
-                                    duration_seconds = get_video_duration_ffprobe(attachment.datas)
-                                    print(duration_seconds)
-                                    vals['tiktok_video_duration'] = duration_seconds
-                                except Exception as e:
-                                    raise ValidationError(f"No se pudo analizar el video MP4: {e}")
-
-                else:  # current_tipo == "feed"
+            if current_tipo != "feed":
+                if len(current_attachments) > 1:
+                    raise ValidationError(
+                        "Solo se acepta 1 archivo para el tipo de publicación '{}'.".format(current_tipo))
+                if current_tipo in [
+                    "video_stories",
+                    "video_reels"
+                ]:
                     for attachment in current_attachments:
-                        if attachment.mimetype == "video/mp4":
+                        if attachment['mimetype'] != "video/mp4":
                             raise ValidationError(
-                                "Solo se aceptan imágenes para publicaciones de tipo 'Feed'. No se permiten videos MP4.")
-        return super().write(vals)
+                                "Solo se aceptan videos en formato MP4 para el tipo de publicación '{}'.".format(
+                                    current_tipo))
+                        info = metadata.get(attachment['checksum'])
+                        if not info:
+                            raise ValidationError("No se pudo analizar el video MP4: metadatos no disponibles.")
+                        durations[record.id] = info['duration']
+
+            else:  # current_tipo == "feed"
+                for attachment in current_attachments:
+                    if attachment['mimetype'] == "video/mp4":
+                        raise ValidationError(
+                            "Solo se aceptan imágenes para publicaciones de tipo 'Feed'. No se permiten videos MP4.")
+
+        return durations
+
+    # ====================================================================================== Preparación de medios
+    def _gl_queue_media_preparation(self):
+        """Marca las tareas aprobadas para preparar sus medios y despierta el cron de preparación."""
+        tasks = self.filtered(lambda t: t.state == "03_approved" and t.tipo != "otro" and t.adjuntos_ids)
+        if tasks:
+            tasks.write({'media_estado': 'pendiente', 'media_error': False})
+            self.env.ref('gl_geniolibre.ir_cron_preparar_media')._trigger()
+
+    def _gl_reset_media(self):
+        """Descarta las renditions y el estado de preparación (p.ej. al cambiar los adjuntos)."""
+        tasks = self.filtered(lambda t: t.media_estado or t.media_preparada_ids)
+        if tasks:
+            renditions = tasks.media_preparada_ids
+            tasks.write({'media_estado': False, 'media_error': False, 'media_preparada_ids': [(5, 0, 0)]})
+            renditions.unlink()
+
+    @api.model
+    def _cron_preparar_media(self, limit=20):
+        """Genera en un pool de hilos los JPEG redimensionados, el MP4 normalizado y la portada.
+
+        Un adjunto ilegible o una falla del pool solo marcan en error la tarea afectada; el resto del lote sigue.
+        """
+        tasks = self.search([('media_estado', '=', 'pendiente')], limit=limit, order='fecha_publicacion asc, id')
+        if not tasks:
+            return
+
+        jobs_by_task = {}
+        failed = {}
+        temp_paths = []
+        try:
+            for task in tasks:
+                try:
+                    jobs_by_task[task.id] = task._gl_rendition_jobs(temp_paths)
+                except Exception as e:
+                    failed[task.id] = str(e)
+
+            try:
+                results = run_rendition_jobs([job for jobs in jobs_by_task.values() for job in jobs])
+            except Exception as e:
+                # Se reintenta tarea por tarea para aislar la que provoca la falla
+                _logger.error("Error en el pool de preparación de medios, reintentando por tarea: %s", e)
+                results = []
+                for task_id, jobs in jobs_by_task.items():
+                    try:
+                        results.extend(run_rendition_jobs(jobs))
+                    except Exception as task_error:
+                        failed[task_id] = str(task_error)
+        finally:
+            for path in temp_paths:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+        results_by_task = defaultdict(list)
+        for key, data, error in results:
+            results_by_task[key[0]].append((key, data, error))
+
+        for task in tasks:
+            try:
+                with self.env.cr.savepoint():
+                    if task.id in failed:
+                        raise ValidationError(failed[task.id])
+                    task._gl_store_renditions(results_by_task[task.id])
+            except Exception as e:
+                _logger.error("Error al preparar los medios de la tarea %s: %s", task.id, e)
+                task.write({'media_estado': 'error', 'media_error': str(e)})
+
+        if len(tasks) == limit:
+            self.env.ref('gl_geniolibre.ir_cron_preparar_media')._trigger()
+
+    def _gl_rendition_jobs(self, temp_paths):
+        """Jobs (clave, tipo, ruta) de la tarea; las rutas temporales se agregan a temp_paths para borrarlas."""
+        self.ensure_one()
+        jobs = []
+        for attachment in self.adjuntos_ids:
+            path, is_temp = attachment._gl_media_source_path()
+            if is_temp:
+                temp_paths.append(path)
+
+            if attachment.mimetype == "video/mp4":
+                jobs.append(((self.id, attachment.id, 'mp4'), 'mp4', path))
+                if not self.imagen_portada:
+                    jobs.append(((self.id, attachment.id, 'poster'), 'poster', path))
+            else:
+                jobs.append(((self.id, attachment.id, 'jpeg'), 'jpeg', path))
+        return jobs
+
+    def _gl_store_renditions(self, results):
+        """Guarda las renditions como adjuntos de la tarea y la deja lista para publicar."""
+        self.ensure_one()
+        errors = [error for key, data, error in results if error]
+        if errors:
+            raise ValidationError("\n".join(errors))
+
+        sources = {attachment.id: attachment for attachment in self.adjuntos_ids}
+        rendition_vals = []
+        portada = False
+        for (task_id, attachment_id, kind), data, error in results:
+            if kind == 'poster':
+                portada = base64.b64encode(data)
+                continue
+
+            stem = os.path.splitext(sources[attachment_id].name or f"media_{attachment_id}")[0]
+            is_video = kind == 'mp4'
+            rendition_vals.append({
+                'name': f"{stem}_gl.{'mp4' if is_video else 'jpg'}",
+                'raw': data,
+                'mimetype': "video/mp4" if is_video else "image/jpeg",
+                'res_model': self._name,
+                'res_id': self.id,
+            })
+
+        previous = self.media_preparada_ids
+        renditions = self.env['ir.attachment'].create(rendition_vals)
+
+        vals = {
+            'media_preparada_ids': [(6, 0, renditions.ids)],
+            'media_estado': 'listo',
+            'media_error': False,
+        }
+        if portada and not self.imagen_portada:
+            vals['imagen_portada'] = portada
+        self.write(vals)
+
+        previous.unlink()
+
+    def _gl_schedule_publication(self):
+        """Agenda el cron de publicación a la hora exacta de cada post Programado.
+
+        Las fechas cercanas (PUBLISH_TRIGGER_WINDOW) se agrupan en un solo disparo a la última de ellas;
+        el intervalo del cron queda solo como respaldo.
+        """
+        fechas = [t.fecha_publicacion for t in self if t.post_estado == "Programado" and t.fecha_publicacion]
+        if not fechas:
+            return
+
+        cron = self.env.ref('gl_geniolibre.ir_cron_publicar_post', raise_if_not_found=False)
+        if not cron:
+            return
+
+        now = fields.Datetime.now()
+        call_times = collapse_trigger_times([max(fecha, now) for fecha in fechas], PUBLISH_TRIGGER_WINDOW)
+
+        existing = set(self.env['ir.cron.trigger'].sudo().search([
+            ('cron_id', '=', cron.id),
+            ('call_at', 'in', call_times),
+        ]).mapped('call_at'))
+        pending = [call_at for call_at in call_times if call_at not in existing]
+        if pending:
+            cron.sudo()._trigger(pending)
+
+    @api.model
+    def _cron_publicar_posts(self):
+        """Publica los posts Programados cuya fecha ya llegó (disparado por _gl_schedule_publication)."""
+        records = self.search([
+            ('post_estado', '=', 'Programado'),
+            ('fecha_publicacion', '<=', fields.Datetime.now()),
+        ], order='fecha_publicacion')
+
+        if not records:
+            _logger.info("No hay posts programados para publicar en este momento")
+            return
+
+        _logger.info("Publicación programada: %s posts encontrados", len(records))
+        success_count = 0
+        error_count = 0
+
+        for record in records:
+            try:
+                _logger.info("► Procesando Post ID %s: %s", record.id, record.name or 'Sin nombre')
+                record.with_context(from_cron=True).publicar_post()
+                success_count += 1
+                _logger.info("✔ Post ID %s publicado exitosamente", record.id)
+
+            except Exception as e:
+                error_count += 1
+                _logger.error("✖ ERROR en Post ID %s: %s", record.id, e)
+                record.write({
+                    'post_estado': 'Error',
+                    'state': '01_in_progress'
+                })
+                record.message_post(body=f"Error al publicar el post: {e}", message_type='comment')
+
+        _logger.info("Publicación programada: %s procesados, %s publicados, %s errores",
+                     len(records), success_count, error_count)
 
     def programar_post(self):
         try:
@@ -297,26 +611,39 @@ class project_task(models.Model):
         self.post_estado = "Pendiente"
 
     def revisar_post(self, from_cron=False):
-        for rec in self:
-            rec._prepare_text()
+        # Tokens de página/TikTok vigentes antes de consultar las APIs (se renuevan solo si están por expirar)
+        self.env['gl.token.manager']._ensure_partner_tokens(self.mapped('partner_id'))
 
+        for rec in self:
             # Redes activas (seleccionadas)
             active = set((rec.red_social_ids.mapped('name') or []))
 
             # Ejecutar solo si está seleccionada
             if "Facebook" in active:
-                rec._run_facebook_flow(from_cron)
+                with rec._gl_stage('facebook', 'status', 'fb_estado'):
+                    rec._run_facebook_flow(from_cron)
 
             if "Instagram" in active:
-                rec._run_instagram_flow(from_cron)
+                with rec._gl_stage('instagram', 'status', 'ig_estado'):
+                    rec._run_instagram_flow(from_cron)
 
             if "TikTok" in active:
-                rec._run_tiktok_flow(from_cron)
+                with rec._gl_stage('tiktok', 'status', 'tt_estado'):
+                    rec._run_tiktok_flow(from_cron)
 
             if "LinkedIn" in active:
-                rec._run_linkedin_flow(from_cron)
+                with rec._gl_stage('linkedin', 'status', 'li_estado'):
+                    rec._run_linkedin_flow(from_cron)
+
+            rec._sync_post_estado()
+
+        return True
+
+    def _sync_post_estado(self):
+        """GLOBAL: si todas las redes activas están Publicado, el post queda Publicado."""
+        for rec in self:
+            active = set((rec.red_social_ids.mapped('name') or []))
 
-            # GLOBAL: si todas las redes activas están Publicado
             estados = []
             if "Facebook" in active:
                 estados.append((rec.fb_estado or "").strip().lower())
@@ -330,26 +657,199 @@ class project_task(models.Model):
             if estados and all(e == "publicado" for e in estados):
                 rec.post_estado = "Publicado"
 
-        return True
+    # ====================================================================================== Webhooks
+    def _gl_advance_network(self, network):
+        """Ejecuta el flujo de revisión de una red tras un aviso del webhook.
+
+        El webhook confirma que la red ya terminó su etapa, así que no hace falta
+        esperar un ciclo del cron para pasar de Procesando a Revisando.
+        """
+        self.ensure_one()
+        estado_field, flow = {
+            'Facebook': ('fb_estado', self._run_facebook_flow),
+            'Instagram': ('ig_estado', self._run_instagram_flow),
+            'TikTok': ('tt_estado', self._run_tiktok_flow),
+        }[network]
+
+        estado_previo = self[estado_field]
+        flow(from_cron=True)
+        if estado_previo == "Procesando" and self[estado_field] == "Revisando":
+            flow(from_cron=True)
+
+    def _gl_handle_meta_webhook(self, payload):
+        """Procesa una notificación de Meta (object page/instagram) y actualiza las tareas afectadas."""
+        referencias = set()
+        video_status = {}
+
+        for entry in payload.get('entry') or []:
+            for change in entry.get('changes') or []:
+                value = change.get('value')
+                if not isinstance(value, dict):
+                    continue
+
+                status = value.get('status')
+                status = status.get('video_status') if isinstance(status, dict) else None
+
+                for key in ('id', 'video_id', 'media_id', 'post_id', 'creation_id'):
+                    if value.get(key):
+                        ref = str(value[key])
+                        referencias.add(ref)
+                        if status:
+                            video_status[ref] = status
+
+        if not referencias:
+            return self.browse()
+
+        ref_list = list(referencias)
+        tasks = self.search([
+            '|', '|',
+            ('fb_video_id', 'in', ref_list),
+            ('fb_post_id', 'in', ref_list),
+            ('inst_post_id', 'in', ref_list),
+        ])
+
+        updated = self.browse()
+        for task in tasks:
+            try:
+                with self.env.cr.savepoint():
+                    if task.fb_video_id in referencias or task.fb_post_id in referencias:
+                        if task.fb_estado in WEBHOOK_FINAL_ESTADOS:
+                            pass  # aviso tardío o reintentado: no se sale de un estado final
+                        elif video_status.get(task.fb_video_id) == 'error':
+                            task.write({
+                                'fb_estado': 'Error',
+                                'fb_error': f"Meta webhook: el video {task.fb_video_id} no pudo procesarse",
+                            })
+                        elif task.fb_estado in ("Procesando", "Revisando"):
+                            task._gl_advance_network('Facebook')
+
+                    if task.inst_post_id in referencias and task.ig_estado in ("Procesando", "Revisando"):
+                        task._gl_advance_network('Instagram')
+
+                    task._sync_post_estado()
+                updated |= task
+            except Exception as e:
+                _logger.error("Webhook Meta: error al actualizar la tarea %s: %s", task.id, e)
+
+        return updated
+
+    def _gl_handle_tiktok_webhook(self, payload):
+        """Procesa un callback post.publish.* de TikTok usando el publish_id guardado en tiktok_post_id."""
+        event = payload.get('event') or ''
+        if not event.startswith('post.publish.'):
+            return self.browse()
+
+        content = payload.get('content') or {}
+        if isinstance(content, str):
+            try:
+                content = json.loads(content)
+            except ValueError:
+                content = {}
+
+        publish_id = content.get('publish_id')
+        if not publish_id:
+            return self.browse()
+
+        if event == 'post.publish.failed':
+            vals = {
+                'tt_estado': 'Error',
+                'tt_error': f"TikTok: publicación fallida ({content.get('reason') or event})",
+            }
+        elif event == 'post.publish.complete':
+            vals = {'tt_estado': 'Publicado', 'tt_error': False}
+        elif event == 'post.publish.publicly_available':
+            vals = {'tt_estado': 'Publicado', 'tt_error': False}
+            if content.get('post_id'):
+                vals['tiktok_post_url'] = f"https://www.tiktok.com/@_/video/{content['post_id']}"
+        else:
+            return self.browse()
+
+        tasks = self.search([('tiktok_post_id', '=', publish_id)])
+        if vals['tt_estado'] not in WEBHOOK_FINAL_ESTADOS:
+            # Un post.publish.failed tardío o reintentado no debe pisar una publicación ya confirmada
+            tasks = tasks.filtered(lambda t: t.tt_estado not in WEBHOOK_FINAL_ESTADOS)
+        tasks.write(vals)
+        tasks._sync_post_estado()
+        return tasks
+
+    def _gl_api_host(self, service):
+        """Host base de la API del servicio ('graph', 'tiktok', 'linkedin', 's3'), respetando el modo dry-run."""
+        dry_run_url = self.env['ir.config_parameter'].sudo().get_param('gl_publish.dry_run_url')
+        if dry_run_url:
+            return f"{dry_run_url.rstrip('/')}/{service}"
+        return API_HOSTS[service]
+
+    # ====================================================================================== Métricas
+    @contextmanager
+    def _gl_stage(self, network, stage, estado_field=None):
+        """Mide una etapa de publicación y la guarda en gl.publish.timing, también si falla.
+
+        Con estado_field, la etapa se considera fallida si el flujo dejó ese estado en Error
+        (los flujos de revisión capturan sus propias excepciones).
+        """
+        self.ensure_one()
+        started_at = fields.Datetime.now()
+        t0 = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self._gl_log_timing(network, stage, started_at, time.monotonic() - t0, error=str(e))
+            raise
+
+        error = False
+        if estado_field and self[estado_field] == "Error":
+            error = self[estado_field.replace("_estado", "_error")] or "Error"
+        self._gl_log_timing(network, stage, started_at, time.monotonic() - t0, error=error)
+
+    def _gl_log_timing(self, network, stage, started_at, duration, error=False):
+        """Guarda la medición en un cursor propio: si la publicación falla y se revierte, la fila queda."""
+        try:
+            with self.env.registry.cursor() as cr:
+                self.env(cr=cr)['gl.publish.timing'].sudo().create({
+                    'task_id': self.id,
+                    'network': network,
+                    'stage': stage,
+                    'started_at': started_at,
+                    'duration': duration,
+                    'success': not error,
+                    'error': error and str(error)[:500],
+                })
+        except Exception as e:
+            # Nunca debe interrumpir la publicación (p.ej. tarea aún no confirmada en la base)
+            _logger.warning("No se pudo registrar el tiempo de %s/%s de la tarea %s: %s", network, stage, self.id, e)
+
+    def _gl_text_for(self, network):
+        """Texto guardado para la red: la variante recortada si supera su límite, si no texto_publicacion."""
+        self.ensure_one()
+        return (self.textos_por_red or {}).get(network) or self.texto_publicacion or ''
 
-    def _prepare_text(self):
+    def _gl_notify_trimmed_texts(self, networks):
+        """Avisa en el chatter, una vez por publicación, qué redes reciben la descripción recortada."""
+        self.ensure_one()
+        trimmed = [name for name in networks if name.lower() in (self.textos_por_red or {})]
+        if trimmed:
+            self.message_post(
+                body=f"El texto supera el límite de caracteres de {', '.join(trimmed)}: se publica con la "
+                     f"descripción recortada y los hashtags completos.",
+                message_type='comment',
+            )
+
+    def _gl_text_parts(self):
+        """Descripción y hashtags en texto plano, por separado."""
         plain_description = html2plaintext(self.description or '')
         plain_hashtags = html2plaintext(self.hashtags or '')
         paragraphs = [p.strip() for p in plain_description.split('\n') if p.strip()]
         formatted_description = '\n\n'.join(paragraphs)
         formatted_description = remove_duplicate_links(formatted_description).rstrip()
-        combined_text = f"{formatted_description}\n\n{plain_hashtags}"
-        return combined_text.replace('\u200b', '').replace('\t', '').strip()
+        clean = lambda t: t.replace('\u200b', '').replace('\t', '').strip()
+        return clean(formatted_description), clean(plain_hashtags)
 
     def _run_facebook_flow(self, from_cron=False):
 
         API_VERSION = self.env['ir.config_parameter'].sudo().get_param('gl_facebook.api_version')
-        base_url = f'https://graph.facebook.com/{API_VERSION}'
+        base_url = f'{self._gl_api_host("graph")}/{API_VERSION}'
         error_messages = []
 
-        # Texto ya preparado por rec._prepare_text() en revisar_post()
-        combined_text = self._prepare_text()
-
         try:
             # VALIDACIÓN BASE
             if self.fb_estado == "Procesando":
@@ -371,7 +871,7 @@ class project_task(models.Model):
 
                     params = {
                         "access_token": self.partner_page_access_token,
-                        "message": combined_text or "",
+                        "message": self._gl_text_for('facebook'),
                         "attached_media": json.dumps([{"media_fbid": mid} for mid in media_ids]),
                         "published": True,
                     }
@@ -475,7 +975,7 @@ class project_task(models.Model):
                         "video_id": self.fb_video_id,
                         "upload_phase": "finish",
                         "video_state": "PUBLISHED",
-                        "description": combined_text or "",
+                        "description": self._gl_text_for('facebook'),
                     }
 
                     resp = requests.post(publish_url, params=publish_params, timeout=20)
@@ -500,7 +1000,7 @@ class project_task(models.Model):
                         image_file = BytesIO(image_data)
                         image_file.name = "miniatura.jpg"
 
-                        thumb_url = f"https://graph.facebook.com/{API_VERSION}/{self.fb_video_id}/thumbnails"
+                        thumb_url = f"{self._gl_api_host('graph')}/{API_VERSION}/{self.fb_video_id}/thumbnails"
                         files = {"source": ("miniatura.jpg", image_file, "image/jpeg")}
                         data = {
                             "access_token": self.partner_page_access_token,
@@ -557,10 +1057,7 @@ class project_task(models.Model):
 
     def _run_instagram_flow(self, from_cron=False):
         API_VERSION = self.env['ir.config_parameter'].sudo().get_param('gl_facebook.api_version')
-        base_url = f'https://graph.facebook.com/{API_VERSION}'
-
-        # Texto por si lo necesitas en logs (caption ya se usó en el container)
-        combined_text = self._prepare_text()
+        base_url = f'{self._gl_api_host("graph")}/{API_VERSION}'
 
         try:
             # PROCESANDO → REVISANDO (etapa)
@@ -684,9 +1181,9 @@ class project_task(models.Model):
 
             # REVISANDO → consultar estado
             if self.tt_estado == "Revisando" and self.tiktok_post_id and not self.tiktok_post_url:
-                status_url = "https://open.tiktokapis.com/v2/post/publish/status/fetch/"
+                status_url = f"{self._gl_api_host('tiktok')}/v2/post/publish/status/fetch/"
                 headers = {
-                    "Authorization": f"Bearer {self.partner_tiktok_access_token}",
+                    "Authorization": f"Bearer {self.env['gl.token.manager']._get_tiktok_token(self.partner_id)}",
                     "Content-Type": "application/json",
                 }
                 payload = {"publish_id": self.tiktok_post_id}
@@ -801,26 +1298,15 @@ class project_task(models.Model):
 
     def publish_on_facebook(self, media_urls, combined_text):
         API_VERSION = self.env['ir.config_parameter'].sudo().get_param('gl_facebook.api_version')
-        BASE_URL_LOCAL = f'https://graph.facebook.com/{API_VERSION}'
+        BASE_URL_LOCAL = f'{self._gl_api_host("graph")}/{API_VERSION}'
 
         # ---- FEED (FOTOS) ----
         if self.tipo == "feed":
 
-            photo_ids = []
-
-            for photo_url in media_urls:
-                upload_url = f"{BASE_URL_LOCAL}/{self.partner_facebook_page_id}/photos"
-                params = {
-                    "url": photo_url,  # URL pública (S3)
-                    "published": "false",  # CLAVE: NO publicar aún (igual a tu lógica)
-                    "access_token": self.partner_page_access_token,
-                }
-                resp = requests.post(upload_url, params=params)
-                data = resp.json()
-                if "id" not in data:
-                    raise ValidationError(f"Error subiendo foto: {data}")
-
-                photo_ids.append(data["id"])
+            # Subida concurrente (sin publicar aún); Facebook descarga cada foto desde su URL pública de S3
+            with self._gl_stage('facebook', 'upload'):
+                photo_ids = upload_facebook_photos(
+                    BASE_URL_LOCAL, self.partner_facebook_page_id, self.partner_page_access_token, media_urls)
 
             # Guardamos SOLO IDs reales de Facebook
             self.write({
@@ -843,8 +1329,9 @@ class project_task(models.Model):
                 "upload_phase": "start",
                 "access_token": self.partner_page_access_token,
             }
-            resp = requests.post(url, params=params)
-            data = resp.json()
+            with self._gl_stage('facebook', 'container'):
+                resp = requests.post(url, params=params)
+                data = resp.json()
 
             if "video_id" not in data or "upload_url" not in data:
                 raise ValidationError(f"Error iniciando upload Story FB: {data}")
@@ -864,8 +1351,9 @@ class project_task(models.Model):
                 "Authorization": f"OAuth {self.partner_page_access_token}",
                 "file_url": media_urls[0],
             }
-            up = requests.post(upload_url, headers=headers)
-            up_data = up.json()
+            with self._gl_stage('facebook', 'upload'):
+                up = requests.post(upload_url, headers=headers)
+                up_data = up.json()
 
             if "success" not in up_data:
                 raise ValidationError(f"Error subiendo video Story FB: {up_data}")
@@ -877,8 +1365,9 @@ class project_task(models.Model):
                 "video_id": video_id,
             }
 
-            fin = requests.post(url, params=finish_params)
-            fin_data = fin.json()
+            with self._gl_stage('facebook', 'finalize'):
+                fin = requests.post(url, params=finish_params)
+                fin_data = fin.json()
 
             # Si devuelve post_id, guárdalo
             if fin_data.get("post_id"):
@@ -909,8 +1398,9 @@ class project_task(models.Model):
                 "upload_phase": "start",
                 "access_token": self.partner_page_access_token,
             }
-            resp = requests.post(url, params=params)
-            data = resp.json()
+            with self._gl_stage('facebook', 'container'):
+                resp = requests.post(url, params=params)
+                data = resp.json()
 
             if "video_id" not in data or "upload_url" not in data:
                 raise ValidationError(f"Error Starting session (Reel FB): {data}")
@@ -930,8 +1420,9 @@ class project_task(models.Model):
                 "Authorization": f"OAuth {self.partner_page_access_token}",
                 "file_url": media_urls[0],
             }
-            up = requests.post(upload_url, headers=headers)
-            up_data = up.json()
+            with self._gl_stage('facebook', 'upload'):
+                up = requests.post(upload_url, headers=headers)
+                up_data = up.json()
 
             if "success" not in up_data:
                 raise ValidationError(f"Error uploading Reel FB: {up_data}")
@@ -945,8 +1436,9 @@ class project_task(models.Model):
                 "description": combined_text,
             }
 
-            fin = requests.post(finish_url, params=finish_params)
-            fin_data = fin.json()
+            with self._gl_stage('facebook', 'finalize'):
+                fin = requests.post(finish_url, params=finish_params)
+                fin_data = fin.json()
 
             if fin.status_code != 200:
                 raise ValidationError(f"Error finishing upload Reel FB: {fin_data}")
@@ -958,9 +1450,8 @@ class project_task(models.Model):
     def publish_on_instagram(self, media_urls, combined_text, cover_url=None):
 
         API_VERSION = self.env['ir.config_parameter'].sudo().get_param('gl_facebook.api_version')
-        BASE_URL_LOCAL = f'https://graph.facebook.com/{API_VERSION}'
+        BASE_URL_LOCAL = f'{self._gl_api_host("graph")}/{API_VERSION}'
         container_url = f"{BASE_URL_LOCAL}/{self.partner_instagram_page_id}/media"
-        carousel_ids = []
 
         try:
             # Validación: cover obligatorio para reels
@@ -995,26 +1486,17 @@ class project_task(models.Model):
                             "cover_url": cover_url,  # ✅ obligatorio
                         }
 
-                r = requests.post(container_url, params=container_params, timeout=20)
-                data = r.json()
+                with self._gl_stage('instagram', 'container'):
+                    r = requests.post(container_url, params=container_params, timeout=20)
+                    data = r.json()
                 if r.status_code != 200 or not data.get("id"):
                     raise ValidationError(f"Error al crear contenedor IG: {data}")
                 container_id = data["id"]
 
             else:
-                # Carrusel (asumimos imágenes)
-                for url in media_urls:
-                    item_params = {
-                        "access_token": self.partner_page_access_token,
-                        "is_carousel_item": "true",
-                        "image_url": url,
-                        "published": False,
-                    }
-                    rr = requests.post(container_url, params=item_params, timeout=20)
-                    d = rr.json()
-                    if rr.status_code != 200 or not d.get("id"):
-                        raise ValidationError(f"Error item carrusel IG: {d}")
-                    carousel_ids.append(d["id"])
+                # Carrusel (asumimos imágenes): los contenedores de cada item se crean en paralelo
+                with self._gl_stage('instagram', 'container'):
+                    carousel_ids = create_ig_carousel_items(container_url, self.partner_page_access_token, media_urls)
 
                 carousel_params = {
                     "media_type": "CAROUSEL",
@@ -1023,20 +1505,30 @@ class project_task(models.Model):
                     "access_token": self.partner_page_access_token,
                     "published": False,
                 }
-                r = requests.post(container_url, params=carousel_params, timeout=20)
-                data = r.json()
+                with self._gl_stage('instagram', 'container'):
+                    r = requests.post(container_url, params=carousel_params, timeout=20)
+                    data = r.json()
                 if r.status_code != 200 or not data.get("id"):
                     raise ValidationError(f"Error contenedor carrusel IG: {data}")
                 container_id = data["id"]
 
+            # Las imágenes suelen quedar listas en segundos: si el contenedor ya está FINISHED pasamos
+            # directo a Revisando para que revisar_post() lo publique en esta misma ejecución
+            ig_estado = "Procesando"
+            if self.tipo == "feed":
+                with self._gl_stage('instagram', 'status'):
+                    status_code = wait_for_ig_container(BASE_URL_LOCAL, container_id, self.partner_page_access_token)
+                if status_code == "FINISHED":
+                    ig_estado = "Revisando"
+
             self.write({
                 "inst_post_id": container_id,
                 "inst_post_url": False,
-                "ig_estado": "Procesando",
+                "ig_estado": ig_estado,
                 "ig_error": False,
             })
 
-            print("Fin Publicar en Instagram", container_id)
+            _logger.info("Contenedor de Instagram %s creado (%s)", container_id, ig_estado)
             return True
 
         except Exception as e:
@@ -1047,10 +1539,10 @@ class project_task(models.Model):
             raise
 
     def publish_on_tiktok(self, media_urls, combined_text, cover_url=None):
-        url = "https://open.tiktokapis.com/v2/post/publish/video/init/"
+        url = f"{self._gl_api_host('tiktok')}/v2/post/publish/video/init/"
     
         headers = {
-            "Authorization": f"Bearer {self.partner_tiktok_access_token}",
+            "Authorization": f"Bearer {self.env['gl.token.manager']._get_tiktok_token(self.partner_id)}",
             "Content-Type": "application/json; charset=UTF-8"
         }
     
@@ -1067,8 +1559,9 @@ class project_task(models.Model):
                 "video_url": media_urls[0],
             }
         }
-        tiktok_response = requests.post(url, headers=headers, json=data)
-        response_data = tiktok_response.json()
+        with self._gl_stage('tiktok', 'container'):
+            tiktok_response = requests.post(url, headers=headers, json=data)
+            response_data = tiktok_response.json()
         if tiktok_response.status_code != 200:
             raise ValidationError(f"Error al Publicar el video en TIKTOK: {response_data}")
         # You can then check the response
@@ -1082,11 +1575,12 @@ class project_task(models.Model):
         if not media_urls:
             raise ValidationError("No se proporcionaron URLs de medios")
     
-        linkedin_access_token = (self.env["ir.config_parameter"].sudo().get_param("linkedin.access_token"))
+        linkedin_access_token = self.env["gl.token.manager"]._get_linkedin_token()
         if not linkedin_access_token:
             raise ValidationError("Falta configurar linkedin.access_token")
     
         org_urn = f"urn:li:organization:{self.partner_linkedin_page_id}"
+        linkedin_host = self._gl_api_host('linkedin')
         headers = {
             "Authorization": f"Bearer {linkedin_access_token}",
             "LinkedIn-Version": LinkedIn_Version,
@@ -1123,11 +1617,12 @@ class project_task(models.Model):
                     }
                 }
     
-                init_resp = session.post("https://api.linkedin.com/rest/videos?action=initializeUpload",
-                                         json=init_payload)
+                with self._gl_stage('linkedin', 'container'):
+                    init_resp = session.post(f"{linkedin_host}/rest/videos?action=initializeUpload",
+                                             json=init_payload)
     
-                init_resp.raise_for_status()
-                init_json = init_resp.json()
+                    init_resp.raise_for_status()
+                    init_json = init_resp.json()
     
                 video_urn = init_json["value"]["video"]
                 upload_token = init_json["value"]["uploadToken"]
@@ -1135,55 +1630,57 @@ class project_task(models.Model):
                 thumbnail_url = init_json["value"].get("thumbnailUploadUrl")  # ← solo si pedimos thumbnail
     
                 uploaded_etags = []
-                for instruction in upload_instructions:
-                    upload_url = instruction["uploadUrl"]
-                    first_byte = instruction["firstByte"]
-                    last_byte = instruction["lastByte"]
-                    chunk_size = last_byte - first_byte + 1
-                    range_header = f"bytes={first_byte}-{last_byte}"
+                with self._gl_stage('linkedin', 'upload'):
+                    for instruction in upload_instructions:
+                        upload_url = instruction["uploadUrl"]
+                        first_byte = instruction["firstByte"]
+                        last_byte = instruction["lastByte"]
+                        chunk_size = last_byte - first_byte + 1
+                        range_header = f"bytes={first_byte}-{last_byte}"
     
-                    # Descargar el chunk exacto
-                    chunk_resp = requests.get(media_urls[0], headers={
-                        "Range": range_header
-                    }, stream=True)
+                        # Descargar el chunk exacto
+                        chunk_resp = requests.get(media_urls[0], headers={
+                            "Range": range_header
+                        }, stream=True)
     
-                    chunk_resp.raise_for_status()
-                    chunk_data = chunk_resp.content  # Leer contenido completo
+                        chunk_resp.raise_for_status()
+                        chunk_data = chunk_resp.content  # Leer contenido completo
     
-                    put_headers = {
-                        "Content-Type": "application/octet-stream",
-                        "Content-Length": str(chunk_size)
-                    }
+                        put_headers = {
+                            "Content-Type": "application/octet-stream",
+                            "Content-Length": str(chunk_size)
+                        }
     
-                    # Subir a LinkedIn
-                    upload_resp = session.put(upload_url, headers=put_headers, data=chunk_data, timeout=30)
-                    upload_resp.raise_for_status()
+                        # Subir a LinkedIn
+                        upload_resp = session.put(upload_url, headers=put_headers, data=chunk_data, timeout=30)
+                        upload_resp.raise_for_status()
     
-                    etag = upload_resp.headers.get("ETag")
-                    if not etag:
-                        raise ValidationError("No se recibió ETag al subir parte del video")
-                    uploaded_etags.append(etag)
+                        etag = upload_resp.headers.get("ETag")
+                        if not etag:
+                            raise ValidationError("No se recibió ETag al subir parte del video")
+                        uploaded_etags.append(etag)
     
-                    # ------------------------------------------------------------------ 1‑C  subir la miniatura (si existe)
+                        # ------------------------------------------------------------------ 1‑C  subir la miniatura (si existe)
     
-                if has_thumbnail and thumbnail_url:
-                    thumb_bytes = base64.b64decode(self.imagen_portada)
-                    session.put(thumbnail_url, headers={
-                        "Content-Type": "image/jpeg"
-                    },  # fijo, siempre JPG
-                                data=thumb_bytes, timeout=15, ).raise_for_status()
+                    if has_thumbnail and thumbnail_url:
+                        thumb_bytes = base64.b64decode(self.imagen_portada)
+                        session.put(thumbnail_url, headers={
+                            "Content-Type": "image/jpeg"
+                        },  # fijo, siempre JPG
+                                    data=thumb_bytes, timeout=15, ).raise_for_status()
     
                 # 1‑C Finalizar la subida
-                finalize_payload = {
-                    "finalizeUploadRequest": {
-                        "video": video_urn,
-                        "uploadToken": upload_token,
-                        "uploadedPartIds": uploaded_etags  # ❗ ETags, no partNumbers
+                with self._gl_stage('linkedin', 'finalize'):
+                    finalize_payload = {
+                        "finalizeUploadRequest": {
+                            "video": video_urn,
+                            "uploadToken": upload_token,
+                            "uploadedPartIds": uploaded_etags  # ❗ ETags, no partNumbers
+                        }
                     }
-                }
-                finalize_resp = session.post("https://api.linkedin.com/rest/videos?action=finalizeUpload",
-                                             json=finalize_payload)
-                finalize_resp.raise_for_status()
+                    finalize_resp = session.post(f"{linkedin_host}/rest/videos?action=finalizeUpload",
+                                                 json=finalize_payload)
+                    finalize_resp.raise_for_status()
     
                 # Estado "procesando"
                 self.post_estado = "Procesando"
@@ -1211,26 +1708,27 @@ class project_task(models.Model):
             # =============================================== IMÁGENES / CARRUSEL
             elif self.tipo == "feed":
                 media_urns = []
-                for url in media_urls:
-                    # 2‑A  initializeUpload por imagen
-                    init_resp = session.post("https://api.linkedin.com/rest/images?action=initializeUpload", json={
-                        "initializeUploadRequest": {
-                            "owner": org_urn
-                        }
-                    })
-                    init_resp.raise_for_status()
-                    init_json = init_resp.json()
+                with self._gl_stage('linkedin', 'upload'):
+                    for url in media_urls:
+                        # 2‑A  initializeUpload por imagen
+                        init_resp = session.post(f"{linkedin_host}/rest/images?action=initializeUpload", json={
+                            "initializeUploadRequest": {
+                                "owner": org_urn
+                            }
+                        })
+                        init_resp.raise_for_status()
+                        init_json = init_resp.json()
     
-                    image_urn = init_json["value"]["image"]
-                    upload_url = init_json["value"]["uploadUrl"]
-                    mime, _ = mimetypes.guess_type(url)
+                        image_urn = init_json["value"]["image"]
+                        upload_url = init_json["value"]["uploadUrl"]
+                        mime, _ = mimetypes.guess_type(url)
     
-                    # 2‑B  subir la imagen
-                    img_content = requests.get(url).content
-                    requests.put(upload_url, headers={
-                        "Content-Type": mime or "application/octet-stream",
-                    }, data=img_content).raise_for_status()
-                    media_urns.append(image_urn)
+                        # 2‑B  subir la imagen
+                        img_content = requests.get(url).content
+                        requests.put(upload_url, headers={
+                            "Content-Type": mime or "application/octet-stream",
+                        }, data=img_content).raise_for_status()
+                        media_urns.append(image_urn)
     
                 # 2‑C  crear post según 1 o varias imágenes
                 post_data = {
@@ -1265,9 +1763,10 @@ class project_task(models.Model):
                 raise ValidationError(f"Tipo de publicación no soportado: {self.tipo}")
     
             # =============================================== 3) Crear el post
-            post_resp = session.post("https://api.linkedin.com/rest/posts", json=post_data)
+            with self._gl_stage('linkedin', 'finalize'):
+                post_resp = session.post(f"{linkedin_host}/rest/posts", json=post_data)
     
-            post_resp.raise_for_status()
+                post_resp.raise_for_status()
     
             post_urn = post_resp.headers.get("X-RestLi-Id")
             if not post_urn:
@@ -1302,29 +1801,8 @@ class project_task(models.Model):
             raise ValidationError(f"Error inesperado: {str(e)}") from e
 
     def publicar_post(self):
-        API_VERSION = self.env['ir.config_parameter'].sudo().get_param('gl_facebook.api_version')
-        BASE_URL = f'https://graph.facebook.com/{API_VERSION}'
         from_cron = bool(self.env.context.get("from_cron"))
 
-        # Funciones
-        def upload_images_to_facebook(attachment):
-
-            image_bytes = base64.b64decode(attachment.datas)
-            files = {
-                'source': ("image.jpg", image_bytes, "image/jpeg")  # File name and MIME type
-            }
-            data = {
-                "access_token": self.partner_page_access_token,
-                "published": False,
-                "temporary": True,
-            }
-            url = f"{BASE_URL}/{self.partner_facebook_page_id}/photos"
-            response_upload = requests.post(url, files=files, data=data)
-            if response_upload.status_code == 200:
-                return response_upload.json().get('id')
-            else:
-                raise Exception(f"Error al subir una imagen en Facebook: {response_upload.json()}")
-
         # Validaciones iniciales (detienen todo el proceso si fallan)
         if not self.imagen_portada and self.tipo == "video_reels":
             raise ValidationError("Debe especificar una portada para el reel")
@@ -1338,13 +1816,19 @@ class project_task(models.Model):
         if not self.red_social_ids:
             raise ValidationError("Debe seleccionar al menos una red social")
 
+        # Retraso real respecto a la fecha programada (solo publicaciones automáticas)
+        if from_cron:
+            lateness = max(0.0, (fields.Datetime.now() - self.fecha_publicacion).total_seconds())
+            self._gl_log_timing('general', 'queue', self.fecha_publicacion, lateness)
+
         try:
             # Configuración inicial
             parametros = self.env['ir.config_parameter'].sudo()
             aws_api = parametros.get_param('gl_aws.api_key')
             aws_secret = parametros.get_param('gl_aws.secret')
 
-            combined_text = self._prepare_text()
+            # Tokens vigentes antes de publicar (se renuevan solo si están por expirar)
+            self.env['gl.token.manager']._ensure_partner_tokens(self.mapped('partner_id'))
 
             # Validación de credenciales por red social
             credential_errors = []
@@ -1362,7 +1846,13 @@ class project_task(models.Model):
                     f"Los datos de acceso no fueron configurados para: {', '.join(credential_errors)}")
 
             # Subir archivos a S3 (única operación que debe fallar completamente si hay error)
-            media_urls = upload_files_to_s3(self.adjuntos_ids, aws_api, aws_secret)
+            # Si la preparación al aprobar terminó, solo se suben las renditions ya listas
+            archivos = self.adjuntos_ids
+            if self.media_estado == "listo" and self.media_preparada_ids:
+                archivos = self.media_preparada_ids
+            s3_endpoint = self._gl_api_host('s3')
+            with self._gl_stage('s3', 's3_upload'):
+                media_urls = upload_files_to_s3(archivos, aws_api, aws_secret, endpoint_url=s3_endpoint)
             media_ids = []
             _logger.info(f"Archivos subidos a S3. URLs obtenidas: {media_urls}")
             # Publicación en redes sociales con gestión de errores individual
@@ -1372,15 +1862,18 @@ class project_task(models.Model):
 
             cover_url = None
             if self.imagen_portada and self.tipo == "video_reels":
-                cover_url = upload_files_to_s3([("portada.jpg", self.imagen_portada)], aws_api, aws_secret)[0]
+                with self._gl_stage('s3', 's3_upload'):
+                    cover_url = upload_files_to_s3([("portada.jpg", self.imagen_portada)], aws_api, aws_secret,
+                                                   endpoint_url=s3_endpoint)[0]
 
             procesando = False
+            self._gl_notify_trimmed_texts(self.red_social_ids.mapped('name'))
             # Facebook
             if 'Facebook' in self.red_social_ids.mapped('name'):
                 try:
                     # marcar inicio
                     self.write({"fb_estado": "Procesando", "fb_error": False})
-                    self.publish_on_facebook(media_urls, combined_text)
+                    self.publish_on_facebook(media_urls, self._gl_text_for('facebook'))
                     success_messages.append("Facebook: Publicación en proceso")
                     published_on.append("Facebook")
                 except Exception as e:
@@ -1392,7 +1885,7 @@ class project_task(models.Model):
                 try:
                     # marcar inicio
                     self.write({"ig_estado": "Procesando", "ig_error": False})
-                    self.publish_on_instagram(media_urls, combined_text, cover_url)
+                    self.publish_on_instagram(media_urls, self._gl_text_for('instagram'), cover_url)
                     success_messages.append("Instagram: Publicación en proceso")
                     published_on.append("Instagram")
                 except Exception as e:
@@ -1403,7 +1896,7 @@ class project_task(models.Model):
             if 'TikTok' in self.red_social_ids.mapped('name') and self.tipo == "video_reels":
                 try:
                     self.write({"tt_estado": "Procesando", "tt_error": False})
-                    tik_response = self.publish_on_tiktok(media_urls, combined_text)
+                    tik_response = self.publish_on_tiktok(media_urls, self._gl_text_for('tiktok'))
                     if tik_response:
                         self.write({
                             "tiktok_post_id": tik_response,
@@ -1421,7 +1914,7 @@ class project_task(models.Model):
             if 'LinkedIn' in self.red_social_ids.mapped('name'):
                 try:
                     self.write({"li_estado": "Procesando", "li_error": False})
-                    linkedin_response = self.publish_on_linkedin(media_urls, combined_text)
+                    linkedin_response = self.publish_on_linkedin(media_urls, self._gl_text_for('linkedin'))
                     if linkedin_response:
                         self.write({
                             "linkedin_post_id": linkedin_response["post_id"],
@@ -1565,11 +2058,11 @@ class project_task(models.Model):
         self.ensure_one()
 
         # Token del creador (ajústalo a donde lo guardes)
-        access_token = self.partner_id.tiktok_access_token
+        access_token = self.env['gl.token.manager']._get_tiktok_token(self.partner_id)
         if not access_token:
             raise ValidationError("No existe access_token de TikTok para este creador.")
 
-        url = "https://open.tiktokapis.com/v2/post/publish/creator_info/query/"
+        url = f"{self._gl_api_host('tiktok')}/v2/post/publish/creator_info/query/"
 
         headers = {
             "Authorization": f"Bearer {access_token}",
@@ -1626,8 +2119,11 @@ class project_task(models.Model):
         return True
 
 
-def upload_files_to_s3(files, aws_api, aws_secret):
-    """Sube archivos (imágenes o videos) a AWS S3 y devuelve sus URLs públicas."""
+def upload_files_to_s3(files, aws_api, aws_secret, endpoint_url=None):
+    """Sube archivos (imágenes o videos) a AWS S3 y devuelve sus URLs públicas.
+
+    endpoint_url: S3 alternativo (modo dry-run); se usa direccionamiento por ruta y URLs <endpoint>/<bucket>/<key>.
+    """
     aws_access_key_id = aws_api
     aws_secret_access_key = aws_secret
     bucket_name = 'odoo-geniolibre'
@@ -1641,9 +2137,10 @@ def upload_files_to_s3(files, aws_api, aws_secret):
     # Crear cliente con timeout seguro
     try:
         _logger.info("Iniciando conexión con AWS S3...")
+        s3_config = botocore.config.Config(connect_timeout=5, read_timeout=15,
+                                           s3={'addressing_style': 'path'} if endpoint_url else None)
         s3_client = boto3.client('s3', aws_access_key_id=aws_access_key_id, aws_secret_access_key=aws_secret_access_key,
-                                 region_name=region_name,
-                                 config=botocore.config.Config(connect_timeout=5, read_timeout=15), )
+                                 region_name=region_name, endpoint_url=endpoint_url, config=s3_config, )
         _logger.info("Cliente AWS S3 creado correctamente.")
     except Exception as e:
         _logger.exception("Error al crear el cliente AWS S3")
@@ -1704,7 +2201,10 @@ def upload_files_to_s3(files, aws_api, aws_secret):
                                      'jpeg'
                                  ] else 'video/mp4', )
 
-            file_url = f"https://{bucket_name}.s3.{region_name}.amazonaws.com/{file_name}"
+            if endpoint_url:
+                file_url = f"{endpoint_url}/{bucket_name}/{file_name}"
+            else:
+                file_url = f"https://{bucket_name}.s3.{region_name}.amazonaws.com/{file_name}"
             uploaded_urls.append(file_url)
 
             _logger.info(f"Archivo subido correctamente: {file_url}")
@@ -1717,40 +2217,158 @@ def upload_files_to_s3(files, aws_api, aws_secret):
     return uploaded_urls
 
 
-def get_video_duration_ffprobe(base64_data):
-    import subprocess, json, tempfile, base64
-    from odoo.exceptions import ValidationError
+def upload_facebook_photos(base_url, page_id, access_token, photo_urls, max_workers=FB_UPLOAD_WORKERS):
+    """Sube en paralelo fotos sin publicar a una página usando `url=` y devuelve sus IDs en el mismo orden."""
+    upload_url = f"{base_url}/{page_id}/photos"
 
-    try:
-        with tempfile.NamedTemporaryFile(delete=True, suffix=".mp4") as tmp:
-            tmp.write(base64.b64decode(base64_data))
-            tmp.flush()
-
-            cmd = [
-                "ffprobe",
-                "-v",
-                "quiet",
-                "-select_streams",
-                "v:0",
-                "-show_entries",
-                "format=duration",
-                "-of",
-                "json",
-                tmp.name
-            ]
+    def upload(photo_url):
+        params = {
+            "url": photo_url,  # URL pública (S3): los bytes no vuelven a salir del servidor
+            "published": "false",  # CLAVE: NO publicar aún, se adjuntan al post en _run_facebook_flow
+            "access_token": access_token,
+        }
+        try:
+            data = requests.post(upload_url, params=params, timeout=FB_UPLOAD_TIMEOUT).json()
+        except (requests.RequestException, ValueError) as e:
+            return None, f"{photo_url}: {e}"
 
-            # 🔥 timeout de 3 segundos → evita loops infinitos
-            output = subprocess.check_output(cmd, timeout=3)
-            info = json.loads(output.decode("utf-8"))
+        if "id" not in data:
+            return None, f"{photo_url}: {data}"
+        return data["id"], None
 
-            duration = float(info["format"]["duration"])
-            return int(duration)
+    if not photo_urls:
+        return []
 
-    except subprocess.TimeoutExpired:
-        raise ValidationError("ffprobe demoró demasiado y fue detenido. El archivo puede estar corrupto.")
+    # Los hilos solo hacen HTTP: el token y la página se leen antes para no tocar el ORM fuera del hilo principal
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(photo_urls))) as pool:
+        results = list(pool.map(upload, photo_urls))
 
-    except Exception as e:
-        raise ValidationError(f"No se pudo obtener la duración del video usando ffprobe: {e}")
+    errors = [error for photo_id, error in results if error]
+    if errors:
+        raise ValidationError("Error subiendo foto: " + "; ".join(errors))
+
+    return [photo_id for photo_id, error in results]
+
+
+def create_ig_carousel_items(container_url, access_token, image_urls, max_workers=IG_CAROUSEL_WORKERS):
+    """Crea en paralelo los contenedores de los items de un carrusel y devuelve sus IDs en el mismo orden."""
+
+    def create_item(image_url):
+        item_params = {
+            "access_token": access_token,
+            "is_carousel_item": "true",
+            "image_url": image_url,
+            "published": False,
+        }
+        try:
+            rr = requests.post(container_url, params=item_params, timeout=20)
+            d = rr.json()
+        except (requests.RequestException, ValueError) as e:
+            return None, f"{image_url}: {e}"
+
+        if rr.status_code != 200 or not d.get("id"):
+            return None, f"{image_url}: {d}"
+        return d["id"], None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(image_urls))) as pool:
+        results = list(pool.map(create_item, image_urls))
+
+    errors = [error for item_id, error in results if error]
+    if errors:
+        raise ValidationError("Error item carrusel IG: " + "; ".join(errors))
+
+    return [item_id for item_id, error in results]
+
+
+def wait_for_ig_container(base_url, container_id, access_token, max_wait=IG_READY_MAX_WAIT,
+                          first_delay=IG_READY_FIRST_DELAY):
+    """Consulta el status_code del contenedor con backoff exponencial hasta max_wait segundos.
+
+    Devuelve el último status_code obtenido (FINISHED, ERROR, IN_PROGRESS...) o None. Nunca lanza
+    excepción: si no termina a tiempo, el cron de revisar_post sigue el flujo normal.
+    """
+    deadline = time.monotonic() + max_wait
+    delay = first_delay
+    status_code = None
+
+    while True:
+        try:
+            resp = requests.get(f"{base_url}/{container_id}",
+                                params={"access_token": access_token, "fields": "status_code"}, timeout=5)
+            status_code = resp.json().get("status_code")
+        except (requests.RequestException, ValueError) as e:
+            _logger.warning("No se pudo consultar el contenedor IG %s: %s", container_id, e)
+
+        if status_code in ("FINISHED", "ERROR", "EXPIRED", "PUBLISHED"):
+            return status_code
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return status_code
+        time.sleep(min(delay, remaining))
+        delay *= 2
+
+
+def collapse_trigger_times(times, window):
+    """Agrupa las fechas separadas por menos de `window` y devuelve la última de cada grupo."""
+    collapsed = []
+    group_start = None
+    for moment in sorted(set(times)):
+        if collapsed and moment - group_start <= window:
+            collapsed[-1] = moment
+        else:
+            group_start = moment
+            collapsed.append(moment)
+    return collapsed
+
+
+def trim_post_text(text, limit, suffix=''):
+    """Recorta `text` para que `text + suffix` quepa en `limit` caracteres, sin partir la última palabra.
+
+    El sufijo (los hashtags) se conserva entero; solo si por sí solo no entra se descartan
+    sus últimas palabras y el texto queda fuera.
+    """
+    if len(text) + len(suffix) <= limit:
+        return text + suffix
+    budget = limit - len(suffix)
+    if budget < 2:
+        return _cut_words(suffix.strip(), limit, ellipsis='')
+    return _cut_words(text, budget) + suffix
+
+
+def _cut_words(text, limit, ellipsis='…'):
+    if len(text) <= limit:
+        return text
+    cut = text[:limit - len(ellipsis)]
+    space = max(cut.rfind(' '), cut.rfind('\n'))
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut.rstrip() + ellipsis
+
+
+def apply_m2m_commands(current_ids, commands):
+    """Aplica en memoria una lista de comandos Many2many sobre un conjunto de IDs."""
+    result = set(current_ids)
+
+    # Lista plana de IDs: equivale a (6, 0, ids)
+    if commands and all(isinstance(command, int) for command in commands):
+        return set(commands)
+
+    for command in commands or []:
+        op_type = command[0]
+        if op_type in (2, 3):
+            if command[1]:
+                result.discard(command[1])
+        elif op_type == 4:
+            if command[1]:
+                result.add(command[1])
+        elif op_type == 5:
+            result.clear()
+        elif op_type == 6:
+            result = set(command[2])
+        # 0 (create) y 1 (update) no cambian el conjunto de adjuntos existentes
+
+    return result
 
 
 def remove_duplicate_links(text):
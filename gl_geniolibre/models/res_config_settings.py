@@ -15,6 +15,7 @@ class ResConfigSettings(models.TransientModel):
     facebook_app_secret = fields.Char(string="Facebook APP Secret", config_parameter="gl_facebook.secret")
     facebook_redirect_uri = fields.Char(string="Facebook Redirect URI", config_parameter="facebook_redirect", default="http://localhost:8018/facebook-auth/")
     facebook_api_version = fields.Char(string="Facebook API Version", config_parameter="gl_facebook.api_version")
+    facebook_webhook_verify_token = fields.Char(string="Facebook Webhook Verify Token", config_parameter="gl_facebook.webhook_verify_token")
 
     aws_access_key = fields.Char(string="AWS Clave de acceso", config_parameter="gl_aws.api_key")
     aws_secret = fields.Char(string="AWS Clave de acceso secreta", config_parameter="gl_aws.secret")
@@ -35,11 +36,23 @@ class ResConfigSettings(models.TransientModel):
     linkedin_client_secret = fields.Char("LinkedIn Client Secret", config_parameter="linkedin.client_secret")
     linkedin_redirect_uri = fields.Char("Redirect URI", config_parameter="linkedin.redirect_uri", default="http://localhost:8018/linkedinauth/")
     linkedin_access_token = fields.Char(string="LinkedIn Access Token", config_parameter='linkedin.access_token')
-    linkedin_token_expiry = fields.Char(string="Token Expiry", config_parameter='linkedin.token_expiry')
+    linkedin_token_expiry = fields.Char(string="Token Expiry (UTC)", config_parameter='linkedin.token_expiry')
+    linkedin_refresh_token = fields.Char(string="LinkedIn Refresh Token", config_parameter='linkedin.refresh_token')
+
+    publish_dry_run_url = fields.Char(string="Dry-run: URL del servidor local", config_parameter="gl_publish.dry_run_url",
+                                      help="Si se define, Graph, TikTok, LinkedIn y S3 se llaman contra este servidor "
+                                           "(tools/mock_social_api.py) en lugar de las APIs reales.")
 
     chatgpt_api_key = fields.Char("ChatGPT API Key", config_parameter="chatgpt.api_key")
     chatgpt_base_url = fields.Char("ChatGPT Base URL", config_parameter="chatgpt.base_url", default="https://api.openai.com/v1")
     chatgpt_model = fields.Char("ChatGPT Modelo", config_parameter="chatgpt.model", default="gpt-4.1-mini")
+    chatgpt_cache_ttl_hours = fields.Integer("ChatGPT Caché (horas)", config_parameter="chatgpt.cache_ttl_hours", default=168,
+                                             help="Tiempo que se reutiliza la respuesta de un prompt idéntico")
+    chatgpt_max_workers = fields.Integer("ChatGPT Consultas simultáneas", config_parameter="chatgpt.max_workers", default=4)
+
+    accounts_sync_ttl_minutes = fields.Integer("Vigencia del catálogo de cuentas (min)", config_parameter="gl_accounts.sync_ttl_minutes",
+                                               default=60, help="Tiempo en que las cuentas publicitarias sincronizadas se reutilizan "
+                                                                "sin volver a consultar las APIs")
 
     def action_test_aws_connection(self):
         """Probar conexión con AWS S3 (muestra popup visual en Odoo)"""
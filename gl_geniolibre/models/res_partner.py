@@ -1,17 +1,26 @@
 # -*- coding: utf-8 -*-:
 import base64
 import hashlib
+import logging
 import random
-import time
 import requests
 
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from google.ads.googleads.client import GoogleAdsClient
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
 
+from .gl_token_manager import timestamp_to_datetime
+
 LinkedIn_Version = "202505"
 API_VERSION = None
+ACCOUNT_SYNC_TTL_MINUTES = 60  # ventana en que los catálogos de cuentas publicitarias se consideran al día
+LINKEDIN_NAME_TTL = timedelta(days=7)  # vigencia del nombre guardado de cada organización
+LINKEDIN_LOOKUP_BATCH = 50  # IDs por llamada a organizationsLookup
+LINKEDIN_LOOKUP_WORKERS = 4
+
+_logger = logging.getLogger(__name__)
 
 
 class GoogleAdsAccount(models.Model):
@@ -19,7 +28,8 @@ class GoogleAdsAccount(models.Model):
     _description = 'Cuenta de Google Ads'
 
     name = fields.Char("Nombre")
-    account_id = fields.Char("ID de Cuenta", required=True)
+    account_id = fields.Char("ID de Cuenta", required=True, index=True)
+    active = fields.Boolean("Activo", default=True, help="Se archiva cuando la cuenta se deshabilita o sale de la cuenta administradora")
 
 
 class FacebookAdAccount(models.Model):
@@ -37,6 +47,7 @@ class LinkedInOrganization(models.Model):
     name = fields.Char('Nombre de la Organización')
     account_id = fields.Char('ID de la Organización')  # Solo el ID numérico (ej: "105978413")
     full_urn = fields.Char('URN Completo')  # Campo técnico: "urn:li:organization:105978413"
+    fetched_at = fields.Datetime('Nombre consultado', readonly=True)  # caché del nombre (LINKEDIN_NAME_TTL)
 
 
 class Partner(models.Model):
@@ -57,6 +68,7 @@ class Partner(models.Model):
     facebook_ad_account = fields.Many2one('facebook.ad.account', string='Cuenta publicitaria de Facebook')
     facebook_page_id = fields.Char(string="Facebook Page id", tracking=True)
     facebook_page_access_token = fields.Char(readonly=True)
+    facebook_page_token_expiry = fields.Datetime(string="Expiración Page Token", readonly=True)
     instagram_page_id = fields.Char(readonly=True)
 
     # TikTok
@@ -66,6 +78,7 @@ class Partner(models.Model):
     tiktok_expires_in = fields.Integer()
     tiktok_refresh_expires_in = fields.Integer()
     tiktok_issued_at = fields.Integer()
+    tiktok_token_expiry = fields.Datetime(string="Expiración Token TikTok", compute='_compute_tiktok_token_expiry', store=True, index=True)
     tiktok_nickname = fields.Char(string='TikTok Nickname')
     tiktok_avatar_url = fields.Char(string='TikTok Avatar URL')
     tiktok_open_id = fields.Char(string='TikTok Open ID')
@@ -78,80 +91,77 @@ class Partner(models.Model):
     linkedin_organization = fields.Many2one('linkedin.organization', string='Organización de LinkedIn')
     id_linkedin_organization = fields.Char(string="ID Organización LinkedIn", related='linkedin_organization.account_id', readonly=True, store=True)
 
+    @api.depends('tiktok_issued_at', 'tiktok_expires_in')
+    def _compute_tiktok_token_expiry(self):
+        for partner in self:
+            if partner.tiktok_issued_at and partner.tiktok_expires_in:
+                partner.tiktok_token_expiry = timestamp_to_datetime(partner.tiktok_issued_at + partner.tiktok_expires_in)
+            else:
+                partner.tiktok_token_expiry = False
+
+    def write(self, vals):
+        res = super().write(vals)
+        # Tokens nuevos (OAuth o edición manual): reprogramar la renovación según la nueva expiración
+        if not self.env.context.get('gl_token_refresh') and {'tiktok_issued_at', 'tiktok_expires_in',
+                                                              'facebook_page_token_expiry'}.intersection(vals):
+            self.env['gl.token.manager']._schedule_next_refresh()
+        return res
+
     def facebook_obtener_datos(self):
         API_VERSION = self.env['ir.config_parameter'].sudo().get_param('gl_facebook.api_version')
         def fetch_facebook_accounts():
+            """Sincroniza las cuentas publicitarias; devuelve False si no hay token configurado."""
             access_token = self.env['ir.config_parameter'].sudo().get_param('gl_facebook.api_key')
 
             if not access_token:
-                return
+                return False
 
             url = f"https://graph.facebook.com/{API_VERSION}/me/adaccounts"
             params = {
                 'access_token': access_token,
-                'fields': 'name,account_id'
-            }
-
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            accounts = response.json().get('data', [])
-
-            AdAccount = self.env['facebook.ad.account'].sudo()
-            api_ids = [acc['account_id'] for acc in accounts]
-
-            # 1) Actualizar o crear
-            for acc in accounts:
-                existing = AdAccount.search([
-                    ('account_id', '=', acc['account_id'])
-                ], limit=1)
-                if existing:
-                    if existing.name != acc['name']:
-                        existing.write({
-                            'name': acc['name']
-                        })
-                else:
-                    AdAccount.create({
-                        'name': acc['name'],
-                        'account_id': acc['account_id'],
-                    })
-
-            # 2) Eliminar las cuentas que ya no existen en Facebook
-            stale = AdAccount.search([
-                ('account_id', 'not in', api_ids)
-            ])
-            if stale:
-                stale.unlink()
-
-        if self.facebook_page_id:
-            access_token = self.env['ir.config_parameter'].sudo()
-            page_access_token = access_token.get_param('gl_facebook.api_key')
-            # api_url_token = f'https://graph.facebook.com/{version}/{self.facebook_page_id}?fields=access_token&access_token={page_access_token}'
-
-            params = {
-                'fields': 'access_token,instagram_business_account',
-                'access_token': page_access_token,
+                'fields': 'name,account_id',
+                'limit': 100,
             }
-            url = f'https://graph.facebook.com/{API_VERSION}/{self.facebook_page_id}'
-            fetch_facebook_accounts()
-
-            try:
-                response = requests.get(url, params=params)
-                response.raise_for_status()  # Raise an exception if the request returns an HTTP error
-                data = response.json()
-                self.write({
-                    'facebook_page_access_token': data['access_token'],
-                })
-
-                if 'instagram_business_account' in data:
-                    self.write({
-
-                        'instagram_page_id': data['instagram_business_account']['id'],
-                    })
 
+            # Seguir la paginación de Graph: 'next' ya incluye el token y el cursor
+            accounts = []
+            while url:
+                response = requests.get(url, params=params, timeout=20)
+                response.raise_for_status()
+                result = response.json()
+                accounts.extend(result.get('data', []))
+                url = result.get('paging', {}).get('next')
+                params = None
 
+            sync_account_catalog(self.env['facebook.ad.account'].sudo(), {
+                acc['account_id']: {'name': acc.get('name') or acc['account_id']} for acc in accounts
+            })
+            return True
 
-            except requests.exceptions.RequestException as e:
-                raise ValidationError(f"Error al obtener Tokens de Facebook: {response.json()}")
+        if self.facebook_page_id:
+            # El catálogo de cuentas es común a todos los clientes: no se vuelve a pedir dentro de la ventana
+            if not self._gl_catalog_is_fresh('facebook') and fetch_facebook_accounts():
+                self._gl_mark_catalog_synced('facebook')
+            # Token de página, cuenta de Instagram y expiración real (debug_token) en un solo paso
+            self.env['gl.token.manager']._refresh_facebook(self)
+            self.env['gl.token.manager']._schedule_next_refresh()
+
+    @api.model
+    def _gl_catalog_is_fresh(self, catalog):
+        """True si el catálogo de cuentas (facebook, google, linkedin) se sincronizó dentro de la ventana configurada."""
+        if self.env.context.get('gl_force_sync'):
+            return False
+        icp = self.env['ir.config_parameter'].sudo()
+        synced_at = icp.get_param(f'gl_accounts.{catalog}_synced_at')
+        if not synced_at:
+            return False
+        ttl = int(icp.get_param('gl_accounts.sync_ttl_minutes') or ACCOUNT_SYNC_TTL_MINUTES)
+        return fields.Datetime.to_datetime(synced_at) + timedelta(minutes=ttl) > fields.Datetime.now()
+
+    @api.model
+    def _gl_mark_catalog_synced(self, catalog):
+        self.env['ir.config_parameter'].sudo().set_param(
+            f'gl_accounts.{catalog}_synced_at', fields.Datetime.to_string(fields.Datetime.now()))
 
     def tiktok_get_auth_code(self):
         parametros = self.env['ir.config_parameter'].sudo()
@@ -196,69 +206,24 @@ class Partner(models.Model):
 
 
     def tiktok_renew_token(self):
-        parametros = self.env['ir.config_parameter'].sudo()
-        tiktok_client = parametros.get_param('tiktok_key')
-        tiktok_secret = parametros.get_param('tiktok_secret')
-
-        # Supongamos que guardaste el tiempo en que se emitió y la duración en segundos
-        issued_at = self.tiktok_issued_at
-        expires_in = self.tiktok_expires_in
-        days = 86400 * 1  # 3 días en segundos
-
-        # Calcula el tiempo de expiración y el umbral de renovación
-        expiration_time = issued_at + expires_in
-        renewal_threshold = expiration_time - days
-        # Verifica si ya se necesita renovar
-        if time.time() >= renewal_threshold:
-            url = "https://open.tiktokapis.com/v2/oauth/token/"
-
-            headers = {
-                "Content-Type": "application/x-www-form-urlencoded",
-                "Cache-Control": "no-cache"
-            }
-
-            data = {
-                "client_key": tiktok_client,
-                "client_secret": tiktok_secret,
-                "grant_type": "refresh_token",
-                "refresh_token": self.tiktok_refresh_token
-            }
-            response = requests.post(url, headers=headers, data=data)
-            response_data = response.json()
-            if response.status_code == 200:
-                data = response.json()
-                self.write({
-                    'tiktok_access_token': data.get('access_token'),
-                    'tiktok_expires_in': data.get('expires_in'),
-                    'tiktok_refresh_expires_in': data.get('refresh_expires_in'),
-                    'tiktok_refresh_token': data.get('refresh_token'),
-                    'tiktok_issued_at': int(datetime.now().timestamp()),
-                })
-                return {
-                    'type': 'ir.actions.client',
-                    'tag': 'display_notification',
-                    'params': {
-                        'message': "El token ha sido actualizado",
-                        'type': 'success',
-                        'next': {
-                            'type': 'ir.actions.act_window_close'
-                        },
-                    }
-                }
-            else:
-                raise ValidationError(f"Error al publicar Feed en Facebook: {response_data}")
+        TokenManager = self.env['gl.token.manager']
+        if not self.tiktok_token_expiry or TokenManager._is_expiring(self.tiktok_token_expiry):
+            TokenManager._refresh_tiktok(self)
+            message = "El token ha sido actualizado"
         else:
-            return {
-                'type': 'ir.actions.client',
-                'tag': 'display_notification',
-                'params': {
-                    'message': "El token aún es válido.",
-                    'type': 'success',
-                    'next': {
-                        'type': 'ir.actions.act_window_close'
-                    },
-                }
+            message = "El token aún es válido."
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'message': message,
+                'type': 'success',
+                'next': {
+                    'type': 'ir.actions.act_window_close'
+                },
             }
+        }
 
     def _get_google_ads_client(self):
         config_param = self.env["ir.config_parameter"].sudo()
@@ -273,10 +238,13 @@ class Partner(models.Model):
         return GoogleAdsClient.load_from_dict(config)
 
     def google_obtener_datos(self):
-        self.env['google.ads.account'].search([]).unlink()
+        # La jerarquía de la cuenta administradora (MCC) es común a todos los clientes
+        if self._gl_catalog_is_fresh('google'):
+            return
         client = self._get_google_ads_client()
         ga_service = client.get_service("GoogleAdsService")
 
+        # Sin filtrar por estado: las cuentas deshabilitadas se archivan en lugar de desaparecer
         query = """
                     SELECT
                         customer_client.client_customer,
@@ -285,66 +253,48 @@ class Partner(models.Model):
                         customer_client.status
                     FROM customer_client
                     WHERE customer_client.level = 1
-                      AND customer_client.status = 'ENABLED'
                 """
 
         login_customer_id = self.env["ir.config_parameter"].sudo().get_param("gl_google.login_customer_id")
-        response = ga_service.search(customer_id=login_customer_id, query=query)
-
-        account_model = self.env["google.ads.account"].sudo()
-        for row in response:
-            customer = row.customer_client
-            customer_id = customer.client_customer.split("/")[-1]
-            name = customer.descriptive_name
-            if not account_model.search([
-                ("account_id", "=", customer_id)
-            ]):
-                account_model.create({
-                    "name": name or f"Cuenta {customer_id}",
-                    "account_id": customer_id,
-                })
+        stream = ga_service.search_stream(customer_id=login_customer_id, query=query)
+
+        enabled = client.enums.CustomerStatusEnum.ENABLED
+        accounts = {}
+        for batch in stream:
+            for row in batch.results:
+                customer = row.customer_client
+                customer_id = customer.client_customer.split("/")[-1]
+                accounts[customer_id] = {
+                    "name": customer.descriptive_name or f"Cuenta {customer_id}",
+                    "active": customer.status == enabled,
+                }
+
+        # Archivar (no borrar) mantiene el ID guardado en los clientes que ya tienen la cuenta asignada
+        sync_account_catalog(self.env["google.ads.account"].sudo(), accounts, archive=True)
+        self._gl_mark_catalog_synced('google')
 
     def update_linkedin_organizations(self):
         """Actualiza las organizaciones de LinkedIn desde la API"""
-        LinkedInOrg = self.env['linkedin.organization']
-        access_token = self.env['ir.config_parameter'].sudo().get_param('linkedin.access_token')
-
-        def _get_linkedin_org_name(org_id, headers):
-            """Obtiene el nombre de la organización con manejo robusto de respuestas"""
-            url = f"https://api.linkedin.com/rest/organizations/{org_id}"
-            try:
-                response = requests.get(url, headers=headers, timeout=10)
-                print(response.json())
-                response.raise_for_status()  # Lanza excepción para códigos 4XX/5XX
-
-                data = response.json()
-                # Extraer nombre de la estructura estándar
-                localized_name = data.get('localizedName')
-                vanity_name = data.get('vanityName')
-
-                if localized_name:
-                    return localized_name
-                if vanity_name:
-                    return vanity_name
-                if data.get('name'):
-                    return data['name']
-                if data.get('website'):
-                    from urllib.parse import urlparse
-                    domain = urlparse(data['website']).netloc
-                    if domain:
-                        return domain.split('.')[0].capitalize()
-
-                # Opción 4: ID como último recurso
-                return f"Organización {org_id}"
-
-            except requests.exceptions.RequestException as e:
-                return f"Organización {org_id}"
+        LinkedInOrg = self.env['linkedin.organization'].sudo()
+        access_token = self.env['gl.token.manager']._get_linkedin_token()
 
         ######################### Validaciones #################################
 
         if not access_token:
             raise ValidationError("Token de acceso de LinkedIn no configurado. Por favor configure el parámetro 'linkedin_access_token' en Ajustes Técnicos.")
 
+        if self._gl_catalog_is_fresh('linkedin'):
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': 'Sin cambios',
+                    'message': 'Las organizaciones de LinkedIn se actualizaron recientemente.',
+                    'sticky': False,
+                    'type': 'info',
+                }
+            }
+
         headers = {
             "Authorization": f"Bearer {access_token}",
             "X-Restli-Protocol-Version": "2.0.0",
@@ -392,46 +342,142 @@ class Partner(models.Model):
             error_msg = f"Error en API de LinkedIn: {str(e)}"
             raise ValidationError(error_msg)
 
-        # 2. Borrar registros existentes (solo si obtuvimos datos nuevos)
-        if elements:
-            LinkedInOrg.search([]).unlink()
-
-        # 3. Crear nuevos registros
-        created_count = 0
+        # Sin datos nuevos no se toca el catálogo
+        org_urns = {}
         for org in elements:
             org_urn = org.get('organization', '')
-            if not org_urn:
-                continue
-
-            org_id = org_urn.split(':')[-1]
-
-            # Obtener nombre de la organización
-            org_name = _get_linkedin_org_name(org_id, headers)
-            print(org_name)
-            # Crear registro con manejo de errores
-            try:
-                LinkedInOrg.create({
-                    'name': org_name,
-                    'account_id': org_id,
-                    'full_urn': org_urn,
-                })
-                created_count += 1
-            except Exception as e:
-                raise ValidationError(f"Error al crear organización {org_id}: {str(e)}")
-                continue
+            if org_urn:
+                org_urns[org_urn.split(':')[-1]] = org_urn
+        if not org_urns:
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': 'Advertencia',
+                    'message': 'No se encontraron organizaciones para actualizar',
+                    'sticky': False,
+                    'type': 'warning',
+                }
+            }
+
+        # 2. Nombres: solo se consultan los nuevos o con la caché vencida, en lotes
+        now = fields.Datetime.now()
+        known = {org.account_id: org for org in LinkedInOrg.search_fetch([], ['account_id', 'fetched_at'])}
+        to_lookup = [org_id for org_id in org_urns
+                     if org_id not in known or not known[org_id].fetched_at
+                     or known[org_id].fetched_at < now - LINKEDIN_NAME_TTL]
+        names = fetch_linkedin_org_names(to_lookup, headers)
+
+        remote = {}
+        for org_id, org_urn in org_urns.items():
+            vals = {'full_urn': org_urn}
+            if org_id in names:
+                vals.update(name=names[org_id], fetched_at=now)
+            elif org_id not in known:
+                vals['name'] = f"Organización {org_id}"  # sin fetched_at: se reintenta en la próxima actualización
+            remote[org_id] = vals
+
+        # 3. Diff en bloque contra los registros existentes
+        result = sync_account_catalog(LinkedInOrg, remote)
+        self._gl_mark_catalog_synced('linkedin')
 
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
             'params': {
-                'title': 'Éxito' if created_count else 'Advertencia',
-                'message': f'Se actualizaron {created_count} organizaciones de LinkedIn' if created_count else 'No se encontraron organizaciones para actualizar',
+                'title': 'Éxito',
+                'message': (f"Organizaciones de LinkedIn: {result['created']} nuevas, {result['updated']} actualizadas "
+                            f"y {result['removed']} eliminadas ({len(names)} nombres consultados)."),
                 'sticky': False,
-                'type': 'success' if created_count else 'warning',
+                'type': 'success',
             }
         }
 
 
+def fetch_linkedin_org_names(org_ids, headers):
+    """Consulta los nombres con organizationsLookup?ids=List(...) en lotes paralelos; {org_id: nombre}.
+
+    Los lotes que fallan se omiten (esas organizaciones conservan su nombre anterior).
+    """
+    batches = [org_ids[i:i + LINKEDIN_LOOKUP_BATCH] for i in range(0, len(org_ids), LINKEDIN_LOOKUP_BATCH)]
+
+    def lookup(batch):
+        # Rest.li 2.0: la lista va sin codificar en la URL
+        url = f"https://api.linkedin.com/rest/organizationsLookup?ids=List({','.join(batch)})"
+        try:
+            response = requests.get(url, headers=headers, timeout=15)
+            response.raise_for_status()
+            results = response.json().get('results') or {}
+        except requests.exceptions.RequestException as e:
+            _logger.warning("No se pudieron consultar %s organizaciones de LinkedIn: %s", len(batch), e)
+            return {}
+        return {str(org_id): linkedin_org_name(data, org_id) for org_id, data in results.items()}
+
+    names = {}
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(LINKEDIN_LOOKUP_WORKERS, len(batches))) as pool:
+            for result in pool.map(lookup, batches):
+                names.update(result)
+    return names
+
+
+def linkedin_org_name(data, org_id):
+    """Nombre legible de una organización de LinkedIn a partir de su respuesta."""
+    if data.get('localizedName'):
+        return data['localizedName']
+    if data.get('vanityName'):
+        return data['vanityName']
+    if data.get('name') and isinstance(data['name'], str):
+        return data['name']
+    if data.get('website'):
+        from urllib.parse import urlparse
+        domain = urlparse(data['website']).netloc
+        if domain:
+            return domain.split('.')[0].capitalize()
+    return f"Organización {org_id}"
+
+
+def sync_account_catalog(Model, remote, key='account_id', archive=False):
+    """Aplica en bloque el catálogo remoto {account_id: vals} sobre los registros de Model.
+
+    Carga los registros existentes una sola vez, escribe solo los que cambiaron, crea los nuevos
+    en un solo create y elimina los que ya no existen (y duplicados del mismo ID). Con archive=True
+    los que ya no existen se archivan (el modelo debe tener el campo active).
+    """
+    Model = Model.with_context(active_test=False)
+    field_names = list({name for vals in remote.values() for name in vals} | ({'active'} if archive else set()))
+    existing = {}
+    stale = Model.browse()
+    for record in Model.search_fetch([], [key] + field_names):
+        if record[key] in existing:
+            stale |= record
+        else:
+            existing[record[key]] = record
+
+    to_create = []
+    updated = 0
+    for account_id, vals in remote.items():
+        record = existing.pop(account_id, None)
+        if record is None:
+            to_create.append(dict(vals, **{key: account_id}))
+            continue
+        changes = {name: value for name, value in vals.items() if record[name] != value}
+        if changes:
+            record.write(changes)
+            updated += 1
+
+    for record in existing.values():
+        stale |= record
+    if archive:
+        stale = stale.filtered('active')
+        stale.write({'active': False})
+    else:
+        stale.unlink()
+    removed = len(stale)
+    Model.create(to_create)
+    return {'created': len(to_create), 'updated': updated, 'removed': removed}
+
+
 def generate_random_string(length):
     characters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~'
     return ''.join(random.choice(characters) for _ in range(length))
@@ -29,17 +29,18 @@
         events: function(fetchInfo, successCallback, failureCallback) {
 
 
-            // Llamar al endpoint del controlador
-            fetch(`/my/projects/${projectId}/calendar/events`, {
-                method: 'POST',
+            // Llamar al endpoint del controlador (GET cacheable: el navegador revalida con ETag → 304)
+            const params = new URLSearchParams({
+                start: fetchInfo.start.toISOString(),
+                end: fetchInfo.end.toISOString()
+            });
+            fetch(`/my/projects/${projectId}/calendar/events?${params}`, {
+                method: 'GET',
                 headers: {
-                    'Content-Type': 'application/json',
+                    'Accept': 'application/json',
                     'X-Requested-With': 'XMLHttpRequest'
                 },
-                body: JSON.stringify({
-                    start: fetchInfo.start.toISOString(),
-                    end: fetchInfo.end.toISOString()
-                })
+                credentials: 'same-origin'
             })
             .then(response => {
                 if (!response.ok) {
@@ -48,8 +49,7 @@
                 return response.json();
             })
             .then(data => {
-                const events = data.result || [];   // 👈 Extraemos solo el array
-                successCallback(events);
+                successCallback(Array.isArray(data) ? data : []);
             })
             .catch(err => {
                 failureCallback(err);
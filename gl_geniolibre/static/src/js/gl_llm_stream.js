@@ -0,0 +1,101 @@
+/** @odoo-module **/
+
+import { Component, useState } from "@odoo/owl";
+import { registry } from "@web/core/registry";
+import { useService } from "@web/core/utils/hooks";
+import { standardWidgetProps } from "@web/views/widgets/standard_widget_props";
+
+/**
+ * Botón que consulta la IA en streaming (SSE) y muestra el texto a medida que llega.
+ * Al terminar, el servidor ya guardó la respuesta en el campo del flujo y se recarga el registro.
+ * "Regenerar" envía force=1: el servidor ignora la respuesta en caché y consulta de nuevo a la IA.
+ *
+ *   <widget name="gl_llm_stream" options="{'kind': 'ideas', 'label': 'Generar con IA'}"/>
+ */
+export class GlLlmStream extends Component {
+    static template = "gl_geniolibre.GlLlmStream";
+    static props = {
+        ...standardWidgetProps,
+        kind: String,
+        label: String,
+        icon: { type: String, optional: true },
+    };
+
+    setup() {
+        this.notification = useService("notification");
+        this.state = useState({ running: false, text: "" });
+    }
+
+    async onClick(force = false) {
+        const record = this.props.record;
+        if (!(await record.save())) {
+            return;
+        }
+
+        this.state.running = true;
+        this.state.text = "";
+        try {
+            const body = new FormData();
+            body.append("csrf_token", odoo.csrf_token);
+            if (force) {
+                body.append("force", "1");
+            }
+            const response = await fetch(`/gl/contenido/${record.resId}/stream/${this.props.kind}`, {
+                method: "POST",
+                body,
+            });
+            if (!response.ok) {
+                const data = await response.json().catch(() => ({}));
+                throw new Error(data.error || response.statusText);
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = "";
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) {
+                    break;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split("\n\n");
+                buffer = events.pop();
+                for (const raw of events) {
+                    this.handleEvent(raw);
+                }
+            }
+            await record.load();
+        } catch (error) {
+            this.notification.add(error.message, { type: "danger" });
+        } finally {
+            this.state.running = false;
+        }
+    }
+
+    handleEvent(raw) {
+        let event = "message";
+        let data = "";
+        for (const line of raw.split("\n")) {
+            if (line.startsWith("event:")) {
+                event = line.slice(6).trim();
+            } else if (line.startsWith("data:")) {
+                data += line.slice(5).trim();
+            }
+        }
+        const payload = data ? JSON.parse(data) : {};
+        if (event === "delta") {
+            this.state.text += payload.text;
+        } else if (event === "error") {
+            throw new Error(payload.message);
+        }
+    }
+}
+
+registry.category("view_widgets").add("gl_llm_stream", {
+    component: GlLlmStream,
+    extractProps: ({ options }) => ({
+        kind: options.kind,
+        label: options.label || "Generar con IA",
+        icon: options.icon,
+    }),
+});
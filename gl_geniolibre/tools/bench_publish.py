@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de publicación en modo dry-run contra mock_social_api.py.
+
+Configura gl_publish.dry_run_url, crea N tareas aprobadas y programadas con una imagen y las redes elegidas,
+dispara los crons de publicación/revisión y mide el throughput y la latencia (p50/p95) por red, desde que
+la tarea queda encolada hasta que su estado de red llega a Publicado o Error.
+
+Uso:
+    python mock_social_api.py --port 8099 --latency-ms 150 &
+    python bench_publish.py --url http://localhost:8018 --db geniolibre --user admin --password admin \\
+        --project-id 12 --tasks 2000 --image muestra.jpg --mock-url http://localhost:8099 --setup-partner
+"""
+import argparse
+import base64
+import statistics
+import threading
+import time
+import xmlrpc.client
+
+from datetime import datetime, timedelta
+
+SEED_BATCH = 200
+POLL_INTERVAL = 1  # segundos
+NETWORK_FIELDS = {
+    "Facebook": "fb_estado",
+    "Instagram": "ig_estado",
+    "TikTok": "tt_estado",
+    "LinkedIn": "li_estado",
+}
+FINAL_STATES = ("Publicado", "Error")
+CRON_XMLIDS = ["ir_cron_publicar_post", "ir_cron_check_ins_processing"]
+
+
+class Odoo:
+    """Cliente XML-RPC mínimo; cada hilo debe usar su propia instancia."""
+
+    def __init__(self, args):
+        self.args = args
+        common = xmlrpc.client.ServerProxy(f"{args.url}/xmlrpc/2/common")
+        self.uid = common.authenticate(args.db, args.user, args.password, {})
+        self.models = xmlrpc.client.ServerProxy(f"{args.url}/xmlrpc/2/object", allow_none=True)
+
+    def call(self, model, method, *args, **kwargs):
+        return self.models.execute_kw(self.args.db, self.uid, self.args.password, model, method, list(args), kwargs)
+
+
+def setup(odoo, args):
+    odoo.call("ir.config_parameter", "set_param", "gl_publish.dry_run_url", args.mock_url)
+
+    project = odoo.call("project.project", "read", [args.project_id], fields=["partner_id"])[0]
+    partner_id = project["partner_id"] and project["partner_id"][0]
+    if args.setup_partner:
+        if not partner_id:
+            raise SystemExit("El proyecto no tiene cliente asignado")
+        # Credenciales ficticias: el mock acepta cualquier token
+        odoo.call("res.partner", "write", [partner_id], {
+            "facebook_page_id": "1000",
+            "facebook_page_access_token": "mock-page-token",
+            "instagram_page_id": "2000",
+            "tiktok_access_token": "mock-tiktok-token",
+        })
+
+    networks = odoo.call("red.social", "search_read", [("name", "in", args.networks)], fields=["name"])
+    if not networks:
+        raise SystemExit(f"No existen las redes {args.networks}")
+
+    with open(args.image, "rb") as f:
+        datas = base64.b64encode(f.read()).decode()
+    attachment_id = odoo.call("ir.attachment", "create", {
+        "name": "bench_publish.jpg",
+        "datas": datas,
+        "mimetype": "image/jpeg",
+    })
+    return networks, attachment_id
+
+
+def enqueue(odoo, args, networks, attachment_id):
+    fecha = (datetime.utcnow() - timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M:%S")
+    task_ids = []
+    while len(task_ids) < args.tasks:
+        size = min(SEED_BATCH, args.tasks - len(task_ids))
+        vals_list = [{
+            "name": f"Bench publicación {len(task_ids) + i + 1}",
+            "project_id": args.project_id,
+            "tipo": "feed",
+            "description": "<p>Publicación de prueba (dry-run)</p>",
+            "fecha_publicacion": fecha,
+            "red_social_ids": [(6, 0, [n["id"] for n in networks])],
+            "adjuntos_ids": [(6, 0, [attachment_id])],
+            "state": "03_approved",
+            "post_estado": "Programado",
+        } for i in range(size)]
+        task_ids += odoo.call("project.task", "create", vals_list,
+                              context={"tracking_disable": True, "mail_create_nolog": True})
+        print(f"Tareas encoladas: {len(task_ids)}/{args.tasks}")
+    return task_ids
+
+
+def run_crons(args, stop):
+    """Dispara los crons en bucle (cada disparo es síncrono) hasta que se pida parar."""
+    odoo = Odoo(args)
+    cron_ids = [d["res_id"] for d in odoo.call("ir.model.data", "search_read", [
+        ("module", "=", "gl_geniolibre"), ("name", "in", CRON_XMLIDS)
+    ], fields=["res_id"])]
+    while not stop.is_set():
+        for cron_id in cron_ids:
+            try:
+                odoo.call("ir.cron", "method_direct_trigger", [cron_id])
+            except xmlrpc.client.Fault as e:
+                print(f"Aviso: el cron {cron_id} falló: {e.faultString.splitlines()[-1]}")
+        stop.wait(POLL_INTERVAL)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def measure(odoo, args, task_ids, networks):
+    fields = [NETWORK_FIELDS[n["name"]] for n in networks]
+    pending = {(task_id, field) for task_id in task_ids for field in fields}
+    latencies = {field: [] for field in fields}
+    states = {field: {} for field in fields}
+
+    stop = threading.Event()
+    worker = threading.Thread(target=run_crons, args=(args, stop), daemon=True)
+    t0 = time.monotonic()
+    worker.start()
+
+    try:
+        while pending and time.monotonic() - t0 < args.timeout:
+            time.sleep(POLL_INTERVAL)
+            elapsed = time.monotonic() - t0
+            ids = sorted({task_id for task_id, _ in pending})
+            for row in odoo.call("project.task", "read", ids, fields=fields):
+                for field in fields:
+                    if (row["id"], field) in pending and row[field] in FINAL_STATES:
+                        pending.discard((row["id"], field))
+                        latencies[field].append(elapsed)
+                        states[field][row[field]] = states[field].get(row[field], 0) + 1
+            done = len(task_ids) * len(fields) - len(pending)
+            print(f"\r{elapsed:7.1f}s  completadas {done}/{len(task_ids) * len(fields)}", end="", flush=True)
+    finally:
+        stop.set()
+        worker.join()
+    total = time.monotonic() - t0
+    print()
+
+    for network in networks:
+        field = NETWORK_FIELDS[network["name"]]
+        values = latencies[field]
+        if not values:
+            print(f"{network['name']:10} sin publicaciones completadas")
+            continue
+        print(f"{network['name']:10} n={len(values):5} p50={statistics.median(values):7.1f} s "
+              f"p95={percentile(values, 95):7.1f} s throughput={len(values) / total:6.2f}/s estados={states[field]}")
+    if pending:
+        print(f"Pendientes tras {args.timeout}s: {len(pending)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8018")
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--user", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--project-id", type=int, required=True)
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--image", required=True, help="JPEG que se adjunta a todas las tareas")
+    parser.add_argument("--networks", nargs="+", default=["Facebook", "Instagram"], choices=list(NETWORK_FIELDS))
+    parser.add_argument("--mock-url", default="http://localhost:8099")
+    parser.add_argument("--setup-partner", action="store_true",
+                        help="Escribe credenciales ficticias en el cliente del proyecto")
+    parser.add_argument("--timeout", type=float, default=1800, help="Segundos máximos de medición")
+    parser.add_argument("--keep-dry-run", action="store_true",
+                        help="No borra gl_publish.dry_run_url al terminar")
+
+    args = parser.parse_args()
+    args.url = args.url.rstrip("/")
+
+    odoo = Odoo(args)
+    networks, attachment_id = setup(odoo, args)
+    try:
+        task_ids = enqueue(odoo, args, networks, attachment_id)
+        measure(odoo, args, task_ids, networks)
+    finally:
+        if not args.keep_dry_run:
+            odoo.call("ir.config_parameter", "set_param", "gl_publish.dry_run_url", False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga del endpoint de eventos del calendario del portal.
+
+Crea (opcionalmente) N tareas con fecha de publicación en un proyecto vía XML-RPC y mide la latencia de
+/my/projects/<id>/calendar/events por mes: primera carga (200) y revalidación con If-None-Match (304).
+
+Uso:
+    python calendar_load_test.py --url http://localhost:8018 --db geniolibre --user admin --password admin \\
+        --project-id 12 --seed 10000 --months 12 --rounds 5
+"""
+import argparse
+import random
+import statistics
+import time
+import xmlrpc.client
+
+from datetime import datetime, timedelta
+
+import requests
+
+SEED_BATCH = 500
+
+
+def seed_tasks(args):
+    common = xmlrpc.client.ServerProxy(f"{args.url}/xmlrpc/2/common")
+    uid = common.authenticate(args.db, args.user, args.password, {})
+    models = xmlrpc.client.ServerProxy(f"{args.url}/xmlrpc/2/object", allow_none=True)
+
+    start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    span = timedelta(days=30 * args.months).total_seconds()
+    estados = ["Borrador", "Programado", "Publicado", "Procesando", "Error"]
+
+    created = 0
+    while created < args.seed:
+        size = min(SEED_BATCH, args.seed - created)
+        vals_list = [{
+            "name": f"Carga calendario {created + i + 1}",
+            "project_id": args.project_id,
+            "tipo": "otro",
+            "post_estado": random.choice(estados),
+            "fecha_publicacion": (start + timedelta(seconds=random.uniform(0, span))).strftime("%Y-%m-%d %H:%M:%S"),
+        } for i in range(size)]
+        models.execute_kw(args.db, uid, args.password, "project.task", "create", [vals_list],
+                          {"context": {"tracking_disable": True, "mail_create_nolog": True}})
+        created += size
+        print(f"Tareas creadas: {created}/{args.seed}")
+
+
+def month_ranges(months):
+    start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for _ in range(months):
+        end = (start + timedelta(days=32)).replace(day=1)
+        yield start, end
+        start = end
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run(args):
+    session = requests.Session()
+    auth = session.post(f"{args.url}/web/session/authenticate", json={
+        "jsonrpc": "2.0",
+        "params": {"db": args.db, "login": args.user, "password": args.password},
+    }, timeout=30)
+    auth.raise_for_status()
+
+    endpoint = f"{args.url}/my/projects/{args.project_id}/calendar/events"
+    full, revalidated = [], []
+    events_total = 0
+
+    for _ in range(args.rounds):
+        for start, end in month_ranges(args.months):
+            params = {"start": start.isoformat() + "Z", "end": end.isoformat() + "Z"}
+
+            t0 = time.perf_counter()
+            response = session.get(endpoint, params=params, timeout=60)
+            full.append((time.perf_counter() - t0) * 1000)
+            response.raise_for_status()
+            events_total += len(response.json())
+
+            t0 = time.perf_counter()
+            cached = session.get(endpoint, params=params, timeout=60,
+                                 headers={"If-None-Match": response.headers.get("ETag", "")})
+            revalidated.append((time.perf_counter() - t0) * 1000)
+            if cached.status_code != 304:
+                print(f"Aviso: se esperaba 304 y se obtuvo {cached.status_code}")
+
+    for label, values in (("200 (completo)", full), ("304 (ETag)", revalidated)):
+        print(f"{label:15} n={len(values):4} p50={statistics.median(values):8.1f} ms "
+              f"p95={percentile(values, 95):8.1f} ms max={max(values):8.1f} ms")
+    print(f"Eventos promedio por mes: {events_total / max(len(full), 1):.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8018")
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--user", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--project-id", type=int, required=True)
+    parser.add_argument("--seed", type=int, default=0, help="Tareas a crear antes de medir (p.ej. 10000)")
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--rounds", type=int, default=3)
+
+    args = parser.parse_args()
+    args.url = args.url.rstrip("/")
+
+    if args.seed:
+        seed_tasks(args)
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+Servidor local que imita las APIs de publicación (Graph de Meta, TikTok, LinkedIn y S3) para el modo dry-run,
+y un endpoint chat/completions compatible con OpenAI para probar gl.llm.gateway.
+
+Odoo envía las llamadas a <url>/<servicio>/... cuando el parámetro gl_publish.dry_run_url está definido
+(Ajustes → GenioLibre → Publicación (pruebas)). S3 se comporta como moto: buckets en memoria que se crean
+al primer PUT, GET/HEAD con Range y errores NoSuchKey en XML. Para la IA basta con apuntar chatgpt.base_url
+a <url>/openai/v1.
+
+Uso:
+    python mock_social_api.py --port 8099 --latency-ms 150 --jitter-ms 50 --error-rate 0.01
+    python mock_social_api.py --profile graph=400:0.05 --profile tiktok=800:0.1 --ready-after 3
+
+GET /_stats devuelve las peticiones y errores por servicio; POST /_reset limpia contadores y S3.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+LINKEDIN_CHUNK = 4 * 1024 * 1024
+
+
+class MockState:
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.ids = itertools.count(10 ** 15)
+        self.created_at = {}  # id → time.monotonic() de contenedores/videos/publish_id
+        self.s3 = {}  # (bucket, key) → (bytes, content_type)
+        self.requests = Counter()
+        self.errors = Counter()
+        self.profiles = {}
+        for profile in args.profile or []:
+            service, values = profile.split("=", 1)
+            latency, error_rate = values.split(":")
+            self.profiles[service] = (float(latency), float(error_rate))
+
+    def new_id(self, track=False):
+        with self.lock:
+            new_id = str(next(self.ids))
+            if track:
+                self.created_at[new_id] = time.monotonic()
+        return new_id
+
+    def is_ready(self, object_id):
+        created = self.created_at.get(object_id)
+        return created is None or time.monotonic() - created >= self.args.ready_after
+
+    def latency_and_error_rate(self, service):
+        latency, error_rate = self.profiles.get(service, (self.args.latency_ms, self.args.error_rate))
+        delay = max(0.0, random.gauss(latency, self.args.jitter_ms)) / 1000
+        return delay, error_rate
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None  # se asigna en main()
+
+    # ------------------------------------------------------------------ infraestructura
+    def log_message(self, fmt, *args):
+        if self.state.args.verbose:
+            super().log_message(fmt, *args)
+
+    def _send(self, status=200, body=b"", content_type="application/json", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if "aws-chunked" in (self.headers.get("Content-Encoding") or ""):
+            body = decode_aws_chunked(body)
+        return body
+
+    def _params(self, body):
+        params = {k: v[-1] for k, v in parse_qs(urlparse(self.path).query).items()}
+        content_type = self.headers.get("Content-Type") or ""
+        if body and "application/json" in content_type:
+            try:
+                params.update(json.loads(body))
+            except ValueError:
+                pass
+        elif body and "application/x-www-form-urlencoded" in content_type:
+            params.update({k: v[-1] for k, v in parse_qs(body.decode("utf-8", "ignore")).items()})
+        return params
+
+    def _dispatch(self):
+        path = urlparse(self.path).path
+        parts = [p for p in path.split("/") if p]
+        service = parts[0] if parts else ""
+        body = self._read_body() if self.command in ("POST", "PUT") else b""
+
+        if service == "_stats":
+            return self._send(200, {"requests": self.state.requests, "errors": self.state.errors})
+        if service == "_reset":
+            with self.state.lock:
+                self.state.requests.clear()
+                self.state.errors.clear()
+                self.state.s3.clear()
+            return self._send(200, {"ok": True})
+
+        delay, error_rate = self.state.latency_and_error_rate(service)
+        time.sleep(delay)
+        with self.state.lock:
+            self.state.requests[service] += 1
+        if random.random() < error_rate:
+            with self.state.lock:
+                self.state.errors[service] += 1
+            if service == "s3":
+                return self._send(503, s3_error("SlowDown", "Please reduce your request rate."), "application/xml")
+            return self._send(500, {"error": {"message": "Mock: error simulado", "code": 2, "type": "OAuthException"}})
+
+        handler = getattr(self, f"_handle_{service}", None)
+        if not handler:
+            return self._send(404, {"error": {"message": f"Servicio desconocido: {service}"}})
+        return handler(parts[1:], self._params(body), body)
+
+    do_GET = do_POST = do_PUT = do_HEAD = lambda self: self._dispatch()
+
+    @property
+    def base_url(self):
+        return f"http://{self.headers.get('Host')}"
+
+    # ------------------------------------------------------------------ Graph (Facebook / Instagram)
+    def _handle_graph(self, parts, params, body):
+        if parts and parts[0] == "rupload":
+            return self._send(200, {"success": True})
+
+        parts = parts[1:]  # versión de la API
+        if not parts:
+            return self._send(400, {"error": {"message": "Ruta vacía"}})
+        edge = parts[1] if len(parts) > 1 else None
+        object_id = parts[0]
+
+        if self.command == "GET":
+            if object_id == "debug_token":
+                return self._send(200, {"data": {"is_valid": True, "expires_at": 0}})
+            if edge == "thumbnails":
+                return self._send(200, {"data": []})
+            fields = (params.get("fields") or "").split(",")
+            ready = self.state.is_ready(object_id)
+            data = {"id": object_id}
+            if "status_code" in fields:
+                data["status_code"] = "FINISHED" if ready else "IN_PROGRESS"
+            if "status" in fields:
+                phase = {"status": "complete" if ready else "in_progress"}
+                data["status"] = {"video_status": "ready" if ready else "processing", "uploading_phase": phase,
+                                  "processing_phase": phase, "publishing_phase": phase}
+            if "permalink" in fields:
+                data["permalink"] = f"https://www.instagram.com/p/mock{object_id}/"
+            if "permalink_url" in fields:
+                data["permalink_url"] = f"https://www.facebook.com/reel/{object_id}"
+            if "access_token" in fields:
+                data["access_token"] = f"mock-page-token-{object_id}"
+            return self._send(200, data)
+
+        if edge in ("video_stories", "video_reels"):
+            if params.get("upload_phase") == "start":
+                video_id = self.state.new_id(track=True)
+                return self._send(200, {"video_id": video_id, "upload_url": f"{self.base_url}/graph/rupload/{video_id}"})
+            return self._send(200, {"success": True, "post_id": self.state.new_id()})
+        if edge == "photos":
+            return self._send(200, {"id": self.state.new_id()})
+        if edge == "feed":
+            return self._send(200, {"id": f"{object_id}_{self.state.new_id()}"})
+        if edge == "media":
+            return self._send(200, {"id": self.state.new_id(track=True)})
+        if edge == "media_publish":
+            creation_id = params.get("creation_id")
+            if not self.state.is_ready(creation_id):
+                return self._send(400, {"error": {"message": "Media ID is not available", "code": 9007}})
+            return self._send(200, {"id": self.state.new_id()})
+        if edge == "thumbnails":
+            return self._send(200, {"success": True})
+        # finish de reels sin publicar: POST /<video_id>
+        return self._send(200, {"success": True})
+
+    # ------------------------------------------------------------------ TikTok
+    def _handle_tiktok(self, parts, params, body):
+        path = "/".join(parts)
+        ok = {"code": "ok", "message": ""}
+        if path.startswith("v2/oauth/token"):
+            return self._send(200, {"access_token": f"mock-tt-{self.state.new_id()}", "expires_in": 86400,
+                                    "refresh_token": f"mock-rt-{self.state.new_id()}", "refresh_expires_in": 31536000})
+        if path.startswith("v2/post/publish/creator_info/query"):
+            return self._send(200, {"data": {"creator_nickname": "mock", "can_publish": True,
+                                             "max_video_post_duration_sec": 600,
+                                             "privacy_level_options": ["PUBLIC_TO_EVERYONE", "SELF_ONLY"]},
+                                    "error": ok})
+        if path.startswith("v2/post/publish/video/init"):
+            return self._send(200, {"data": {"publish_id": f"v_pub_url~{self.state.new_id(track=True)}"}, "error": ok})
+        if path.startswith("v2/post/publish/status/fetch"):
+            publish_id = str(params.get("publish_id") or "")
+            if not self.state.is_ready(publish_id.split("~")[-1]):
+                return self._send(200, {"data": {"status": "PROCESSING_DOWNLOAD"}, "error": ok})
+            return self._send(200, {"data": {"status": "PUBLISH_COMPLETE",
+                                             "publicaly_available_post_id": [self.state.new_id()]}, "error": ok})
+        return self._send(404, {"error": {"code": "not_found", "message": path}})
+
+    # ------------------------------------------------------------------ LinkedIn
+    def _handle_linkedin(self, parts, params, body):
+        if parts and parts[0] == "upload":
+            return self._send(201, b"", headers={"ETag": f'"{self.state.new_id()}"'})
+
+        resource = parts[1] if len(parts) > 1 else ""
+        action = params.get("action")
+        if resource == "images" and action == "initializeUpload":
+            image_id = self.state.new_id()
+            return self._send(200, {"value": {"uploadUrl": f"{self.base_url}/linkedin/upload/{image_id}",
+                                              "image": f"urn:li:image:{image_id}"}})
+        if resource == "videos" and action == "initializeUpload":
+            video_id = self.state.new_id()
+            request = params.get("initializeUploadRequest") or {}
+            size = int(request.get("fileSizeBytes") or 1)
+            instructions = [{
+                "uploadUrl": f"{self.base_url}/linkedin/upload/{video_id}-{first}",
+                "firstByte": first,
+                "lastByte": min(first + LINKEDIN_CHUNK, size) - 1,
+            } for first in range(0, size, LINKEDIN_CHUNK)]
+            value = {"video": f"urn:li:video:{video_id}", "uploadToken": "", "uploadInstructions": instructions}
+            if request.get("uploadThumbnail"):
+                value["thumbnailUploadUrl"] = f"{self.base_url}/linkedin/upload/{video_id}-thumb"
+            return self._send(200, {"value": value})
+        if resource == "videos" and action == "finalizeUpload":
+            return self._send(200, {})
+        if resource == "posts":
+            return self._send(201, b"", headers={"X-RestLi-Id": f"urn:li:share:{self.state.new_id()}"})
+        return self._send(404, {"message": f"Recurso desconocido: {resource}"})
+
+    # ------------------------------------------------------------------ OpenAI (chat/completions)
+    def _handle_openai(self, parts, params, body):
+        if "/".join(parts[-2:]) != "chat/completions":
+            return self._send(404, {"error": {"message": "Solo se implementa chat/completions"}})
+        messages = params.get("messages") or []
+        prompt = " ".join(str(m.get("content") or "") for m in messages)
+        # Respuesta determinista por prompt: permite comprobar aciertos de caché comparando textos
+        content = f"Respuesta simulada #{hashlib.sha1(prompt.encode()).hexdigest()[:8]} ({len(prompt)} caracteres de prompt)"
+        prompt_tokens = max(1, len(prompt) // 4)
+        completion_tokens = max(1, len(content) // 4)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        if params.get("stream"):
+            return self._stream_completion(content, usage, params.get("model") or "mock")
+        return self._send(200, {
+            "id": f"chatcmpl-{self.state.new_id()}",
+            "object": "chat.completion",
+            "model": params.get("model") or "mock",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": usage,
+        })
+
+    def _stream_completion(self, content, usage, model):
+        """Envía la respuesta palabra por palabra como SSE (stream=True con include_usage)."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        completion_id = f"chatcmpl-{self.state.new_id()}"
+
+        def event(choices, extra=None):
+            chunk = dict({"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                          "choices": choices}, **(extra or {}))
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        words = content.split(" ")
+        for index, word in enumerate(words):
+            text = word if index == len(words) - 1 else word + " "
+            event([{"index": 0, "delta": {"content": text}, "finish_reason": None}])
+            time.sleep(self.state.args.stream_delay_ms / 1000)
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        event([], {"usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    # ------------------------------------------------------------------ S3 (estilo moto, direccionamiento por ruta)
+    def _handle_s3(self, parts, params, body):
+        if len(parts) < 2:
+            return self._send(200, b"<ListAllMyBucketsResult/>", "application/xml")
+        key = (parts[0], "/".join(parts[1:]))
+
+        if self.command == "PUT":
+            with self.state.lock:
+                self.state.s3[key] = (body, self.headers.get("Content-Type") or "application/octet-stream")
+            return self._send(200, b"", headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+        stored = self.state.s3.get(key)
+        if not stored:
+            return self._send(404, s3_error("NoSuchKey", "The specified key does not exist."), "application/xml")
+
+        data, content_type = stored
+        range_header = self.headers.get("Range")
+        if range_header and range_header.startswith("bytes="):
+            first, _, last = range_header[len("bytes="):].partition("-")
+            first, last = int(first), int(last or len(data) - 1)
+            return self._send(206, data[first:last + 1], content_type,
+                              headers={"Content-Range": f"bytes {first}-{last}/{len(data)}", "Accept-Ranges": "bytes"})
+        return self._send(200, data, content_type, headers={"Accept-Ranges": "bytes"})
+
+
+def decode_aws_chunked(body):
+    """Decodifica un cuerpo 'aws-chunked' (<hex>;chunk-signature=...\\r\\n<datos>\\r\\n ... 0\\r\\n)."""
+    output = bytearray()
+    position = 0
+    while position < len(body):
+        line_end = body.index(b"\r\n", position)
+        size = int(body[position:line_end].split(b";")[0], 16)
+        if size == 0:
+            break
+        start = line_end + 2
+        output += body[start:start + size]
+        position = start + size + 2
+    return bytes(output)
+
+
+def s3_error(code, message):
+    return f"<?xml version='1.0' encoding='UTF-8'?><Error><Code>{code}</Code><Message>{message}</Message></Error>".encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=100, help="Latencia media por petición")
+    parser.add_argument("--jitter-ms", type=float, default=30, help="Desviación estándar de la latencia")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilidad de error (0-1)")
+    parser.add_argument("--profile", action="append",
+                        help="Latencia y error por servicio: <servicio>=<latencia_ms>:<error_rate>")
+    parser.add_argument("--ready-after", type=float, default=2,
+                        help="Segundos hasta que contenedores, videos y publish_id quedan listos")
+    parser.add_argument("--stream-delay-ms", type=float, default=50,
+                        help="Pausa entre fragmentos de chat/completions con stream=True")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    MockHandler.state = MockState(args)
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    print(f"Mock de APIs sociales en http://{args.host}:{args.port} (Ctrl+C para salir)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
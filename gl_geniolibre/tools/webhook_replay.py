@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Envía payloads de ejemplo firmados a los webhooks de Meta y TikTok de una instancia local.
+
+Uso:
+    python webhook_replay.py meta --url http://localhost:8018 --secret <app_secret> --video-id 123 --status ready
+    python webhook_replay.py meta --url http://localhost:8018 --secret <app_secret> --media-id 456
+    python webhook_replay.py tiktok --url http://localhost:8018 --secret <client_secret> \\
+        --publish-id v_pub_url~123 --event post.publish.publicly_available --post-id 789
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import time
+
+import requests
+
+
+def meta_payload(args):
+    value = {}
+    if args.video_id:
+        value = {"id": args.video_id, "status": {"video_status": args.status}}
+    elif args.media_id:
+        value = {"media_id": args.media_id}
+
+    return {
+        "object": "instagram" if args.media_id else "page",
+        "entry": [{
+            "id": args.page_id,
+            "time": int(time.time()),
+            "changes": [{
+                "field": "mentions" if args.media_id else "videos",
+                "value": value,
+            }],
+        }],
+    }
+
+
+def tiktok_payload(args):
+    content = {"publish_id": args.publish_id, "publish_type": "DIRECT_PUBLISH"}
+    if args.post_id:
+        content["post_id"] = args.post_id
+    if args.reason:
+        content["reason"] = args.reason
+
+    return {
+        "client_key": "local-stand-in",
+        "event": args.event,
+        "create_time": int(time.time()),
+        "user_openid": "local-stand-in",
+        "content": json.dumps(content),
+    }
+
+
+def send(args):
+    if args.provider == "meta":
+        body = json.dumps(meta_payload(args)).encode("utf-8")
+        signature = hmac.new(args.secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        headers = {"X-Hub-Signature-256": f"sha256={signature}"}
+        endpoint = f"{args.url.rstrip('/')}/gl/webhooks/meta"
+    else:
+        body = json.dumps(tiktok_payload(args)).encode("utf-8")
+        timestamp = str(int(time.time()))
+        signature = hmac.new(args.secret.encode("utf-8"), timestamp.encode("utf-8") + b"." + body,
+                             hashlib.sha256).hexdigest()
+        headers = {"TikTok-Signature": f"t={timestamp},s={signature}"}
+        endpoint = f"{args.url.rstrip('/')}/gl/webhooks/tiktok"
+
+    headers["Content-Type"] = "application/json"
+    response = requests.post(endpoint, data=body, headers=headers, timeout=30)
+    print(response.status_code, response.text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("provider", choices=["meta", "tiktok"])
+    parser.add_argument("--url", default="http://localhost:8018")
+    parser.add_argument("--secret", required=True, help="App Secret de Meta o Client Secret de TikTok")
+
+    parser.add_argument("--page-id", default="0")
+    parser.add_argument("--video-id")
+    parser.add_argument("--media-id")
+    parser.add_argument("--status", default="ready", choices=["ready", "processing", "error"])
+
+    parser.add_argument("--publish-id")
+    parser.add_argument("--event", default="post.publish.complete",
+                        choices=["post.publish.complete", "post.publish.failed", "post.publish.publicly_available"])
+    parser.add_argument("--post-id")
+    parser.add_argument("--reason")
+
+    args = parser.parse_args()
+    if args.provider == "meta" and not (args.video_id or args.media_id):
+        parser.error("meta requiere --video-id o --media-id")
+    if args.provider == "tiktok" and not args.publish_id:
+        parser.error("tiktok requiere --publish-id")
+
+    send(args)
+
+
+if __name__ == "__main__":
+    main()